@@ -0,0 +1,43 @@
+"""closed periods
+
+Revision ID: 0b5e7f3c2d84
+Revises: f2a8d6c4b913
+Create Date: 2026-10-18 20:03:51.207645
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b5e7f3c2d84'
+down_revision: Union[str, Sequence[str], None] = 'f2a8d6c4b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('closed_periods',
+    sa.Column('period', sa.Date(), nullable=False),
+    sa.Column('closed_by', sa.String(length=100), nullable=True),
+    sa.Column('closed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('period')
+    )
+    op.create_table('account_period_snapshots',
+    sa.Column('period', sa.Date(), nullable=False),
+    sa.Column('account_id', sa.UUID(), nullable=False),
+    sa.Column('debit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('credit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['period'], ['closed_periods.period'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('period', 'account_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('account_period_snapshots')
+    op.drop_table('closed_periods')
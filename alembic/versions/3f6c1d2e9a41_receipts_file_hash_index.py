@@ -0,0 +1,28 @@
+"""receipts file_hash index
+
+Revision ID: 3f6c1d2e9a41
+Revises: 5bec7a80aaae
+Create Date: 2026-10-18 09:12:40.218731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c1d2e9a41'
+down_revision: Union[str, Sequence[str], None] = '5bec7a80aaae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_receipts_file_hash_user_id', 'receipts', ['file_hash', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_receipts_file_hash_user_id', table_name='receipts')
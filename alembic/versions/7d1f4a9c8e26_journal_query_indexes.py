@@ -0,0 +1,41 @@
+"""journal query indexes
+
+Revision ID: 7d1f4a9c8e26
+Revises: 0b5e7f3c2d84
+Create Date: 2026-10-18 21:47:12.903318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d1f4a9c8e26'
+down_revision: Union[str, Sequence[str], None] = '0b5e7f3c2d84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_journal_entries_entry_date_id', 'journal_entries', ['entry_date', 'id']),
+    ('ix_journal_entries_status_entry_date_id', 'journal_entries', ['status', 'entry_date', 'id']),
+    ('ix_journal_lines_entry_id', 'journal_lines', ['entry_id']),
+    ('ix_journal_lines_account_id_amount_entry_id', 'journal_lines', ['account_id', 'amount', 'entry_id']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run in a transaction; building this way does not block writes to the ledger.
+    # A build that fails leaves an INVALID index behind, which has to be dropped before running this again
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,30 @@
+"""receipts batch_id
+
+Revision ID: 8a2d4b7c1e90
+Revises: 3f6c1d2e9a41
+Create Date: 2026-10-18 11:40:05.613902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a2d4b7c1e90'
+down_revision: Union[str, Sequence[str], None] = '3f6c1d2e9a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('receipts', sa.Column('batch_id', sa.UUID(), nullable=True))
+    op.create_index('ix_receipts_batch_id', 'receipts', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_receipts_batch_id', table_name='receipts')
+    op.drop_column('receipts', 'batch_id')
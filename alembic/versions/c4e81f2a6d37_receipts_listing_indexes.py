@@ -0,0 +1,30 @@
+"""receipts listing indexes
+
+Revision ID: c4e81f2a6d37
+Revises: 8a2d4b7c1e90
+Create Date: 2026-10-18 14:05:22.471390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e81f2a6d37'
+down_revision: Union[str, Sequence[str], None] = '8a2d4b7c1e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_receipts_user_id_created_at_id', 'receipts', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_receipts_user_id_status_created_at_id', 'receipts', ['user_id', 'status', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_receipts_user_id_status_created_at_id', table_name='receipts')
+    op.drop_index('ix_receipts_user_id_created_at_id', table_name='receipts')
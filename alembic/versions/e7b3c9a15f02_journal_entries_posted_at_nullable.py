@@ -0,0 +1,29 @@
+"""journal entries posted_at nullable
+
+Revision ID: e7b3c9a15f02
+Revises: c4e81f2a6d37
+Create Date: 2026-10-18 16:42:10.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3c9a15f02'
+down_revision: Union[str, Sequence[str], None] = 'c4e81f2a6d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drafts have not been posted yet
+    op.alter_column('journal_entries', 'posted_at', existing_type=sa.DateTime(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('journal_entries', 'posted_at', existing_type=sa.DateTime(), nullable=False)
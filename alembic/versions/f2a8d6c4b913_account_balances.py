@@ -0,0 +1,66 @@
+"""account balances
+
+Revision ID: f2a8d6c4b913
+Revises: e7b3c9a15f02
+Create Date: 2026-10-18 18:20:37.554812
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8d6c4b913'
+down_revision: Union[str, Sequence[str], None] = 'e7b3c9a15f02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('account_balances',
+    sa.Column('account_id', sa.UUID(), nullable=False),
+    sa.Column('debit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('credit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('account_id')
+    )
+    op.create_table('account_period_balances',
+    sa.Column('account_id', sa.UUID(), nullable=False),
+    sa.Column('period', sa.Date(), nullable=False),
+    sa.Column('debit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('credit_total', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('account_id', 'period')
+    )
+    # Backfill from the entries posted so far
+    op.execute("""
+        INSERT INTO account_balances (account_id, debit_total, credit_total, updated_at)
+        SELECT l.account_id,
+               COALESCE(SUM(CASE WHEN l.direction = 'debit' THEN l.amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN l.direction = 'credit' THEN l.amount ELSE 0 END), 0),
+               now() AT TIME ZONE 'utc'
+        FROM journal_lines l JOIN journal_entries e ON e.id = l.entry_id
+        WHERE e.status = 'posted'
+        GROUP BY l.account_id
+    """)
+    op.execute("""
+        INSERT INTO account_period_balances (account_id, period, debit_total, credit_total, updated_at)
+        SELECT l.account_id, date_trunc('month', e.entry_date)::date,
+               COALESCE(SUM(CASE WHEN l.direction = 'debit' THEN l.amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN l.direction = 'credit' THEN l.amount ELSE 0 END), 0),
+               now() AT TIME ZONE 'utc'
+        FROM journal_lines l JOIN journal_entries e ON e.id = l.entry_id
+        WHERE e.status = 'posted'
+        GROUP BY l.account_id, date_trunc('month', e.entry_date)::date
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('account_period_balances')
+    op.drop_table('account_balances')
@@ -0,0 +1,114 @@
+import asyncio
+import math
+import time
+from typing import Dict
+from app.core.config import settings
+from app.core.exceptions import AdmissionRejected
+
+class AdmissionController:
+    """Bounds the work in flight: max_in_flight run at once, up to max_queued more wait in FIFO order,
+    and each user may hold at most per_user of those admissions.
+
+    admit() decides synchronously, so an overloaded server answers at once instead of queueing without bound.
+    Retry-After is estimated from the queue ahead and a moving average of how long one unit of work takes.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int, per_user: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max(0, max_queued)
+        self.per_user = max(1, per_user)
+        self.admitted = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected_full = 0
+        self.rejected_user = 0
+        self.avg_service_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._per_user: Dict[str, int] = {}
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    @property
+    def queued(self) -> int:
+        return self.admitted - self.in_flight
+
+    def admit(self, user_id: str) -> 'Ticket':
+        if self.admitted >= self.max_in_flight + self.max_queued:
+            self.rejected_full += 1
+            raise AdmissionRejected('Receipt processing is at capacity', self.retry_after(self.queued + 1))
+        if self._per_user.get(user_id, 0) >= self.per_user:
+            self.rejected_user += 1
+            raise AdmissionRejected(f'Too many receipts in progress (max {self.per_user} per user)', self.retry_after(1))
+
+        self.admitted += 1
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        return Ticket(self, user_id)
+
+    def retry_after(self, ahead: int) -> int:
+        # Time for `ahead` units to drain through max_in_flight slots, at least a second and at most a minute
+        estimate = (ahead / self.max_in_flight) * (self.avg_service_seconds or 1.0)
+        return min(60, max(1, math.ceil(estimate)))
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'max_in_flight': self.max_in_flight,
+            'max_queued': self.max_queued,
+            'per_user': self.per_user,
+            'users': len(self._per_user),
+            'completed': self.completed,
+            'rejected_full': self.rejected_full,
+            'rejected_user': self.rejected_user,
+            'avg_service_seconds': round(self.avg_service_seconds, 3),
+            'max_wait_seconds': round(self.max_wait_seconds, 3),
+        }
+
+    def _release(self, user_id: str):
+        self.admitted -= 1
+        remaining = self._per_user.get(user_id, 1) - 1
+        if remaining:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+
+    def _record(self, waited: float, served: float):
+        self.completed += 1
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        # Exponential moving average; the first sample seeds it
+        self.avg_service_seconds = served if self.completed == 1 else 0.8 * self.avg_service_seconds + 0.2 * served
+
+class Ticket:
+    """One admission. `async with ticket` waits for a slot, runs the work and gives the admission back;
+    call cancel() instead when the work is not going to run."""
+
+    def __init__(self, controller: AdmissionController, user_id: str):
+        self.controller = controller
+        self.user_id = user_id
+        self.admitted_at = time.monotonic()
+        self._started_at = None
+        self._done = False
+
+    async def __aenter__(self):
+        try:
+            await self.controller._slots.acquire()
+        except BaseException:
+            self.cancel()
+            raise
+        self.controller.in_flight += 1
+        self._started_at = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        now = time.monotonic()
+        self.controller.in_flight -= 1
+        self.controller._slots.release()
+        self.controller._record(self._started_at - self.admitted_at, now - self._started_at)
+        self.cancel()
+
+    def cancel(self):
+        if not self._done:
+            self._done = True
+            self.controller._release(self.user_id)
+
+receipt_admission = AdmissionController(max_in_flight=settings.RECEIPT_MAX_IN_FLIGHT, max_queued=settings.RECEIPT_MAX_QUEUED,
+                                        per_user=settings.RECEIPT_MAX_PER_USER)
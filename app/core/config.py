@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,6 +10,98 @@ class Settings(BaseSettings):
 
     REDIS_URL: str
 
+    OLLAMA_MODEL: str = 'llama3.2:3b'
+    OLLAMA_HOST: Optional[str] = None
+    # Keep in line with the server's OLLAMA_NUM_PARALLEL
+    OLLAMA_MAX_PARALLEL: int = 1
+    OLLAMA_TIMEOUT: float = 30.0
+    MODEL_WARMUP: bool = True
+
+    # Concurrent OCR requests are grouped into one predict call of up to OCR_BATCH_SIZE images,
+    # waiting at most OCR_BATCH_WAIT_MS for a batch to fill; a size of 1 disables batching
+    OCR_BATCH_SIZE: int = 8
+    OCR_BATCH_WAIT_MS: float = 10.0
+    # Run OCR in a pool of processes (one PaddleOCR each) instead of the API process; takes precedence over batching.
+    # OCR_POOL_SIZE=0 sizes the pool as cpu_count // OCR_THREADS_PER_PROCESS. Celery prefork workers cannot start one and run OCR in-process
+    OCR_PROCESS_POOL: bool = False
+    OCR_POOL_SIZE: int = 0
+    OCR_THREADS_PER_PROCESS: int = 1
+    # Preprocessing before OCR: EXIF orientation, downscale to OCR_MAX_SIDE, grayscale, receipt crop, autocontrast
+    OCR_PREPROCESS: bool = True
+    OCR_MAX_SIDE: int = 1600
+    OCR_GRAYSCALE: bool = True
+    OCR_CROP_RECEIPT: bool = True
+    OCR_AUTOCONTRAST: bool = True
+
+    # Parsed receipts are cached by normalised OCR text + model + prompt version, in-process and in Redis
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_REDIS: bool = True
+    PARSE_CACHE_SIZE: int = 1024
+    PARSE_CACHE_TTL: int = 7 * 24 * 3600
+
+    # Rule-based extraction answers without the LLM when its confidence reaches FAST_PATH_MIN_CONFIDENCE;
+    # FAST_PATH_DAY_FIRST decides how ambiguous dates like 03/04/2025 are read
+    FAST_PATH_ENABLED: bool = True
+    FAST_PATH_MIN_CONFIDENCE: float = 0.8
+    FAST_PATH_DAY_FIRST: bool = True
+
+    # When enabled, uploads are handed to the Celery workers in app/worker.py instead of in-process background tasks
+    RECEIPT_QUEUE_ENABLED: bool = False
+    CELERY_OCR_QUEUE: str = 'receipts.ocr'
+    CELERY_LLM_QUEUE: str = 'receipts.llm'
+    CELERY_OCR_CONCURRENCY: int = 2
+    CELERY_LLM_CONCURRENCY: int = 4
+    CELERY_PREFETCH_MULTIPLIER: int = 1
+    CELERY_VISIBILITY_TIMEOUT: int = 3600
+
+    # 'results' copies OCR/parse results from a previous upload with the same sha256 into the new receipt,
+    # 'receipt' additionally returns the user's existing receipt instead of creating a new one, 'off' disables both
+    RECEIPT_DEDUP_POLICY: str = 'receipt'
+    # Where 'results' may look for a previous upload: 'user' or 'global'
+    RECEIPT_DEDUP_SCOPE: str = 'user'
+
+    # A receipt still mid-pipeline this long after upload belongs to a process that died; 'receipt' does not hand
+    # it back, a re-upload of its image starts a new receipt
+    RECEIPT_STALE_MINUTES: int = 30
+
+    # 'coalesced' writes an in-process receipt when it is created, with each stage result (file, OCR text,
+    # parse) and when processing stops; 'every' also writes each status change on its own.
+    # Celery stages always commit before they ack
+    RECEIPT_STATUS_WRITES: str = 'coalesced'
+
+    # Limits for POST /receipts/bulk (multipart or ZIP); each image is still capped at 10MB
+    BULK_UPLOAD_MAX_BYTES: int = 1024 * 1024 * 1024
+    BULK_UPLOAD_MAX_FILES: int = 1000
+
+    # Receipt work admitted per API process: RECEIPT_MAX_IN_FLIGHT run at once, RECEIPT_MAX_QUEUED more wait,
+    # one user holds at most RECEIPT_MAX_PER_USER of them; anything beyond gets 429 with Retry-After
+    RECEIPT_MAX_IN_FLIGHT: int = 4
+    RECEIPT_MAX_QUEUED: int = 32
+    RECEIPT_MAX_PER_USER: int = 8
+
+    # Reprocessing resumes failed receipts, and receipts stuck mid-pipeline longer than RECEIPT_STALE_MINUTES;
+    # one bulk request claims at most RECEIPT_REPROCESS_MAX_BATCH of them
+    RECEIPT_REPROCESS_MAX_BATCH: int = 1000
+
+    # Chart of accounts snapshot lifetime; saves invalidate it at once in the saving process, other processes catch up within this
+    ACCOUNT_CACHE_TTL: float = 60.0
+
+    # POST /ledger/journal-entries/import: entries per multi-row INSERT and transaction, and how many row errors are listed
+    LEDGER_IMPORT_CHUNK_SIZE: int = 1000
+    LEDGER_IMPORT_MAX_ERRORS: int = 1000
+
+    # Rows fetched per round trip (and per Parquet row group) by the general ledger export
+    LEDGER_EXPORT_BATCH_SIZE: int = 5000
+
+    # GET /receipts/{id}/events: keep-alive comment interval and how long one stream stays open before the client reconnects
+    RECEIPT_EVENTS_KEEPALIVE: float = 15.0
+    RECEIPT_EVENTS_MAX_SECONDS: int = 600
+
+    # 'supabase' or 'local'; the local backend keeps content-addressed files under LOCAL_STORAGE_ROOT
+    STORAGE_BACKEND: str = 'supabase'
+    LOCAL_STORAGE_ROOT: str = 'data/receipts'
+    STORAGE_MAX_CONNECTIONS: int = 10
+
     ENVIRONMENT: str = 'development'
 
     class Config:
@@ -1,9 +1,12 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core import metrics
 
 db_url = settings.DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://')
 engine = create_async_engine(db_url, echo=settings.ENVIRONMENT == 'development')
+metrics.instrument_engine(engine)
+metrics.register_stats('db_pool', lambda: {'size': engine.pool.size(), 'checked_out': engine.pool.checkedout(), 'overflow': engine.pool.overflow()})
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
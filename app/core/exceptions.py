@@ -0,0 +1,7 @@
+class AdmissionRejected(Exception):
+    """Raised when there is no room to accept more work; answered with 429 and Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
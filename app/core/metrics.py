@@ -0,0 +1,108 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+RECEIPT_STAGE_SECONDS = Histogram('receipt_stage_seconds', 'Time spent in each receipt pipeline stage', ['stage'], buckets=STAGE_BUCKETS)
+RECEIPT_STATUS = Counter('receipt_status_transitions', 'Receipts entering each processing status', ['status'])
+
+HTTP_REQUEST_SECONDS = Histogram('http_request_seconds', 'HTTP request latency', ['method', 'route', 'status'], buckets=STAGE_BUCKETS)
+HTTP_REQUEST_DB_QUERIES = Histogram('http_request_db_queries', 'Database queries issued per HTTP request', ['method', 'route'],
+                                    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+HTTP_REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'Time spent in database queries per HTTP request', ['method', 'route'],
+                                    buckets=QUERY_BUCKETS)
+DB_QUERY_SECONDS = Histogram('db_query_seconds', 'Database query latency', ['operation'], buckets=QUERY_BUCKETS)
+
+# [queries, seconds] for the HTTP request being handled, if any; a list so every task copying the context adds to it
+_request_db: ContextVar[Optional[List[float]]] = ContextVar('request_db', default=None)
+
+class StatsCollector:
+    """Exports the numeric values of stats() dicts as gauges, read at scrape time.
+
+    A source returns {key: number} or {group: {key: number}}; the gauge for a value is named
+    <prefix>_<group>_<key>. Anything that is not a number is skipped.
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], dict]] = {}
+
+    def collect(self):
+        for prefix, source in list(self.sources.items()):
+            try:
+                stats = source() or {}
+            except Exception as e:
+                print(f'Metrics source {prefix} failed: {e}')
+                continue
+            for name, value in self._flatten(prefix, stats):
+                gauge = GaugeMetricFamily(name, f'{prefix} stats: {name[len(prefix) + 1:]}')
+                gauge.add_metric([], float(value))
+                yield gauge
+
+    def _flatten(self, prefix: str, stats: dict):
+        for key, value in stats.items():
+            if not isinstance(key, str) or not key.isidentifier():
+                continue
+            if isinstance(value, dict):
+                yield from self._flatten(f'{prefix}_{key}', value)
+            elif isinstance(value, (int, float)):
+                yield f'{prefix}_{key}', value
+
+_collector = StatsCollector()
+REGISTRY.register(_collector)
+
+def register_stats(prefix: str, source: Callable[[], dict]):
+    _collector.sources[prefix] = source
+
+def thread_pool_stats() -> dict:
+    # The event loop's default executor, which runs every asyncio.to_thread call
+    try:
+        executor = getattr(asyncio.get_running_loop(), '_default_executor', None)
+    except RuntimeError:
+        return {}
+    if executor is None:
+        return {}
+    return {'workers': len(executor._threads), 'max_workers': executor._max_workers, 'queued': executor._work_queue.qsize()}
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        DB_QUERY_SECONDS.labels(statement.split(None, 1)[0].upper()).observe(elapsed)
+        tracked = _request_db.get()
+        if tracked is not None:
+            tracked[0] += 1
+            tracked[1] += elapsed
+
+@contextmanager
+def track_request(request):
+    tracked = [0, 0.0]
+    token = _request_db.set(tracked)
+    start = time.perf_counter()
+    outcome = {'status': 500}
+    try:
+        yield outcome
+    finally:
+        _request_db.reset(token)
+        # The route template, not the raw path, so ids do not explode the label set
+        route = request.scope.get('route')
+        path = getattr(route, 'path', 'unmatched')
+        method = request.method
+        HTTP_REQUEST_SECONDS.labels(method, path, str(outcome['status'])).observe(time.perf_counter() - start)
+        HTTP_REQUEST_DB_QUERIES.labels(method, path).observe(tracked[0])
+        HTTP_REQUEST_DB_SECONDS.labels(method, path).observe(tracked[1])
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
@@ -1,9 +1,27 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from app.modules.ledger.presentation.routers import router as ledger_router
 from app.modules.receipts.presentation.routers import router as receipts_router
+from app.modules.receipts.infrastructure.model_registry import model_registry, ModelRegistry
+from app.core.config import settings
+from app.core.admission import receipt_admission
+from app.core.exceptions import AdmissionRejected
+from app.core import metrics
 
-app = FastAPI(title="AI-Native Accounting Lite")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load in the background so the process can answer /health while warming up; /ready flips once they are loaded
+    # API pods only need storage when OCR and parsing are delegated to the Celery workers
+    components = ('storage', 'events') if settings.RECEIPT_QUEUE_ENABLED else ModelRegistry.COMPONENTS
+    startup = asyncio.create_task(model_registry.startup(components))
+    yield
+    startup.cancel()
+    await model_registry.shutdown()
+
+app = FastAPI(title="AI-Native Accounting Lite", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,6 +31,21 @@ app.add_middleware(
     allow_headers = ['*'],
 )
 
+metrics.register_stats('receipts', model_registry.stats)
+metrics.register_stats('admission', receipt_admission.stats)
+metrics.register_stats('thread_pool', metrics.thread_pool_stats)
+
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+    with metrics.track_request(request) as outcome:
+        response = await call_next(request)
+        outcome['status'] = response.status_code
+    return response
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(status_code=429, content={'detail': exc.reason}, headers={'Retry-After': str(exc.retry_after)})
+
 app.include_router(ledger_router, prefix='/api/v1')
 app.include_router(receipts_router, prefix='/api/v1')
 
@@ -25,4 +58,18 @@ async def root():
 
 @app.get('/health')
 async def health():
-    return {'status': 'healthy'}
\ No newline at end of file
+    return {'status': 'healthy'}
+
+@app.get('/ready')
+async def ready():
+    if not model_registry.ready:
+        return JSONResponse(status_code=503, content={'status': 'failed' if model_registry.error else 'loading', 'error': model_registry.error})
+    return {'status': 'ready'}
+
+@app.get('/admission')
+async def admission():
+    return receipt_admission.stats()
+
+@app.get('/metrics', include_in_schema=False)
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
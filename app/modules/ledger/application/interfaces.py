@@ -1,13 +1,13 @@
 from abc import ABC, abstractmethod
 from app.core.database import AsyncSessionLocal
-from app.modules.ledger.infrastructure.repositories import AccountRepository, JournalEntryRepository
+from app.modules.ledger.infrastructure.repositories import AccountRepository, JournalEntryRepository, AccountBalanceRepository, PeriodRepository
 from app.modules.receipts.infrastructure.repositories import ReceiptRepository
 
 class UnitOfWork(ABC):
     @abstractmethod
     async def __aenter__(self): pass
     @abstractmethod
-    async def __aexit__(self): pass
+    async def __aexit__(self, exc_type, exc_val, exc_tb): pass
     @abstractmethod
     async def commit(self): pass
     @abstractmethod
@@ -21,6 +21,12 @@ class UnitOfWork(ABC):
     def journal_entries(self) -> JournalEntryRepository: pass
     @property
     @abstractmethod
+    def balances(self) -> AccountBalanceRepository: pass
+    @property
+    @abstractmethod
+    def periods(self) -> PeriodRepository: pass
+    @property
+    @abstractmethod
     def receipts(self) -> ReceiptRepository: pass
 
 class SQLALchemyUnitOfWork(UnitOfWork):
@@ -30,19 +36,22 @@ class SQLALchemyUnitOfWork(UnitOfWork):
 
     async def __aenter__(self):
         self.session = self.session_factory()
-        self.accounts = AccountRepository(self.session)
+        self._accounts = AccountRepository(self.session)
         self._journal_entries = JournalEntryRepository(self.session)
+        self._balances = AccountBalanceRepository(self.session)
+        self._periods = PeriodRepository(self.session)
         self._receipts = ReceiptRepository(self.session)
 
         return self
 
-    async def _aexit_(self, exc_type, exc_val, exc_tb):
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
         if exc_type is not None:
             await self.rollback()
         await self.session.close()
 
     async def commit(self):
         await self.session.commit()
+        self._accounts.committed()
 
     async def rollback(self):
         await self.session.rollback()
@@ -55,6 +64,14 @@ class SQLALchemyUnitOfWork(UnitOfWork):
     def journal_entries(self) -> JournalEntryRepository:
         return self._journal_entries
 
+    @property
+    def balances(self) -> AccountBalanceRepository:
+        return self._balances
+
+    @property
+    def periods(self) -> PeriodRepository:
+        return self._periods
+
     @property
     def receipts(self) -> ReceiptRepository:
         return self._receipts
\ No newline at end of file
@@ -0,0 +1,93 @@
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+from uuid import UUID
+from app.modules.ledger.domain.entities import Account, AccountBalance, AccountType
+from app.modules.ledger.application.interfaces import UnitOfWork
+
+ZERO = Decimal('0.00')
+
+def previous_month(period: date) -> date:
+    return date(period.year - (period.month == 1), (period.month - 2) % 12 + 1, 1)
+
+class FinancialReports:
+    """Trial balance, income statement and balance sheet by whole month.
+
+    Totals come from AccountBalanceRepository.totals_through: closed months are read from their snapshot and
+    only the open months are summed, so the cost does not grow with journal_lines.
+    """
+
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+    async def trial_balance(self, as_of: date) -> dict:
+        async with self.uow:
+            totals = await self.uow.balances.totals_through(as_of)
+            accounts = await self._accounts(totals)
+
+        rows = []
+        for account in accounts:
+            debit, credit = totals.get(account.id, (ZERO, ZERO))
+            if not debit and not credit:
+                continue
+            net = debit - credit
+            rows.append({**self._row(account), 'debit': max(net, ZERO), 'credit': max(-net, ZERO),
+                         'balance': AccountBalance(account_id=account.id, debit_total=debit, credit_total=credit).balance(account.type)})
+
+        total_debit = sum((r['debit'] for r in rows), ZERO)
+        total_credit = sum((r['credit'] for r in rows), ZERO)
+        return {'as_of': f'{as_of:%Y-%m}', 'accounts': rows, 'total_debit': total_debit, 'total_credit': total_credit,
+                'balanced': total_debit == total_credit}
+
+    async def income_statement(self, start: date, end: date) -> dict:
+        # Activity in [start, end] is the difference of the cumulative totals at both ends
+        async with self.uow:
+            closing = await self.uow.balances.totals_through(end)
+            opening = await self.uow.balances.totals_through(previous_month(start))
+            accounts = await self._accounts(closing)
+
+        movement = {}
+        for account_id, (debit, credit) in closing.items():
+            before = opening.get(account_id, (ZERO, ZERO))
+            movement[account_id] = (debit - before[0], credit - before[1])
+
+        revenue = self._section(accounts, movement, AccountType.REVENUE)
+        expense = self._section(accounts, movement, AccountType.EXPENSE)
+        return {'from_period': f'{start:%Y-%m}', 'to_period': f'{end:%Y-%m}', 'revenue': revenue, 'expense': expense,
+                'net_income': revenue['total'] - expense['total']}
+
+    async def balance_sheet(self, as_of: date) -> dict:
+        async with self.uow:
+            totals = await self.uow.balances.totals_through(as_of)
+            accounts = await self._accounts(totals)
+
+        sections = {t.value: self._section(accounts, totals, t) for t in (AccountType.ASSET, AccountType.LIABILITY, AccountType.EQUITY)}
+        # Revenue and expenses are never closed into equity by an entry, so their net is shown as earnings to date
+        earnings = self._section(accounts, totals, AccountType.REVENUE)['total'] - self._section(accounts, totals, AccountType.EXPENSE)['total']
+        liabilities_and_equity = sections['liability']['total'] + sections['equity']['total'] + earnings
+        return {'as_of': f'{as_of:%Y-%m}', **sections, 'current_earnings': earnings,
+                'total_liabilities_and_equity': liabilities_and_equity, 'balanced': sections['asset']['total'] == liabilities_and_equity}
+
+    async def _accounts(self, totals: Dict[UUID, Tuple[Decimal, Decimal]]) -> List[Account]:
+        # The cached chart, plus any account with totals that the cached snapshot predates
+        chart = await self.uow.accounts.snapshot()
+        accounts = list(chart.accounts)
+        for account_id in totals.keys() - chart.by_id.keys():
+            account = await self.uow.accounts.get(account_id)
+            if account is not None:
+                accounts.append(account)
+        return sorted(accounts, key=lambda a: a.code)
+
+    def _section(self, accounts: Iterable[Account], totals: Dict[UUID, Tuple[Decimal, Decimal]], account_type: AccountType) -> dict:
+        rows = []
+        for account in accounts:
+            if account.type != account_type or account.id not in totals:
+                continue
+            debit, credit = totals[account.id]
+            balance = AccountBalance(account_id=account.id, debit_total=debit, credit_total=credit).balance(account.type)
+            if balance:
+                rows.append({**self._row(account), 'balance': balance})
+        return {'accounts': rows, 'total': sum((r['balance'] for r in rows), ZERO)}
+
+    def _row(self, account: Account) -> dict:
+        return {'account_id': account.id, 'code': account.code, 'name': account.name, 'type': account.type.value}
@@ -1,8 +1,9 @@
-from datetime import datetime, timezone
-from decimal import Decimal
-from typing import List, Dict, Any
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Sequence, Tuple
 from uuid import UUID, uuid4
-from app.modules.ledger.domain.entities import JournalEntry, JournalLine, JournalEntryStatus
+from pydantic import ValidationError
+from app.modules.ledger.domain.entities import Account, ClosedPeriod, JournalEntry, JournalLine, JournalEntryStatus, month_of, next_month
 from app.modules.ledger.application.interfaces import UnitOfWork
 
 class CreateJournalEntryUseCase:
@@ -11,34 +12,242 @@ class CreateJournalEntryUseCase:
 
     async def execute(self, entry_date: datetime, description: str, lines: List[Dict[str, Any]], created_by: str) -> JournalEntry:
         async with self.uow:
-            journal_lines = [JournalLine(
-                    account_id=UUID(line["account_id"]),
-                    direction=line["direction"],
-                    amount=Decimal(str(line["amount"])),
-                    description=line.get("description")
-                ) for line in lines]
-            entry_number = f"JE-{datetime.now(timezone.utc).strftime('%Y%m%d')}-{uuid4().hex[:4].upper()}"
-            entry = JournalEntry(entry_number=entry_number, entry_date=entry_date, description=description, lines=journal_lines, created_by=created_by)
-            saved = await self.uow.journal_entries.save(entry)
+            saved = await self.add(entry_date, description, lines, created_by)
             await self.uow.commit()
 
             return saved
 
+    async def add(self, entry_date: datetime, description: str, lines: List[Dict[str, Any]], created_by: str) -> JournalEntry:
+        # Saves the entry in the caller's already open unit of work, which commits it with its own changes
+        journal_lines = [JournalLine(
+                account_id=UUID(line["account_id"]),
+                direction=line["direction"],
+                amount=Decimal(str(line["amount"])),
+                description=line.get("description")
+            ) for line in lines]
+        entry_number = f"JE-{datetime.now(timezone.utc).strftime('%Y%m%d')}-{uuid4().hex[:4].upper()}"
+        entry = JournalEntry(entry_number=entry_number, entry_date=entry_date, description=description, lines=journal_lines, created_by=created_by)
+        return await self.uow.journal_entries.save(entry)
+
+async def _check_open(uow: UnitOfWork, entry: JournalEntry):
+    # Posted totals of a closed month are frozen in its snapshot
+    closed = await uow.periods.closed_through(for_posting=True)
+    if closed is not None and month_of(entry.entry_date) <= closed:
+        raise ValueError(f'Period {month_of(entry.entry_date):%Y-%m} is closed')
+
 class PostJournalEntryUseCase:
     def __init__(self, uow: UnitOfWork):
         self.uow = uow
 
     async def execute(self, entry_id: UUID) -> JournalEntry:
-        async with self.uow():
+        async with self.uow:
             entry = await self.uow.journal_entries.get(entry_id)
             if not entry:
                 raise ValueError('Entry not found')
             if entry.status != JournalEntryStatus.DRAFT:
                 raise ValueError('Only draft entries can be posted')
+            await _check_open(self.uow, entry)
             entry.status = JournalEntryStatus.POSTED
             entry.posted_at = datetime.now(timezone.utc)
 
-            await self.uow.journal_entries.save(entry)
+            # The status change and the balance update commit together
+            if not await self.uow.journal_entries.transition(entry.id, JournalEntryStatus.DRAFT, entry.status, posted_at=entry.posted_at):
+                raise ValueError('Only draft entries can be posted')
+            await self.uow.balances.apply([entry])
+            await self.uow.commit()
+
+            return entry
+
+class VoidJournalEntryUseCase:
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+    async def execute(self, entry_id: UUID) -> JournalEntry:
+        async with self.uow:
+            entry = await self.uow.journal_entries.get(entry_id)
+            if not entry:
+                raise ValueError('Entry not found')
+            if entry.status == JournalEntryStatus.VOID:
+                raise ValueError('Entry is already void')
+            previous = entry.status
+            if previous == JournalEntryStatus.POSTED:
+                await _check_open(self.uow, entry)
+
+            if not await self.uow.journal_entries.transition(entry.id, previous, JournalEntryStatus.VOID):
+                raise ValueError('Entry was changed by another request, try again')
+            # Only posted entries are in the balances
+            if previous == JournalEntryStatus.POSTED:
+                await self.uow.balances.apply([entry], sign=-1)
+            entry.status = JournalEntryStatus.VOID
+            await self.uow.commit()
+
+            return entry
+
+class ClosePeriodUseCase:
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+    async def execute(self, period: date, closed_by: str) -> ClosedPeriod:
+        async with self.uow:
+            latest = await self.uow.periods.lock()
+            if period >= month_of(datetime.now(timezone.utc)):
+                raise ValueError('Only months that have ended can be closed')
+            if latest is not None and period <= latest:
+                raise ValueError(f'Period {period:%Y-%m} is already closed')
+            # Months close in order, so each snapshot builds on the previous one
+            if latest is not None and period != next_month(latest):
+                raise ValueError(f'Close {next_month(latest):%Y-%m} first')
+
+            closed = await self.uow.periods.close(period, closed_by, previous=latest)
+            await self.uow.commit()
+
+            return closed
+
+class ReopenPeriodUseCase:
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+    async def execute(self, period: date):
+        async with self.uow:
+            latest = await self.uow.periods.lock()
+            if latest is None or period > latest:
+                raise ValueError(f'Period {period:%Y-%m} is not closed')
+            if period != latest:
+                raise ValueError(f'Only the latest closed period ({latest:%Y-%m}) can be reopened')
+
+            await self.uow.periods.reopen(period)
             await self.uow.commit()
 
-            return entry
\ No newline at end of file
+class ExportGeneralLedgerUseCase:
+    def __init__(self, uow: UnitOfWork, batch_size: int = 5000):
+        self.uow = uow
+        self.batch_size = batch_size
+
+    async def execute(self, encoder: Callable[[AsyncIterator[Sequence[tuple]]], AsyncIterator[bytes]], date_from: Optional[date] = None,
+                      date_to: Optional[date] = None, account_id: Optional[UUID] = None, statuses: Sequence[str] = ()) -> AsyncIterator[bytes]:
+        # Rows go from the cursor through the encoder as they are fetched; the session stays open until the last chunk
+        async with self.uow:
+            rows = self.uow.journal_entries.stream_ledger(date_from, date_to, account_id, statuses, batch_size=self.batch_size)
+            async for chunk in encoder(rows):
+                if chunk:
+                    yield chunk
+
+class ImportJournalEntriesUseCase:
+    """Validates (row, record, error) tuples as they arrive and writes the valid entries with multi-row INSERTs,
+    chunk_size entries per transaction. A chunk that fails to write is reported row by row and the import goes on."""
+
+    def __init__(self, uow: UnitOfWork, chunk_size: int = 1000, max_errors: int = 1000):
+        self.uow = uow
+        self.chunk_size = max(1, chunk_size)
+        self.max_errors = max_errors
+        self._accounts: Dict[str, Optional[Account]] = {}
+
+    async def execute(self, records: AsyncIterator[Tuple[int, Optional[dict], Optional[str]]], created_by: str, dry_run: bool = False) -> Dict[str, Any]:
+        result = {'received': 0, 'valid': 0, 'imported': 0, 'failed': 0, 'errors': [], 'aborted': None, 'dry_run': dry_run}
+        seen = set()
+        chunk: List[Tuple[int, JournalEntry]] = []
+        async with self.uow:
+            try:
+                async for row, record, error in records:
+                    result['received'] += 1
+                    entry = None
+                    if error is None:
+                        try:
+                            entry = await self._entry(record, created_by)
+                        except (ValueError, InvalidOperation, TypeError, AttributeError) as e:
+                            error = self._message(e)
+                    if entry is not None and entry.entry_number in seen:
+                        error = f'Duplicate entry_number {entry.entry_number} in this import'
+                    if error is not None:
+                        self._error(result, row, record, error)
+                        continue
+
+                    seen.add(entry.entry_number)
+                    result['valid'] += 1
+                    chunk.append((row, entry))
+                    if len(chunk) >= self.chunk_size:
+                        await self._write(chunk, result, dry_run)
+                        chunk = []
+            except ValueError as e:
+                # The body itself is unreadable; what was read before still gets written
+                result['aborted'] = str(e)
+            await self._write(chunk, result, dry_run)
+
+        return result
+
+    async def _entry(self, record: dict, created_by: str) -> JournalEntry:
+        status = JournalEntryStatus(record.get('status') or 'draft')
+        if status == JournalEntryStatus.VOID:
+            raise ValueError('Entries can only be imported as draft or posted')
+        lines = [await self._line(line) for line in record.get('lines') or []]
+        entry_number = record.get('entry_number') or f"JE-{datetime.now(timezone.utc).strftime('%Y%m%d')}-{uuid4().hex[:10].upper()}"
+        return JournalEntry(entry_number=str(entry_number), entry_date=record.get('entry_date'), description=record.get('description') or '',
+                            lines=lines, status=status, created_by=created_by,
+                            posted_at=datetime.now(timezone.utc) if status == JournalEntryStatus.POSTED else None)
+
+    async def _line(self, line: dict) -> JournalLine:
+        account = await self._account(line)
+        direction = str(line.get('direction') or '').lower()
+        if direction not in ('debit', 'credit'):
+            raise ValueError(f"direction must be debit or credit, got {line.get('direction')!r}")
+        amount = Decimal(str(line.get('amount')))
+        if not amount.is_finite() or amount <= 0 or amount != amount.quantize(Decimal('0.01')):
+            raise ValueError(f'amount must be positive with at most 2 decimals, got {line.get("amount")}')
+        return JournalLine(account_id=account.id, direction=direction, amount=amount, description=line.get('description') or None)
+
+    async def _account(self, line: dict) -> Account:
+        # Resolved once per distinct id or code for the whole import
+        key = f"id:{line['account_id']}" if line.get('account_id') else f"code:{line.get('account_code') or ''}"
+        if key not in self._accounts:
+            if line.get('account_id'):
+                self._accounts[key] = await self.uow.accounts.get(UUID(str(line['account_id'])))
+            else:
+                self._accounts[key] = await self.uow.accounts.get_by_code(str(line.get('account_code') or ''))
+        account = self._accounts[key]
+        if account is None:
+            raise ValueError(f'Unknown account {key.split(":", 1)[1]!r}')
+        if not account.is_active:
+            raise ValueError(f'Account {account.code} is inactive')
+        return account
+
+    async def _write(self, chunk: List[Tuple[int, JournalEntry]], result: Dict[str, Any], dry_run: bool):
+        if not chunk or dry_run:
+            return
+        try:
+            # Posted entries may not land in a closed month; drafts may, they just cannot be posted later
+            closed = await self.uow.periods.closed_through(for_posting=True)
+            if closed is not None:
+                kept = []
+                for row, entry in chunk:
+                    if entry.status == JournalEntryStatus.POSTED and month_of(entry.entry_date) <= closed:
+                        self._error(result, row, {'entry_number': entry.entry_number}, f'Period {month_of(entry.entry_date):%Y-%m} is closed')
+                    else:
+                        kept.append((row, entry))
+                chunk = kept
+            written = await self.uow.journal_entries.insert_many([entry for _, entry in chunk])
+            await self.uow.balances.apply([e for _, e in chunk if e.id in written and e.status == JournalEntryStatus.POSTED])
+            await self.uow.commit()
+        except Exception as e:
+            await self.uow.rollback()
+            for row, entry in chunk:
+                self._error(result, row, {'entry_number': entry.entry_number}, f'Write failed: {e}')
+            return
+
+        result['imported'] += len(written)
+        for row, entry in chunk:
+            if entry.id not in written:
+                self._error(result, row, {'entry_number': entry.entry_number}, f'entry_number {entry.entry_number} already exists')
+
+    def _error(self, result: Dict[str, Any], row: int, record: Optional[dict], error: str):
+        result['failed'] += 1
+        # Counted in full, listed up to max_errors
+        if len(result['errors']) < self.max_errors:
+            entry_number = record.get('entry_number') if isinstance(record, dict) else None
+            result['errors'].append({'row': row, 'entry_number': str(entry_number) if entry_number else None, 'error': error})
+
+    def _message(self, error: Exception) -> str:
+        if isinstance(error, ValidationError):
+            return '; '.join(f"{'.'.join(str(p) for p in e['loc']) or 'entry'}: {e['msg']}" for e in error.errors())
+        if isinstance(error, InvalidOperation):
+            return 'amount is not a number'
+        return str(error)
@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from decimal import Decimal
 from enum import Enum
 from typing import List, Optional
@@ -12,6 +12,18 @@ class AccountType(str, Enum):
     REVENUE = 'revenue'
     EXPENSE = 'expense'
 
+# Accounts whose balance is normally a debit; the others normally carry a credit balance
+DEBIT_NORMAL = (AccountType.ASSET, AccountType.EXPENSE)
+
+def month_of(value: datetime) -> date:
+    # The accounting period (first day of the month, UTC) a timestamp falls in
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+def next_month(period: date) -> date:
+    return date(period.year + period.month // 12, period.month % 12 + 1, 1)
+
 class Account(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     code: str
@@ -55,4 +67,21 @@ class JournalEntry(BaseModel):
         if len(lines) < 2:
             raise ValueError('At least two lines required')
 
-        return lines
\ No newline at end of file
+        return lines
+
+class AccountBalance(BaseModel):
+    account_id: UUID
+    # First day of the month for a period balance, None for the all-time balance
+    period: Optional[date] = None
+    debit_total: Decimal = Decimal('0.00')
+    credit_total: Decimal = Decimal('0.00')
+
+    def balance(self, account_type: AccountType) -> Decimal:
+        # Positive when the account sits on its normal side
+        net = self.debit_total - self.credit_total
+        return net if account_type in DEBIT_NORMAL else -net
+
+class ClosedPeriod(BaseModel):
+    period: date
+    closed_by: Optional[str] = None
+    closed_at: Optional[datetime] = None
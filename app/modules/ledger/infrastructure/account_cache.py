@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.modules.ledger.domain.entities import Account
+from app.modules.ledger.infrastructure.models import AccountModel
+from app.core.config import settings
+
+class ChartSnapshot:
+    """One immutable load of the chart of accounts, indexed by id, code and type.
+
+    Treat the accounts as read-only; the repository hands out copies. Rendered responses are memoised
+    on the snapshot, so they go away together with it.
+    """
+
+    def __init__(self, version: int, accounts: Sequence[Account]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.accounts: Tuple[Account, ...] = tuple(sorted(accounts, key=lambda a: a.code))
+        self.by_id: Dict[UUID, Account] = {a.id: a for a in self.accounts}
+        self.by_code: Dict[str, Account] = {a.code: a for a in self.accounts}
+        self.by_type: Dict[str, Tuple[Account, ...]] = {}
+        for account in self.accounts:
+            self.by_type[account.type.value] = self.by_type.get(account.type.value, ()) + (account,)
+        self._rendered: Dict[object, Tuple[bytes, str]] = {}
+
+    def of_type(self, account_type: Optional[str] = None) -> Tuple[Account, ...]:
+        return self.by_type.get(account_type, ()) if account_type else self.accounts
+
+    def render(self, key, render: Callable[[], bytes]) -> Tuple[bytes, str]:
+        # Returns the body and an ETag derived from it, so the tag agrees across processes
+        if key not in self._rendered:
+            body = render()
+            self._rendered[key] = (body, hashlib.sha1(body).hexdigest()[:16])
+        return self._rendered[key]
+
+class ChartOfAccountsCache:
+    """Process-wide cache of the chart of accounts.
+
+    Saving an account through AccountRepository invalidates it here, which bumps the version; other
+    processes pick the change up once their snapshot is older than ttl seconds.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.loads = 0
+        self._snapshot: Optional[ChartSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, session: AsyncSession) -> ChartSnapshot:
+        snapshot = self._snapshot
+        if self._fresh(snapshot):
+            self.hits += 1
+            return snapshot
+
+        async with self._lock:
+            snapshot = self._snapshot
+            if self._fresh(snapshot):
+                self.hits += 1
+                return snapshot
+
+            version = self.version
+            result = await session.execute(select(AccountModel))
+            snapshot = ChartSnapshot(version, [m.to_domain() for m in result.scalars()])
+            self.loads += 1
+            # An invalidation while loading means the rows read may already be stale; use them once, do not keep them
+            if self.version == version:
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        self.version += 1
+        self._snapshot = None
+
+    def stats(self) -> dict:
+        return {'version': self.version, 'hits': self.hits, 'loads': self.loads,
+                'accounts': len(self._snapshot.accounts) if self._snapshot else 0}
+
+    def _fresh(self, snapshot: Optional[ChartSnapshot]) -> bool:
+        return snapshot is not None and snapshot.version == self.version and time.monotonic() - snapshot.loaded_at < self.ttl
+
+chart_of_accounts = ChartOfAccountsCache(ttl=settings.ACCOUNT_CACHE_TTL)
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable, Dict, List, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ModuleNotFoundError:
+    pa = pq = None
+
+# One row per journal line, in this order, for every format
+EXPORT_COLUMNS = ('entry_id', 'entry_number', 'entry_date', 'entry_status', 'entry_description', 'created_by', 'posted_at',
+                  'line_id', 'account_id', 'account_code', 'account_name', 'account_type', 'direction', 'amount', 'line_description')
+
+Batches = AsyncIterator[Sequence[tuple]]
+
+def _text(value):
+    # Timestamps as ISO 8601, amounts as exact decimal strings
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+async def encode_csv(batches: Batches) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for batch in batches:
+        writer.writerows([['' if v is None else _text(v) for v in row] for row in batch])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+async def encode_ndjson(batches: Batches) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, map(_text, row)))) + '\n' for row in batch).encode()
+
+class _Drain(io.RawIOBase):
+    # A write-only file whose contents are taken out after every row group, so the Parquet file never sits in memory
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+def _parquet_schema():
+    string, timestamp = pa.string(), pa.timestamp('us')
+    return pa.schema([('entry_id', string), ('entry_number', string), ('entry_date', timestamp), ('entry_status', string),
+                      ('entry_description', string), ('created_by', string), ('posted_at', timestamp), ('line_id', string),
+                      ('account_id', string), ('account_code', string), ('account_name', string), ('account_type', string),
+                      ('direction', string), ('amount', pa.decimal128(12, 2)), ('line_description', string)])
+
+async def encode_parquet(batches: Batches) -> AsyncIterator[bytes]:
+    # One row group per fetched batch
+    schema = _parquet_schema()
+    ids = {EXPORT_COLUMNS.index(name) for name in ('entry_id', 'line_id', 'account_id')}
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        async for batch in batches:
+            columns = [[str(row[i]) if i in ids and row[i] is not None else row[i] for row in batch] for i in range(len(EXPORT_COLUMNS))]
+            writer.write_table(pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(columns, schema)], schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+def parquet_available() -> bool:
+    return pq is not None
+
+ENCODERS: Dict[str, Callable[[Batches], AsyncIterator[bytes]]] = {'csv': encode_csv, 'ndjson': encode_ndjson, 'parquet': encode_parquet}
+MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson', 'parquet': 'application/vnd.apache.parquet'}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Enum, Boolean, Text
+from sqlalchemy import Column, String, Numeric, Date, DateTime, ForeignKey, Enum, Boolean, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -54,10 +54,16 @@ class JournalEntryModel(Base):
     status = Column(Enum('draft', 'posted', 'void', name='entry_status', native_enum=False), default='draft')
     created_by = Column(String(100))
     created_at = Column(DateTime, default=_utc_now_naive)
-    posted_at = Column(DateTime, nullable=False)
+    posted_at = Column(DateTime)
 
     lines = relationship('JournalLineModel', back_populates='entry', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        # Keyset pagination by entry date, optionally by status
+        Index('ix_journal_entries_entry_date_id', 'entry_date', 'id'),
+        Index('ix_journal_entries_status_entry_date_id', 'status', 'entry_date', 'id'),
+    )
+
     def to_domain(self):
         from app.modules.ledger.domain.entities import JournalEntry, JournalEntryStatus
         return JournalEntry(
@@ -82,7 +88,8 @@ class JournalEntryModel(Base):
             status=entry.status.value,
             created_by=entry.created_by,
             created_at=entry.created_at,
-            posted_at=entry.posted_by
+            posted_at=entry.posted_at,
+            lines=[JournalLineModel.from_domain(line) for line in entry.lines]
         )
 
 class JournalLineModel(Base):
@@ -97,6 +104,12 @@ class JournalLineModel(Base):
     entry = relationship('JournalEntryModel', back_populates='lines')
     account = relationship('AccountModel')
 
+    __table_args__ = (
+        # Loading an entry's lines, and entries by account and line amount
+        Index('ix_journal_lines_entry_id', 'entry_id'),
+        Index('ix_journal_lines_account_id_amount_entry_id', 'account_id', 'amount', 'entry_id'),
+    )
+
     def to_domain(self):
         from app.modules.ledger.domain.entities import JournalLine
         return JournalLine(
@@ -105,4 +118,54 @@ class JournalLineModel(Base):
             direction=self.direction,
             amount=self.amount,
             description=self.description
-        )
\ No newline at end of file
+        )
+
+    @classmethod
+    def from_domain(cls, line):
+        return cls(
+            id=line.id,
+            account_id=line.account_id,
+            direction=line.direction,
+            amount=line.amount,
+            description=line.description
+        )
+
+class AccountBalanceModel(Base):
+    # Running totals of posted lines per account, kept up to date by posting and voiding
+    __tablename__ = 'account_balances'
+    account_id = Column(UUID(as_uuid=True), ForeignKey('accounts.id'), primary_key=True)
+    debit_total = Column(Numeric(16, 2), nullable=False, default=0)
+    credit_total = Column(Numeric(16, 2), nullable=False, default=0)
+    updated_at = Column(DateTime, default=_utc_now_naive, onupdate=_utc_now_naive)
+
+    def to_domain(self):
+        from app.modules.ledger.domain.entities import AccountBalance
+        return AccountBalance(account_id=self.account_id, debit_total=self.debit_total, credit_total=self.credit_total)
+
+class AccountPeriodBalanceModel(Base):
+    # The same totals per calendar month of the entry date; period is the first day of the month
+    __tablename__ = 'account_period_balances'
+    account_id = Column(UUID(as_uuid=True), ForeignKey('accounts.id'), primary_key=True)
+    period = Column(Date, primary_key=True)
+    debit_total = Column(Numeric(16, 2), nullable=False, default=0)
+    credit_total = Column(Numeric(16, 2), nullable=False, default=0)
+    updated_at = Column(DateTime, default=_utc_now_naive, onupdate=_utc_now_naive)
+
+    def to_domain(self):
+        from app.modules.ledger.domain.entities import AccountBalance
+        return AccountBalance(account_id=self.account_id, period=self.period, debit_total=self.debit_total, credit_total=self.credit_total)
+
+class ClosedPeriodModel(Base):
+    # One row per closed month; everything up to the latest one is closed
+    __tablename__ = 'closed_periods'
+    period = Column(Date, primary_key=True)
+    closed_by = Column(String(100))
+    closed_at = Column(DateTime, default=_utc_now_naive)
+
+class AccountPeriodSnapshotModel(Base):
+    # Cumulative totals of posted lines per account through the end of a closed month, frozen when it was closed
+    __tablename__ = 'account_period_snapshots'
+    period = Column(Date, ForeignKey('closed_periods.period', ondelete='CASCADE'), primary_key=True)
+    account_id = Column(UUID(as_uuid=True), ForeignKey('accounts.id'), primary_key=True)
+    debit_total = Column(Numeric(16, 2), nullable=False)
+    credit_total = Column(Numeric(16, 2), nullable=False)
@@ -1,39 +1,66 @@
-from typing import List, Optional
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import Date, case, cast, delete, exists, func, literal, literal_column, select, text, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.modules.ledger.domain.entities import Account, JournalEntry
-from app.modules.ledger.infrastructure.models import AccountModel, JournalEntryModel
+from app.modules.ledger.domain.entities import Account, AccountBalance, ClosedPeriod, JournalEntry, JournalEntryStatus, month_of, next_month
+from app.modules.ledger.infrastructure.models import AccountModel, JournalEntryModel, JournalLineModel, AccountBalanceModel, AccountPeriodBalanceModel, \
+    ClosedPeriodModel, AccountPeriodSnapshotModel
+from app.modules.ledger.infrastructure.account_cache import ChartOfAccountsCache, ChartSnapshot, chart_of_accounts
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # The ledger's timestamp columns are naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 class AccountRepository:
-    def __init__(self, session: AsyncSession):
+    # Reads come from the process-wide chart of accounts cache; a miss falls through to the table in case the
+    # account was created by another process since the snapshot was taken
+    def __init__(self, session: AsyncSession, cache: ChartOfAccountsCache = chart_of_accounts):
         self.session = session
+        self.cache = cache
+        self.changed = False
+
+    async def snapshot(self) -> ChartSnapshot:
+        return await self.cache.get(self.session)
 
     async def get(self, account_id: UUID) -> Optional[Account]:
+        account = (await self.snapshot()).by_id.get(account_id)
+        if account is not None:
+            return account.model_copy()
         result = await self.session.execute(select(AccountModel).where(AccountModel.id == account_id))
         model = result.scalar_one_or_none()
         return model.to_domain() if model else None
 
     async def get_by_code(self, code: str) -> Optional[Account]:
+        account = (await self.snapshot()).by_code.get(code)
+        if account is not None:
+            return account.model_copy()
         result = await self.session.execute(select(AccountModel).where(AccountModel.code == code))
         model = result.scalar_one_or_none()
         return model.to_domain() if model else None
 
     async def list(self, account_type: Optional[str] = None) -> List[Account]:
-        query = select(AccountModel)
-        if account_type:
-            query = query.where(AccountModel.type == account_type)
-        result = await self.session.execute(query)
-        models = result.scalars().all()
-        return [m.to_domain() for m in models]
+        return [a.model_copy() for a in (await self.snapshot()).of_type(account_type)]
 
     async def save(self, account: Account) -> Account:
         model = AccountModel.from_domain(account)
         self.session.add(model)
         await self.session.flush()
+        self.changed = True
+        self.cache.invalidate()
         return account
 
+    def committed(self):
+        # Invalidate again: a snapshot loaded between the flush and the commit cannot have seen the change
+        if self.changed:
+            self.cache.invalidate()
+            self.changed = False
+
 class JournalEntryRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -46,9 +73,262 @@ class JournalEntryRepository:
         model = result.scalar_one_or_none()
         return model.to_domain() if model else None
 
+    async def list_page(self, date_from: Optional[date] = None, date_to: Optional[date] = None, statuses: Sequence[str] = (),
+                        account_id: Optional[UUID] = None, amount_min: Optional[Decimal] = None, amount_max: Optional[Decimal] = None,
+                        after: Optional[Tuple[datetime, UUID]] = None, limit: int = 50) -> List[JournalEntry]:
+        # Newest entry date first, continuing strictly after the (entry_date, id) of the previous page's last entry.
+        # account and amount bounds match entries with a line that satisfies them (together, when both are given);
+        # the page's lines come in one batched SELECT ... WHERE entry_id IN (...)
+        entry, line = JournalEntryModel, JournalLineModel
+        stmt = select(entry)
+        if date_from is not None:
+            stmt = stmt.where(entry.entry_date >= datetime.combine(date_from, time()))
+        if date_to is not None:
+            stmt = stmt.where(entry.entry_date < datetime.combine(date_to + timedelta(days=1), time()))
+        if statuses:
+            stmt = stmt.where(entry.status.in_(statuses))
+        if account_id is not None or amount_min is not None or amount_max is not None:
+            matching = select(line.entry_id).where(line.entry_id == entry.id)
+            if account_id is not None:
+                matching = matching.where(line.account_id == account_id)
+            if amount_min is not None:
+                matching = matching.where(line.amount >= amount_min)
+            if amount_max is not None:
+                matching = matching.where(line.amount <= amount_max)
+            stmt = stmt.where(exists(matching))
+        if after is not None:
+            stmt = stmt.where(tuple_(entry.entry_date, entry.id) < (_utc_naive(after[0]), after[1]))
+        stmt = stmt.order_by(entry.entry_date.desc(), entry.id.desc()).limit(limit).options(selectinload(entry.lines))
+
+        result = await self.session.execute(stmt)
+        return [model.to_domain() for model in result.scalars()]
+
     async def save(self, entry: JournalEntry) -> JournalEntry:
-        model = JournalEntryModel.from_domain(entry)
-        self.session.add(model)
+        # New entries are inserted with their lines; for an existing one only the header columns are written
+        model = await self.session.get(JournalEntryModel, entry.id)
+        if model is None:
+            self.session.add(JournalEntryModel.from_domain(entry))
+        else:
+            model.entry_date = _utc_naive(entry.entry_date)
+            model.description = entry.description
+            model.status = entry.status.value
+            model.posted_at = _utc_naive(entry.posted_at)
         await self.session.flush()
 
-        return entry
\ No newline at end of file
+        return entry
+
+    async def transition(self, entry_id: UUID, expected: JournalEntryStatus, status: JournalEntryStatus, posted_at: Optional[datetime] = None) -> bool:
+        # Compare-and-set on the status, so two requests cannot both post (or void) the same entry
+        values = {'status': status.value}
+        if posted_at is not None:
+            values['posted_at'] = _utc_naive(posted_at)
+        stmt = update(JournalEntryModel).where(JournalEntryModel.id == entry_id, JournalEntryModel.status == expected.value).values(**values)
+        result = await self.session.execute(stmt)
+        return result.rowcount == 1
+
+    async def stream_ledger(self, date_from: Optional[date] = None, date_to: Optional[date] = None, account_id: Optional[UUID] = None,
+                            statuses: Sequence[str] = (), batch_size: int = 5000) -> AsyncIterator[Sequence[tuple]]:
+        # One plain row per journal line (gl_export.EXPORT_COLUMNS), fetched from a server-side cursor batch_size
+        # rows at a time, so memory stays flat however large the ledger. Dates are inclusive
+        entry, line, account = JournalEntryModel, JournalLineModel, AccountModel
+        stmt = (select(entry.id, entry.entry_number, entry.entry_date, entry.status, entry.description, entry.created_by, entry.posted_at,
+                       line.id, line.account_id, account.code, account.name, account.type, line.direction, line.amount, line.description)
+                .select_from(line)
+                .join(entry, entry.id == line.entry_id)
+                .join(account, account.id == line.account_id))
+        if date_from is not None:
+            stmt = stmt.where(entry.entry_date >= datetime.combine(date_from, time()))
+        if date_to is not None:
+            stmt = stmt.where(entry.entry_date < datetime.combine(date_to + timedelta(days=1), time()))
+        if account_id is not None:
+            stmt = stmt.where(line.account_id == account_id)
+        if statuses:
+            stmt = stmt.where(entry.status.in_(statuses))
+        stmt = stmt.order_by(entry.entry_date, entry.entry_number, line.id).execution_options(yield_per=batch_size)
+
+        result = await self.session.stream(stmt)
+        async for batch in result.partitions():
+            yield batch
+
+    async def insert_many(self, entries: Sequence[JournalEntry]) -> Set[UUID]:
+        # Multi-row INSERTs for imports, no ORM objects. Entries whose entry_number already exists are skipped
+        # (so a re-run of the same import is harmless); returns the ids actually written
+        if not entries:
+            return set()
+
+        entry_rows = [{
+            'id': e.id,
+            'entry_number': e.entry_number,
+            'entry_date': _utc_naive(e.entry_date),
+            'description': e.description,
+            'status': e.status.value,
+            'created_by': e.created_by,
+            'created_at': _utc_naive(e.created_at),
+            'posted_at': _utc_naive(e.posted_at),
+        } for e in entries]
+        table = JournalEntryModel.__table__
+        stmt = insert(table).on_conflict_do_nothing(index_elements=[table.c.entry_number]).returning(table.c.id)
+        written = set((await self.session.execute(stmt, entry_rows)).scalars())
+
+        line_rows = [{
+            'id': line.id,
+            'entry_id': e.id,
+            'account_id': line.account_id,
+            'direction': line.direction,
+            'amount': line.amount,
+            'description': line.description,
+        } for e in entries if e.id in written for line in e.lines]
+        if line_rows:
+            await self.session.execute(insert(JournalLineModel.__table__), line_rows)
+
+        return written
+
+class AccountBalanceRepository:
+    # account_balances and account_period_balances hold the debit and credit totals of posted lines. They are changed
+    # in the transaction that posts or voids an entry, with one multi-row upsert per table
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def apply(self, entries: Sequence[JournalEntry], sign: int = 1):
+        # sign=1 adds the entries' lines (posting), sign=-1 takes them back out (voiding)
+        totals: Dict[UUID, List[Decimal]] = {}
+        periods: Dict[Tuple[UUID, date], List[Decimal]] = {}
+        for entry in entries:
+            period = month_of(entry.entry_date)
+            for line in entry.lines:
+                side = 0 if line.direction == 'debit' else 1
+                totals.setdefault(line.account_id, [Decimal(0), Decimal(0)])[side] += sign * line.amount
+                periods.setdefault((line.account_id, period), [Decimal(0), Decimal(0)])[side] += sign * line.amount
+
+        now = _utc_naive(datetime.now(timezone.utc))
+        # Sorted, so concurrent posts touching the same accounts take the row locks in the same order
+        await self._upsert(AccountBalanceModel, ['account_id'], [
+            {'account_id': account_id, 'debit_total': d, 'credit_total': c, 'updated_at': now}
+            for account_id, (d, c) in sorted(totals.items())])
+        await self._upsert(AccountPeriodBalanceModel, ['account_id', 'period'], [
+            {'account_id': account_id, 'period': period, 'debit_total': d, 'credit_total': c, 'updated_at': now}
+            for (account_id, period), (d, c) in sorted(periods.items())])
+
+    async def get(self, account_id: UUID, period: Optional[date] = None) -> AccountBalance:
+        if period is None:
+            model = await self.session.get(AccountBalanceModel, account_id)
+        else:
+            model = await self.session.get(AccountPeriodBalanceModel, (account_id, period))
+        return model.to_domain() if model else AccountBalance(account_id=account_id, period=period)
+
+    async def totals_through(self, through: date) -> Dict[UUID, Tuple[Decimal, Decimal]]:
+        # (debit, credit) per account through the end of month `through`: the latest closed-period snapshot at or
+        # before it plus the month totals after that snapshot. journal_lines is never read, however long it grows
+        snap, month = AccountPeriodSnapshotModel, AccountPeriodBalanceModel
+        snapshot = (await self.session.execute(select(func.max(ClosedPeriodModel.period)).where(ClosedPeriodModel.period <= through))).scalar()
+
+        parts = [select(month.account_id, month.debit_total, month.credit_total).where(month.period <= through)]
+        if snapshot is not None:
+            parts[0] = parts[0].where(month.period > snapshot)
+            parts.append(select(snap.account_id, snap.debit_total, snap.credit_total).where(snap.period == snapshot))
+        combined = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+        stmt = (select(combined.c.account_id, func.sum(combined.c.debit_total), func.sum(combined.c.credit_total))
+                .group_by(combined.c.account_id))
+        return {account_id: (debit, credit) for account_id, debit, credit in await self.session.execute(stmt)}
+
+    async def verify(self) -> List[dict]:
+        # Recomputes every total from the posted lines; returns the rows where the stored totals differ
+        mismatches = []
+        for stored, computed in ((AccountBalanceModel, self._computed(False)), (AccountPeriodBalanceModel, self._computed(True))):
+            expected = {tuple(row[:-2]): (row[-2], row[-1]) for row in await self.session.execute(computed)}
+            keys = (stored.account_id, stored.period) if stored is AccountPeriodBalanceModel else (stored.account_id,)
+            actual = {tuple(row[:-2]): (row[-2], row[-1]) for row in await self.session.execute(select(*keys, stored.debit_total, stored.credit_total))}
+            zero = (Decimal(0), Decimal(0))
+            for key in sorted(set(expected) | set(actual), key=str):
+                if expected.get(key, zero) != actual.get(key, zero):
+                    mismatches.append({'account_id': key[0], 'period': key[1] if len(key) > 1 else None,
+                                       'expected': expected.get(key, zero), 'stored': actual.get(key, zero)})
+        return mismatches
+
+    async def rebuild(self):
+        # Blocks posting and voiding (their upserts) until the caller commits, so no entry is missed or counted twice
+        await self.session.execute(text('LOCK TABLE account_balances, account_period_balances IN SHARE ROW EXCLUSIVE MODE'))
+        await self.session.execute(delete(AccountPeriodBalanceModel))
+        await self.session.execute(delete(AccountBalanceModel))
+        now = func.timezone('utc', func.now())
+        await self.session.execute(insert(AccountBalanceModel).from_select(
+            ['account_id', 'debit_total', 'credit_total', 'updated_at'], self._computed(False).add_columns(now), include_defaults=False))
+        await self.session.execute(insert(AccountPeriodBalanceModel).from_select(
+            ['account_id', 'period', 'debit_total', 'credit_total', 'updated_at'], self._computed(True).add_columns(now), include_defaults=False))
+
+    def _computed(self, by_period: bool):
+        line, entry = JournalLineModel, JournalEntryModel
+        debit = func.coalesce(func.sum(case((line.direction == 'debit', line.amount), else_=0)), 0)
+        credit = func.coalesce(func.sum(case((line.direction == 'credit', line.amount), else_=0)), 0)
+        # A literal rather than a bound 'month', so the GROUP BY expression matches the selected one
+        period = cast(func.date_trunc(literal_column("'month'"), entry.entry_date), Date)
+        keys = (line.account_id, period) if by_period else (line.account_id,)
+        return (select(*keys, debit, credit)
+                .join(entry, entry.id == line.entry_id)
+                .where(entry.status == JournalEntryStatus.POSTED.value)
+                .group_by(*keys))
+
+    async def _upsert(self, model, keys: List[str], rows: List[dict]):
+        if not rows:
+            return
+        table = model.__table__
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_={
+            'debit_total': table.c.debit_total + stmt.excluded.debit_total,
+            'credit_total': table.c.credit_total + stmt.excluded.credit_total,
+            'updated_at': stmt.excluded.updated_at,
+        })
+        await self.session.execute(stmt)
+
+def _month_start(period: date) -> datetime:
+    # journal_entries.entry_date is a timestamp column, so month bounds are passed as datetimes
+    return datetime.combine(period, time())
+
+class PeriodRepository:
+    # Month-end close. Closing a month freezes cumulative per-account totals in account_period_snapshots, and every
+    # month up to the latest closed one is closed: nothing dated in it may be posted or voided any more
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def closed_through(self, for_posting: bool = False) -> Optional[date]:
+        # for_posting: called by anything about to change posted totals. ROW SHARE lets those run side by side
+        # but waits for a close in progress (EXCLUSIVE), so nothing lands in a month while it is being closed
+        if for_posting:
+            await self.session.execute(text('LOCK TABLE closed_periods IN ROW SHARE MODE'))
+        return (await self.session.execute(select(func.max(ClosedPeriodModel.period)))).scalar()
+
+    async def lock(self) -> Optional[date]:
+        # Taken by close and reopen until commit; returns the latest closed period
+        await self.session.execute(text('LOCK TABLE closed_periods IN EXCLUSIVE MODE'))
+        return await self.closed_through()
+
+    async def list(self) -> List[ClosedPeriod]:
+        result = await self.session.execute(select(ClosedPeriodModel).order_by(ClosedPeriodModel.period))
+        return [ClosedPeriod(period=m.period, closed_by=m.closed_by, closed_at=m.closed_at) for m in result.scalars()]
+
+    async def close(self, period: date, closed_by: str, previous: Optional[date] = None) -> ClosedPeriod:
+        # The snapshot is the previous one plus the posted lines dated after it, through the end of `period`,
+        # aggregated from journal_lines (not the maintained balances) so a close also settles any drift in those
+        closed = ClosedPeriod(period=period, closed_by=closed_by, closed_at=_utc_naive(datetime.now(timezone.utc)))
+        await self.session.execute(insert(ClosedPeriodModel).values(**closed.model_dump()))
+
+        line, entry, snap = JournalLineModel, JournalEntryModel, AccountPeriodSnapshotModel
+        moves = (select(line.account_id,
+                        case((line.direction == 'debit', line.amount), else_=0).label('debit_total'),
+                        case((line.direction == 'credit', line.amount), else_=0).label('credit_total'))
+                 .join(entry, entry.id == line.entry_id)
+                 .where(entry.status == JournalEntryStatus.POSTED.value, entry.entry_date < _month_start(next_month(period))))
+        parts = [moves]
+        if previous is not None:
+            parts[0] = moves.where(entry.entry_date >= _month_start(next_month(previous)))
+            parts.append(select(snap.account_id, snap.debit_total, snap.credit_total).where(snap.period == previous))
+        combined = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+        totals = (select(literal(period, Date), combined.c.account_id, func.sum(combined.c.debit_total), func.sum(combined.c.credit_total))
+                  .group_by(combined.c.account_id))
+        await self.session.execute(insert(snap).from_select(['period', 'account_id', 'debit_total', 'credit_total'], totals))
+
+        return closed
+
+    async def reopen(self, period: date):
+        await self.session.execute(delete(AccountPeriodSnapshotModel).where(AccountPeriodSnapshotModel.period == period))
+        await self.session.execute(delete(ClosedPeriodModel).where(ClosedPeriodModel.period == period))
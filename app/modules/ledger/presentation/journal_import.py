@@ -0,0 +1,102 @@
+"""Streaming readers for POST /ledger/journal-entries/import.
+
+Both yield (row, record, error) as the body arrives: row is the line number the entry starts on, record the
+entry as a dict, error a message when the row could not be read. A body that cannot be read at all (bad
+encoding, a line over MAX_LINE_CHARS, a CSV header without the required columns) raises ValueError.
+
+NDJSON, one entry per line:
+    {"entry_number": "2024-0001", "entry_date": "2024-03-01", "description": "Rent", "status": "posted",
+     "lines": [{"account_code": "5000", "direction": "debit", "amount": "1200.00"}, {"account_code": "1000", ...}]}
+
+CSV, one journal line per row; consecutive rows with the same entry_number make up one entry:
+    entry_number,entry_date,description,status,account_code,direction,amount,line_description
+"""
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+ImportRecord = Tuple[int, Optional[dict], Optional[str]]
+
+MAX_LINE_CHARS = 1024 * 1024
+CSV_REQUIRED = ('entry_number', 'entry_date', 'direction', 'amount')
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    try:
+        async for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                yield line.rstrip('\r')
+            if len(buffer) > MAX_LINE_CHARS:
+                raise ValueError(f'Line longer than {MAX_LINE_CHARS} characters')
+        buffer += decoder.decode(b'', final=True)
+    except UnicodeDecodeError as e:
+        raise ValueError(f'Body is not valid UTF-8: {e}')
+    if buffer:
+        yield buffer.rstrip('\r')
+
+async def read_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    row = 0
+    async for line in _lines(chunks):
+        row += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield row, None, 'Expected a JSON object'
+            continue
+        yield row, record, None
+
+async def read_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    header = None
+    entry, entry_row = None, 0
+    row, start, pending = 0, 0, None
+    async for line in _lines(chunks):
+        row += 1
+        if pending is None:
+            pending, start = line, row
+        else:
+            pending += '\n' + line
+        # An odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, None
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            missing = [name for name in CSV_REQUIRED if name not in header]
+            if 'account_code' not in header and 'account_id' not in header:
+                missing.append('account_code or account_id')
+            if missing:
+                raise ValueError(f'CSV header is missing {", ".join(missing)}')
+            continue
+
+        fields = {name: value.strip() for name, value in zip(header, values)}
+        if not fields.get('entry_number'):
+            yield start, None, 'entry_number is required to group CSV rows into entries'
+            continue
+        if entry is None or fields['entry_number'] != entry['entry_number']:
+            if entry is not None:
+                yield entry_row, entry, None
+            entry, entry_row = {name: fields.get(name) for name in ('entry_number', 'entry_date', 'description', 'status')}, start
+            entry['lines'] = []
+        entry['lines'].append({'account_code': fields.get('account_code'), 'account_id': fields.get('account_id'),
+                               'direction': fields.get('direction'), 'amount': fields.get('amount'),
+                               'description': fields.get('line_description') or None})
+
+    if pending is not None:
+        yield start, None, 'Unterminated quoted field'
+    if entry is not None:
+        yield entry_row, entry, None
+
+IMPORT_READERS = {'ndjson': read_ndjson, 'csv': read_csv}
@@ -1,16 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, HTTPException, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from decimal import Decimal
+import base64
+import json
 from uuid import UUID
-from typing import List, Optional
-from app.modules.ledger.presentation.schemas import JournalEntryCreate, JournalEntryResponse, AccountResponse
-from app.modules.ledger.application.use_cases import CreateJournalEntryUseCase, PostJournalEntryUseCase
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+from app.modules.ledger.presentation.schemas import JournalEntryCreate, JournalEntryResponse, JournalEntryPage, AccountResponse, JournalImportResponse, AccountBalanceResponse, \
+    TrialBalanceResponse, IncomeStatementResponse, BalanceSheetResponse, ClosedPeriodResponse
+from app.modules.ledger.presentation.journal_import import IMPORT_READERS
+from app.modules.ledger.application.use_cases import CreateJournalEntryUseCase, PostJournalEntryUseCase, VoidJournalEntryUseCase, ImportJournalEntriesUseCase, \
+    ClosePeriodUseCase, ReopenPeriodUseCase, ExportGeneralLedgerUseCase
+from app.modules.ledger.application.reports import FinancialReports
+from app.modules.ledger.domain.entities import JournalEntryStatus, month_of
+from app.modules.ledger.infrastructure.gl_export import ENCODERS, MEDIA_TYPES, parquet_available
 from app.modules.ledger.application.interfaces import UnitOfWork, SQLALchemyUnitOfWork
+from app.core.config import settings
 from app.core.dependencies import get_current_user
 
 router = APIRouter(prefix='/ledger', tags=['ledger'])
 
+_account_list = TypeAdapter(List[AccountResponse])
+
 def get_uow() -> UnitOfWork:
     return SQLALchemyUnitOfWork()
 
+def _month(value: Optional[str], name: str = 'period') -> Optional[date]:
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'{name} must be YYYY-MM')
+
 @router.post('/journal-entries', response_model=JournalEntryResponse, status_code=status.HTTP_201_CREATED)
 async def create_journal_entry(data: JournalEntryCreate, uow: UnitOfWork=Depends(get_uow), user=Depends(get_current_user)):
     use_case = CreateJournalEntryUseCase(uow)
@@ -26,6 +49,49 @@ async def create_journal_entry(data: JournalEntryCreate, uow: UnitOfWork=Depends
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get('/journal-entries', response_model=JournalEntryPage)
+async def list_journal_entries(date_from: Optional[date] = Query(None, alias='from'), date_to: Optional[date] = Query(None, alias='to'),
+                               status: Optional[List[str]] = Query(None), account: Optional[str] = None, amount_min: Optional[Decimal] = None,
+                               amount_max: Optional[Decimal] = None, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200),
+                               uow: UnitOfWork = Depends(get_uow), user=Depends(get_current_user)):
+    # Newest first with keyset pagination: pass next_cursor back as ?cursor= for the following page
+    statuses = status or []
+    if any(s not in JournalEntryStatus._value2member_map_ for s in statuses):
+        raise HTTPException(status_code=400, detail=f'status must be one of {", ".join(s.value for s in JournalEntryStatus)}')
+    account_id = await _account_id(uow, account) if account else None
+
+    async with uow:
+        # One extra entry tells whether there is a next page
+        entries = await uow.journal_entries.list_page(date_from, date_to, statuses, account_id, amount_min, amount_max,
+                                                      _decode_cursor(cursor) if cursor else None, limit + 1)
+
+    page = entries[:limit]
+    return JournalEntryPage(items=[JournalEntryResponse.model_validate(e.model_dump()) for e in page],
+                            next_cursor=_encode_cursor(page[-1].entry_date, page[-1].id) if len(entries) > limit else None)
+
+def _encode_cursor(entry_date: datetime, entry_id: UUID) -> str:
+    raw = json.dumps([entry_date.isoformat(), str(entry_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        entry_date, entry_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(entry_date), UUID(entry_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+
+@router.post('/journal-entries/import', response_model=JournalImportResponse)
+async def import_journal_entries(request: Request, format: Optional[str] = None, dry_run: bool = False, uow: UnitOfWork=Depends(get_uow),
+                                 user=Depends(get_current_user)):
+    # NDJSON or CSV (?format=, else from the Content-Type), validated while the body streams in and written
+    # LEDGER_IMPORT_CHUNK_SIZE entries per transaction; errors are reported per row instead of failing the import
+    format = format or ('csv' if 'csv' in request.headers.get('content-type', '') else 'ndjson')
+    if format not in IMPORT_READERS:
+        raise HTTPException(status_code=400, detail=f'format must be one of {", ".join(IMPORT_READERS)}')
+
+    use_case = ImportJournalEntriesUseCase(uow, chunk_size=settings.LEDGER_IMPORT_CHUNK_SIZE, max_errors=settings.LEDGER_IMPORT_MAX_ERRORS)
+    return await use_case.execute(IMPORT_READERS[format](request.stream()), created_by=user['id'], dry_run=dry_run)
+
 @router.post("/journal-entries/{entry_id}/post", response_model=JournalEntryResponse)
 async def post_journal_entry(entry_id: UUID, uow: UnitOfWork=Depends(get_uow), user=Depends(get_current_user)):
     use_case = PostJournalEntryUseCase(uow)
@@ -36,8 +102,109 @@ async def post_journal_entry(entry_id: UUID, uow: UnitOfWork=Depends(get_uow), u
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post('/journal-entries/{entry_id}/void', response_model=JournalEntryResponse)
+async def void_journal_entry(entry_id: UUID, uow: UnitOfWork=Depends(get_uow), user=Depends(get_current_user)):
+    use_case = VoidJournalEntryUseCase(uow)
+
+    try:
+        return await use_case.execute(entry_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get('/export')
+async def export_general_ledger(format: str = 'csv', date_from: Optional[date] = Query(None, alias='from'), date_to: Optional[date] = Query(None, alias='to'),
+                                account: Optional[str] = None, status: Optional[List[str]] = Query(None), uow: UnitOfWork = Depends(get_uow),
+                                user=Depends(get_current_user)):
+    # Every journal line with its entry and account, streamed from a server-side cursor through the encoder
+    if format not in ENCODERS:
+        raise HTTPException(status_code=400, detail=f'format must be one of {", ".join(ENCODERS)}')
+    if format == 'parquet' and not parquet_available():
+        raise HTTPException(status_code=400, detail='Parquet export needs pyarrow installed')
+    statuses = status or []
+    if any(s not in JournalEntryStatus._value2member_map_ for s in statuses):
+        raise HTTPException(status_code=400, detail=f'status must be one of {", ".join(s.value for s in JournalEntryStatus)}')
+    account_id = await _account_id(uow, account) if account else None
+
+    use_case = ExportGeneralLedgerUseCase(uow, batch_size=settings.LEDGER_EXPORT_BATCH_SIZE)
+    chunks = use_case.execute(ENCODERS[format], date_from, date_to, account_id, statuses)
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format],
+                             headers={'Content-Disposition': f'attachment; filename="general-ledger.{format}"'})
+
+async def _account_id(uow: UnitOfWork, account: str) -> UUID:
+    # An account id or code
+    async with uow:
+        try:
+            found = await uow.accounts.get(UUID(account))
+        except ValueError:
+            found = await uow.accounts.get_by_code(account)
+    if not found:
+        raise HTTPException(status_code=404, detail='Account not found')
+    return found.id
+
 @router.get('/accounts', response_model=List[AccountResponse])
-async def list_accounts(account_type: Optional[str] = None, uow: UnitOfWork = Depends(get_uow)):
+async def list_accounts(request: Request, account_type: Optional[str] = None, uow: UnitOfWork = Depends(get_uow)):
+    async with uow:
+        snapshot = await uow.accounts.snapshot()
+
+    # Serialised once per chart of accounts version and account type, then served as bytes
+    body, etag = snapshot.render(('accounts', account_type), lambda: _account_list.dump_json(
+        [AccountResponse.model_validate(a.model_dump(mode='json')) for a in snapshot.of_type(account_type)]))
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if request.headers.get('if-none-match') == headers['ETag']:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+@router.get('/accounts/{account_id}/balance', response_model=AccountBalanceResponse)
+async def get_account_balance(account_id: UUID, period: Optional[str] = None, uow: UnitOfWork = Depends(get_uow)):
+    # Reads the maintained totals: one primary key lookup whatever the number of journal lines
+    month = _month(period)
+
     async with uow:
-        accounts = await uow.accounts.list(account_type)
-        return accounts
\ No newline at end of file
+        account = await uow.accounts.get(account_id)
+        if not account:
+            raise HTTPException(status_code=404, detail='Account not found')
+        balance = await uow.balances.get(account_id, month)
+
+    return AccountBalanceResponse(account_id=account.id, code=account.code, name=account.name, type=account.type.value, period=period,
+                                  debit_total=balance.debit_total, credit_total=balance.credit_total, balance=balance.balance(account.type))
+
+# Reports work in whole months (YYYY-MM) and default to the current one
+@router.get('/reports/trial-balance', response_model=TrialBalanceResponse)
+async def trial_balance(as_of: Optional[str] = None, uow: UnitOfWork = Depends(get_uow), user=Depends(get_current_user)):
+    return await FinancialReports(uow).trial_balance(_month(as_of, 'as_of') or month_of(datetime.now(timezone.utc)))
+
+@router.get('/reports/income-statement', response_model=IncomeStatementResponse)
+async def income_statement(from_period: Optional[str] = Query(None, alias='from'), to_period: Optional[str] = Query(None, alias='to'),
+                           uow: UnitOfWork = Depends(get_uow), user=Depends(get_current_user)):
+    # Year to date unless a range is given
+    end = _month(to_period, 'to') or month_of(datetime.now(timezone.utc))
+    start = _month(from_period, 'from') or date(end.year, 1, 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail='from must not be after to')
+    return await FinancialReports(uow).income_statement(start, end)
+
+@router.get('/reports/balance-sheet', response_model=BalanceSheetResponse)
+async def balance_sheet(as_of: Optional[str] = None, uow: UnitOfWork = Depends(get_uow), user=Depends(get_current_user)):
+    return await FinancialReports(uow).balance_sheet(_month(as_of, 'as_of') or month_of(datetime.now(timezone.utc)))
+
+@router.get('/periods', response_model=List[ClosedPeriodResponse])
+async def list_closed_periods(uow: UnitOfWork = Depends(get_uow), user=Depends(get_current_user)):
+    async with uow:
+        periods = await uow.periods.list()
+    return [ClosedPeriodResponse(period=f'{p.period:%Y-%m}', closed_by=p.closed_by, closed_at=p.closed_at) for p in periods]
+
+@router.post('/periods/{period}/close', response_model=ClosedPeriodResponse)
+async def close_period(period: str, uow: UnitOfWork = Depends(get_uow), user=Depends(get_current_user)):
+    # Freezes the month's cumulative totals; entries dated in it can no longer be posted or voided
+    try:
+        closed = await ClosePeriodUseCase(uow).execute(_month(period), user['id'])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ClosedPeriodResponse(period=period, closed_by=closed.closed_by, closed_at=closed.closed_at)
+
+@router.post('/periods/{period}/reopen', status_code=status.HTTP_204_NO_CONTENT)
+async def reopen_period(period: str, uow: UnitOfWork = Depends(get_uow), user=Depends(get_current_user)):
+    try:
+        await ReopenPeriodUseCase(uow).execute(_month(period))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
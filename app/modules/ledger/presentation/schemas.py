@@ -37,4 +37,78 @@ class JournalEntryResponse(BaseModel):
     lines: List[JournalLineResponse]
     created_by: Optional[str]
     created_at: datetime
-    posted_at: Optional[datetime] = None
\ No newline at end of file
+    posted_at: Optional[datetime] = None
+
+class JournalEntryPage(BaseModel):
+    items: List[JournalEntryResponse]
+    next_cursor: Optional[str] = None
+
+class AccountBalanceResponse(BaseModel):
+    account_id: UUID4
+    code: str
+    name: str
+    type: str
+    # YYYY-MM when the balance is for one month
+    period: Optional[str] = None
+    debit_total: float
+    credit_total: float
+    # debit_total - credit_total, signed so that the account's normal side is positive
+    balance: float
+
+class ReportLine(BaseModel):
+    account_id: UUID4
+    code: str
+    name: str
+    type: str
+    balance: float
+
+class TrialBalanceLine(ReportLine):
+    debit: float
+    credit: float
+
+class TrialBalanceResponse(BaseModel):
+    as_of: str
+    accounts: List[TrialBalanceLine]
+    total_debit: float
+    total_credit: float
+    balanced: bool
+
+class ReportSection(BaseModel):
+    accounts: List[ReportLine]
+    total: float
+
+class IncomeStatementResponse(BaseModel):
+    from_period: str
+    to_period: str
+    revenue: ReportSection
+    expense: ReportSection
+    net_income: float
+
+class BalanceSheetResponse(BaseModel):
+    as_of: str
+    asset: ReportSection
+    liability: ReportSection
+    equity: ReportSection
+    current_earnings: float
+    total_liabilities_and_equity: float
+    balanced: bool
+
+class ClosedPeriodResponse(BaseModel):
+    period: str
+    closed_by: Optional[str] = None
+    closed_at: Optional[datetime] = None
+
+class JournalImportError(BaseModel):
+    row: int
+    entry_number: Optional[str] = None
+    error: str
+
+class JournalImportResponse(BaseModel):
+    received: int
+    valid: int
+    imported: int
+    failed: int
+    errors: List[JournalImportError]
+    # Set when the body stopped being readable part way; entries before that point were still imported
+    aborted: Optional[str] = None
+    dry_run: bool = False
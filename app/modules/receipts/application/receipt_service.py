@@ -1,99 +1,270 @@
-from datetime import datetime, timezone
-from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+import asyncio
 import hashlib
-from app.modules.receipts.domain.models import Receipt, ProcessingStatus
-from app.modules.receipts.infrastructure.repositories import ReceiptRepository
+import time
+from app.modules.receipts.domain.models import Receipt, ProcessingStatus, FAILED_STATUSES, FINAL_STATUSES
 from app.modules.receipts.infrastructure.ocr_service import OCRService
-from app.modules.receipts.infrastructure.ai_parser import OllamaParser, ReceiptData
-from app.modules.receipts.infrastructure.file_storage import SupabaseStorage
+from app.modules.receipts.infrastructure.ai_parser import OllamaParser, ReceiptData, FALLBACK_MERCHANTS
+from app.modules.receipts.infrastructure.file_storage import FileStorage
+from app.modules.receipts.infrastructure.status_events import ReceiptEventBus
 from app.modules.ledger.application.use_cases import CreateJournalEntryUseCase
-from app.modules.ledger.application.interfaces import UnitOfWork, SQLAlchemyUnitOfWork
+from app.core.config import settings
+from app.core import metrics
+
+# Stage results a receipt resumes from; written as soon as they exist, even when status writes are coalesced
+RESULT_FIELDS = frozenset(('file_path', 'ocr_text', 'parsed_data'))
 
 class ReceiptProcessingService:
-    def __init__(self, uow_factory, receipt_repo, ocr_sevice: OCRService, ai_parser: OllamaParser, storage: SupabaseStorage):
+    def __init__(self, uow_factory, ocr_service: OCRService, ai_parser: OllamaParser, storage: FileStorage, events: Optional[ReceiptEventBus] = None):
         self.uow_factory = uow_factory
-        self.receipt_repo = receipt_repo
-        self.ocr = ocr_sevice
+        self.ocr = ocr_service
         self.parser = ai_parser
         self.storage = storage
+        self.events = events
+        # Columns changed since the last write, per receipt, and the receipts whose writes are being coalesced
+        self._pending: Dict[UUID, Set[str]] = {}
+        self._coalescing: Set[UUID] = set()
 
     async def process_receipt(self, image_bytes: bytes, filename: str, user_id: str):
-        receipt = Receipt(id=uuid4(), filename=filename, user_id=user_id, status=ProcessingStatus.PENDING)
+        receipt, created = await self.accept_receipt(image_bytes, filename, user_id)
+        if not created:
+            return receipt
+        return await self.process(receipt, image_bytes)
+
+    async def process(self, receipt: Receipt, image_bytes: bytes) -> Receipt:
+        async with self._pipeline(receipt), self._stage(receipt, 'total'):
+            if not await self.reuse_duplicate(receipt) and not await self.store_and_ocr(receipt, image_bytes):
+                return receipt
+            await self._finish(receipt)
+
+        return receipt
+
+    async def resume(self, receipt: Receipt) -> Receipt:
+        # Continues a receipt claimed by claim_reprocess from the stage its status points at
+        async with self._pipeline(receipt), self._stage(receipt, 'total'):
+            if receipt.status == ProcessingStatus.OCR_PROCESSING and not await self.load_and_ocr(receipt):
+                return receipt
+            await self._finish(receipt)
+
+        return receipt
+
+    async def _finish(self, receipt: Receipt):
+        if receipt.status == ProcessingStatus.OCR_COMPLETED and not await self.run_parsing(receipt):
+            return
+        if receipt.status == ProcessingStatus.PARSING_COMPLETED:
+            await self.run_journal(receipt)
+
+    def resume_point(self, receipt: Receipt) -> Optional[ProcessingStatus]:
+        # The status to restart from: just before the first stage whose result is not persisted.
+        # A fallback parse (LLM timeout or error) does not count as a result
+        if receipt.journal_entry_id is not None:
+            return None
+        if receipt.parsed_data and receipt.parsed_data.get('merchant_name') not in FALLBACK_MERCHANTS:
+            return ProcessingStatus.PARSING_COMPLETED
+        if receipt.ocr_text:
+            return ProcessingStatus.OCR_COMPLETED
+        if receipt.file_path:
+            return ProcessingStatus.OCR_PROCESSING
+        return None
+
+    def can_reprocess(self, receipt: Receipt, stale_before: datetime) -> bool:
+        if receipt.status in FAILED_STATUSES:
+            return self.resume_point(receipt) is not None
+        # Still mid-pipeline long after upload: the process running it died
+        created_at = receipt.created_at if receipt.created_at.tzinfo else receipt.created_at.replace(tzinfo=timezone.utc)
+        return receipt.status not in FINAL_STATUSES and created_at < stale_before and self.resume_point(receipt) is not None
+
+    async def claim_reprocess(self, receipt: Receipt) -> bool:
+        # Moves the receipt to its resume point only if nobody changed its status since it was read,
+        # so two reprocess requests (or a late worker) cannot run the same receipt twice
+        resume = self.resume_point(receipt)
+        if resume is None:
+            return False
 
-        # Save initial receipt
         async with self.uow_factory() as uow:
-            await self.receipt_repo.save(receipt)
+            claimed = await uow.receipts.transition(receipt.id, receipt.status.value, resume.value)
             await uow.commit()
+        if not claimed:
+            return False
 
-        # Upload file to Supabase
-        try:
-            file_hash = hashlib.sha256(image_bytes).hexdigest()
-            file_path = f'receipts/{receipt.id}.jpg'
-            public_url = await self.storage.save(image_bytes, file_path)
-            receipt.file_path = public_url
-            receipt.file_hash = file_hash
-            receipt.status = ProcessingStatus.OCR_PROCESSING
+        receipt.status = resume
+        receipt.error_message = None
+        receipt.stage_timings = {}
+        await self._publish(receipt)
+        return True
 
+    async def reprocess_candidates(self, statuses: Sequence[str], stale_before: datetime, user_id: Optional[str] = None,
+                                   created_from: Optional[datetime] = None, created_to: Optional[datetime] = None, limit: int = 100) -> List[Receipt]:
+        # Newest first, skipping receipts with nothing to resume from
+        found: List[Receipt] = []
+        after = None
+        page_size = min(max(limit, 50), 500)
+        while len(found) < limit:
             async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
-        except Exception as e:
-            receipt.status = ProcessingStatus.OCR_FAILED
-            receipt.error_message = str(e)
-            
+                page = await uow.receipts.list_page(user_id, statuses, created_from, created_to, after, page_size, ('ocr_text', 'parsed_data'))
+            found += [r for r in page if self.can_reprocess(r, stale_before)]
+            if len(page) < page_size:
+                break
+            after = (page[-1].created_at, page[-1].id)
+
+        return found[:limit]
+
+    async def get_receipt(self, receipt_id: UUID) -> Optional[Receipt]:
+        async with self.uow_factory() as uow:
+            return await uow.receipts.get(receipt_id)
+
+    async def accept_receipt(self, image_bytes: bytes, filename: str, user_id: str, batch_id: Optional[UUID] = None) -> Tuple[Receipt, bool]:
+        return await self.accept_hashed(hashlib.sha256(image_bytes).hexdigest(), filename, user_id, batch_id)
+
+    async def accept_hashed(self, file_hash: str, filename: str, user_id: str, batch_id: Optional[UUID] = None) -> Tuple[Receipt, bool]:
+        # Users double-submit the same photo; hand back the receipt they already have
+        if settings.RECEIPT_DEDUP_POLICY == 'receipt':
             async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
+                stale_before = datetime.now(timezone.utc) - timedelta(minutes=settings.RECEIPT_STALE_MINUTES)
+                existing = await uow.receipts.find_by_hash(file_hash, user_id, stale_before)
+            if existing:
+                return existing, False
 
-            return receipt
+        return await self.create_receipt(filename, user_id, file_hash, batch_id), True
+
+    async def create_receipt(self, filename: str, user_id: str, file_hash: Optional[str] = None, batch_id: Optional[UUID] = None) -> Receipt:
+        receipt = Receipt(id=uuid4(), filename=filename, user_id=user_id, file_hash=file_hash, batch_id=batch_id, status=ProcessingStatus.PENDING)
+        async with self.uow_factory() as uow:
+            await uow.receipts.save(receipt)
+            await uow.commit()
+
+        return receipt
+
+    async def abandon(self, receipts: Sequence[Receipt], error: Exception):
+        # Receipts created for work that is not going to run; best effort, as the caller is already failing
+        for receipt in receipts:
+            try:
+                await self._fail(receipt, ProcessingStatus.UPLOAD_FAILED, error)
+            except Exception as e:
+                print(f'Could not mark receipt {receipt.id} failed: {e}')
+
+    async def reuse_duplicate(self, receipt: Receipt) -> bool:
+        if settings.RECEIPT_DEDUP_POLICY == 'off' or not receipt.file_hash:
+            return False
+
+        user_id = receipt.user_id if settings.RECEIPT_DEDUP_SCOPE == 'user' else None
+        async with self.uow_factory() as uow:
+            source = await uow.receipts.find_ocr_by_hash(receipt.file_hash, user_id=user_id, exclude_id=receipt.id)
+        if source is None:
+            return False
+
+        # Same bytes, so the stored file and the OCR (and parse, if it finished) results carry over.
+        # A fallback parse from an LLM timeout or error is not carried over; the receipt is parsed again
+        parsed = source.parsed_data if source.parsed_data and source.parsed_data.get('merchant_name') not in FALLBACK_MERCHANTS else None
+        receipt.file_path = source.file_path
+        receipt.ocr_text = source.ocr_text
+        receipt.parsed_data = parsed
+        receipt.status = ProcessingStatus.PARSING_COMPLETED if parsed else ProcessingStatus.OCR_COMPLETED
+        await self._save(receipt, 'file_path', 'ocr_text', 'parsed_data', 'status')
+
+        return True
+
+    def file_key(self, receipt: Receipt) -> str:
+        return f'receipts/{receipt.id}.jpg'
+
+    async def store_and_ocr(self, receipt: Receipt, image_bytes: bytes) -> bool:
+        # OCR reads the bytes we already hold, so it runs while the upload is in flight instead of after it.
+        # An upload failure cancels OCR (there would be no file behind the result); an OCR failure lets the
+        # upload finish so the receipt can be reprocessed from storage
+        receipt.file_hash = receipt.file_hash or hashlib.sha256(image_bytes).hexdigest()
+        receipt.status = ProcessingStatus.OCR_PROCESSING
+        await self._save(receipt, 'file_hash', 'status')
 
-        # OCR
+        upload = asyncio.create_task(self._timed(receipt, 'upload', self.storage.save(image_bytes, self.file_key(receipt))))
+        ocr = asyncio.create_task(self._timed(receipt, 'ocr', self.ocr.extract_text(image_bytes)))
         try:
-            ocr_text = await self.ocr.extract_text(image_bytes)
-            receipt.ocr_text = ocr_text
-            receipt.status = ProcessingStatus.OCR_COMPLETED
+            try:
+                receipt.file_path = await upload
+            except Exception as e:
+                ocr.cancel()
+                await asyncio.gather(ocr, return_exceptions=True)
+                await self._fail(receipt, ProcessingStatus.UPLOAD_FAILED, e)
+                return False
+            await self._save(receipt, 'file_path')
 
-            async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
+            try:
+                receipt.ocr_text = await ocr
+            except Exception as e:
+                await self._fail(receipt, ProcessingStatus.OCR_FAILED, e)
+                return False
+        finally:
+            for task in (upload, ocr):
+                task.cancel()
+
+        receipt.status = ProcessingStatus.OCR_COMPLETED
+        await self._save(receipt, 'ocr_text', 'status')
+
+        return True
+
+    async def store_file(self, receipt: Receipt, image_bytes: bytes) -> bool:
+        try:
+            async with self._stage(receipt, 'upload'):
+                receipt.file_path = await self.storage.save(image_bytes, self.file_key(receipt))
+            receipt.file_hash = receipt.file_hash or hashlib.sha256(image_bytes).hexdigest()
+            receipt.status = ProcessingStatus.OCR_PROCESSING
+            await self._save(receipt, 'file_path', 'file_hash', 'status')
         except Exception as e:
-            receipt.status = ProcessingStatus.OCR_FAILED
-            receipt.error_message = str(e)
+            await self._fail(receipt, ProcessingStatus.UPLOAD_FAILED, e)
+            return False
 
-            async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
+        return True
 
-            return receipt
+    async def load_and_ocr(self, receipt: Receipt) -> bool:
+        # OCR from the stored file, for receipts whose upload already happened
+        try:
+            async with self._stage(receipt, 'download'):
+                image_bytes = await self.storage.load(receipt.file_path)
+        except Exception as e:
+            await self._fail(receipt, ProcessingStatus.OCR_FAILED, e)
+            return False
+
+        return await self.run_ocr(receipt, image_bytes)
 
-        # AI Parsing
+    async def run_ocr(self, receipt: Receipt, image_bytes: bytes) -> bool:
+        try:
+            async with self._stage(receipt, 'ocr'):
+                receipt.ocr_text = await self.ocr.extract_text(image_bytes)
+            receipt.status = ProcessingStatus.OCR_COMPLETED
+            await self._save(receipt, 'ocr_text', 'status')
+        except Exception as e:
+            await self._fail(receipt, ProcessingStatus.OCR_FAILED, e)
+            return False
+
+        return True
+
+    async def run_parsing(self, receipt: Receipt) -> bool:
         try:
             receipt.status = ProcessingStatus.AI_PARSING
+            await self._save(receipt, 'status')
 
-            async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
-            
-            parsed: ReceiptData = await self.parser.parse(ocr_text)
+            async with self._stage(receipt, 'parse'):
+                parsed: ReceiptData = await self.parser.parse(receipt.ocr_text)
+            # The parser's stand-in for a timeout or error is not a parse: keep parsed_data unset so the
+            # receipt resumes from its OCR text once the LLM is back
+            if parsed.merchant_name in FALLBACK_MERCHANTS:
+                raise ValueError(f'Parser returned no usable data ({parsed.merchant_name})')
             receipt.parsed_data = parsed.model_dump()
             receipt.status = ProcessingStatus.PARSING_COMPLETED
-
-            async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
+            await self._save(receipt, 'parsed_data', 'status')
         except Exception as e:
-            receipt.status = ProcessingStatus.PARSING_FAILED
-            receipt.error_message = str(e)
+            await self._fail(receipt, ProcessingStatus.PARSING_FAILED, e)
+            return False
 
-            async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
+        return True
 
-            return receipt
-
-        # Create journal entry
+    async def run_journal(self, receipt: Receipt) -> bool:
         try:
-            async with self.uow_factory() as uow:
+            parsed = ReceiptData(**receipt.parsed_data)
+
+            async with self._stage(receipt, 'journal'), self.uow_factory() as uow:
                 expense_acc = await uow.accounts.get_by_code('5000') # expense account code
                 cash_acc = await uow.accounts.get_by_code('1000') # cash account code
 
@@ -101,7 +272,7 @@ class ReceiptProcessingService:
                     raise ValueError('Required accounts not found. Run seed script.')
                 lines = [
                     {
-                        'acccount_id': str(expense_acc.id),
+                        'account_id': str(expense_acc.id),
                         'direction': 'debit',
                         'amount': parsed.total_amount
                     },
@@ -111,26 +282,84 @@ class ReceiptProcessingService:
                         'amount': parsed.total_amount
                     }
                 ]
+                # The entry and the receipt pointing at it commit in one transaction, so a redelivered task
+                # never finds an entry whose receipt still says parsing_completed
                 create_uc = CreateJournalEntryUseCase(uow)
-                entry = await create_uc.execute(
+                entry = await create_uc.add(
                     entry_date = datetime.strptime(parsed.transaction_date, '%Y-%m-%d') if parsed.transaction_date else datetime.now(timezone.utc),
                     description = f'Receipt: {parsed.merchant_name}',
                     lines = lines,
-                    created_by = user_id
+                    created_by = receipt.user_id
                 )
                 receipt.journal_entry_id = entry.id
                 receipt.status = ProcessingStatus.COMPLETED if self._should_auto_post(parsed) else ProcessingStatus.PENDING_REVIEW
-                await self.receipt_repo.save(receipt)
+                await uow.receipts.save(receipt, self._pending.get(receipt.id, set()) | {'journal_entry_id', 'status'})
                 await uow.commit()
+            self._pending.pop(receipt.id, None)
+            await self._publish(receipt)
         except Exception as e:
-            receipt.status = ProcessingStatus.JOURNAL_FAILED
-            receipt.error_message = str(e)
+            await self._fail(receipt, ProcessingStatus.JOURNAL_FAILED, e)
+            return False
 
-            async with self.uow_factory() as uow:
-                await self.receipt_repo.save(receipt)
-                await uow.commit()
-        
-        return receipt
+        return True
+
+    @asynccontextmanager
+    async def _pipeline(self, receipt: Receipt):
+        # In 'coalesced' mode a status change on its own is held back until the pipeline stops or the next
+        # stage result is written, so a process that dies still leaves its stage results in the table
+        if settings.RECEIPT_STATUS_WRITES == 'coalesced':
+            self._coalescing.add(receipt.id)
+        try:
+            yield
+        finally:
+            self._coalescing.discard(receipt.id)
+            await self._flush(receipt)
+
+    @asynccontextmanager
+    async def _stage(self, receipt: Receipt, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            receipt.stage_timings[name] = round(elapsed * 1000, 1)
+            metrics.RECEIPT_STAGE_SECONDS.labels(name).observe(elapsed)
+
+    async def _timed(self, receipt: Receipt, name: str, coro):
+        async with self._stage(receipt, name):
+            return await coro
+
+    def _mark(self, receipt: Receipt, *fields: str):
+        self._pending.setdefault(receipt.id, set()).update(fields)
+
+    async def _save(self, receipt: Receipt, *fields: str):
+        self._mark(receipt, *fields)
+        if receipt.id not in self._coalescing or RESULT_FIELDS.intersection(fields):
+            await self._flush(receipt)
+        # Coalesced statuses may never reach the table, but they are still announced
+        if 'status' in fields:
+            await self._publish(receipt)
+
+    async def _flush(self, receipt: Receipt):
+        fields = self._pending.pop(receipt.id, None)
+        if not fields:
+            return
+
+        async with self.uow_factory() as uow:
+            await uow.receipts.save(receipt, fields)
+            await uow.commit()
+
+    async def _fail(self, receipt: Receipt, status: ProcessingStatus, error: Exception):
+        receipt.status = status
+        receipt.error_message = str(error)
+        self._mark(receipt, 'status', 'error_message')
+        await self._flush(receipt)
+        await self._publish(receipt)
+
+    async def _publish(self, receipt: Receipt):
+        metrics.RECEIPT_STATUS.labels(receipt.status.value).inc()
+        if self.events is not None:
+            await self.events.publish(receipt)
 
     def _should_auto_post(self, parsed: ReceiptData) -> bool:
-        return parsed.total_amount is not None and parsed.total_amount < 1000
\ No newline at end of file
+        return parsed.total_amount is not None and parsed.total_amount < 1000
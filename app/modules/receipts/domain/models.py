@@ -6,6 +6,7 @@ from pydantic import BaseModel, Field
 
 class ProcessingStatus(str, Enum):
     PENDING = 'pending'
+    UPLOAD_FAILED = 'upload_failed'
     OCR_PROCESSING = 'ocr_processing'
     OCR_COMPLETED = 'ocr_completed'
     OCR_FAILED = 'ocr_failed'
@@ -17,15 +18,22 @@ class ProcessingStatus(str, Enum):
     COMPLETED = 'completed'
     PENDING_REVIEW = 'pending_review'
 
+FAILED_STATUSES = (ProcessingStatus.UPLOAD_FAILED, ProcessingStatus.OCR_FAILED, ProcessingStatus.PARSING_FAILED, ProcessingStatus.JOURNAL_FAILED)
+# Statuses the pipeline stops at
+FINAL_STATUSES = FAILED_STATUSES + (ProcessingStatus.COMPLETED, ProcessingStatus.PENDING_REVIEW)
+
 class Receipt(BaseModel):
     id: UUID
     filename: str
     file_path: Optional[str] = None
     file_hash: Optional[str] = None
     user_id: str
+    batch_id: Optional[UUID] = None
     status: ProcessingStatus
     ocr_text: Optional[str] = None
     parsed_data: Optional[Dict[str, Any]] = None
     journal_entry_id: Optional[UUID] = None
     error_message: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Milliseconds per pipeline stage for this run; not persisted
+    stage_timings: Dict[str, float] = Field(default_factory=dict)
@@ -1,52 +1,95 @@
-import json
 import ollama
 import asyncio
-import time
+import httpx
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+
+# Bump whenever the prompt below changes so cached parses from the old prompt are not reused
+PROMPT_VERSION = 2
+
+# merchant_name values the parser returns when it could not get a usable answer out of the model
+FALLBACK_MERCHANTS = ('Timeout', 'Unknown', 'Error')
 
 class ReceiptData(BaseModel):
     merchant_name: Optional[str] = None
-    transaction_date = Optional[str] = None
+    transaction_date: Optional[str] = None
     total_amount: Optional[float] = None
     line_items: list = []
     category: Optional[str] = None
+    # Set by the rule-based fast path; None when the LLM produced the data
+    confidence: Optional[float] = None
+
+def _response_schema() -> dict:
+    # Ollama constrains generation to this schema; confidence is ours, not the model's
+    schema = ReceiptData.model_json_schema()
+    schema['properties'].pop('confidence', None)
+    return schema
 
 class OllamaParser:
-    def __init__(self, model: str = 'llama3.2:3b'):
+    def __init__(self, model: str = 'llama3.2:3b', host: Optional[str] = None, max_parallel: int = 1, timeout: float = 30.0):
         self.model = model
-        self._ensure_model_ready()
+        self.timeout = timeout
+        # One pooled HTTP client per parser; keep-alive connections match the server's parallelism
+        self.client = ollama.AsyncClient(host=host, limits=httpx.Limits(max_connections=max_parallel * 2, max_keepalive_connections=max_parallel))
+        # Requests beyond OLLAMA_NUM_PARALLEL would only queue inside the server, so they queue here instead
+        self.max_parallel = max_parallel
+        self._slots = asyncio.Semaphore(max_parallel)
+        self._schema = _response_schema()
+        self.waiting = 0
+        self.in_flight = 0
 
-    def _ensure_model_ready(self):
+    async def ensure_model_ready(self):
         max_retries = 5
 
         for i in range(max_retries):
             try:
-                models = ollama.list()
-                model_names = [m.get('name', '') for m in models.get('models', [])]
+                models = await self.client.list()
+                model_names = [m.get('model') or m.get('name') or '' for m in models.get('models', [])]
 
                 if any(self.model in name for name in model_names):
                     print(f'Model {self.model} is ready!')
                     return
                 print(f'Pulling model {self.model}...')
-                ollama.pull(self.model)
+                await self.client.pull(self.model)
                 return
             except Exception as e:
                 if i < max_retries - 1:
                     wait = 2 ** i
                     print(f'Waiting for model {self.model} (attempt {i+1}/{max_retries})...')
-                    time.sleep(wait)
+                    await asyncio.sleep(wait)
                 else:
                     print(f'Could not verify model {self.model}: {e}')
 
     async def parse(self, ocr_text: str) -> ReceiptData:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
         try:
-            return await asyncio.wait_for(asyncio.to_thread(self._parse_sync, ocr_text), timeout = 30.0)
+            # Only the request itself is timed, not the wait for a slot. Cancelling it closes the
+            # connection, which makes Ollama abort the generation instead of finishing it for nobody
+            return await asyncio.wait_for(self._parse(ocr_text), timeout=self.timeout)
         except asyncio.TimeoutError:
             print('Ollama parsing timed out')
             return ReceiptData(merchant_name='Timeout', total_amount=0.0)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def warmup(self):
+        # Loads the model weights into the Ollama server so the first real receipt does not pay for it
+        await self.parse('WARMUP STORE\nTOTAL 0.00')
+
+    def stats(self) -> dict:
+        return {'in_flight': self.in_flight, 'waiting': self.waiting, 'max_parallel': self.max_parallel}
+
+    async def close(self):
+        await self.client.close()
 
-    def _parse_sync(self, ocr_text: str) -> ReceiptData:
+    async def _parse(self, ocr_text: str) -> ReceiptData:
         prompt = f"""You are a receipt parser. Extract structured data from the text below.
 Receipt text:
 {ocr_text}
@@ -54,18 +97,11 @@ Receipt text:
 Return JSON with these field: merchant_name, transaction_date (YYYY-MM-DD), total_amount (number), line_items (list of objects with name, quantity, price), category (string). Only output JSON, nothing else."""
 
         try:
-            response = ollama.chat(model=self.model, messages=[{'role': 'user', 'content': prompt}], options={'temperature': 0.1})
-            content = response['message']['content']
-            start = content.find('{')
-            end = content.rfind('}') + 1
-
-            if start != -1 and end > start:
-                json_str = content[start:end]
-                data = json.loads(json_str)
-
-                return ReceiptData(**data)
-            else:
-                return ReceiptData(merchant_name='Unknown', total_amount=0.0)
+            response = await self.client.chat(model=self.model, messages=[{'role': 'user', 'content': prompt}], format=self._schema, options={'temperature': 0.1})
+            return ReceiptData.model_validate_json(response['message']['content'])
+        except ValidationError as e:
+            print(f'Ollama returned unusable JSON: {e}')
+            return ReceiptData(merchant_name='Unknown', total_amount=0.0)
         except Exception as e:
             print(f'Ollama parsing error: {e}')
-            return ReceiptData(merchant_name='Error', total_amount=0.0)
\ No newline at end of file
+            return ReceiptData(merchant_name='Error', total_amount=0.0)
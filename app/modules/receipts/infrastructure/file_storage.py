@@ -1,17 +1,119 @@
 import asyncio
-from supabase import create_client, Client
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional
+import httpx
 from app.core.config import settings
 
-class SupabaseStorage:
-    def __init__(self):
-        self.client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        self.bucket = 'receipts'
+CHUNK_SIZE = 1024 * 1024
+
+class FileStorage(ABC):
+    """Where receipt images live. save() returns the location that is stored in Receipt.file_path, and
+    load() takes that location back."""
+
+    @abstractmethod
+    async def save(self, file_bytes: bytes, file_path: str) -> str: pass
+    @abstractmethod
+    async def load(self, location: str) -> bytes: pass
+    @abstractmethod
+    async def close(self): pass
+
+class SupabaseStorage(FileStorage):
+    """Supabase Storage over its REST API, on one pooled async HTTP client.
+
+    Public URLs follow a fixed pattern, so they are built locally instead of asked for after every upload.
+    """
+
+    def __init__(self, url: Optional[str] = None, service_key: Optional[str] = None, bucket: str = 'receipts', max_connections: int = 10, timeout: float = 30.0):
+        url = (url or settings.SUPABASE_URL).rstrip('/')
+        service_key = service_key or settings.SUPABASE_SERVICE_KEY
+        self.bucket = bucket
+        self.object_url = f'{url}/storage/v1/object/{bucket}/'
+        self.public_url = f'{url}/storage/v1/object/public/{bucket}/'
+        self.client = httpx.AsyncClient(
+            headers={'Authorization': f'Bearer {service_key}', 'apikey': service_key},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
 
     async def save(self, file_bytes: bytes, file_path: str) -> str:
-        return await asyncio.to_thread(self._save_sync, file_bytes, file_path)
+        response = await self.client.post(self.object_url + file_path, content=file_bytes,
+                                          headers={'Content-Type': 'image/jpeg', 'x-upsert': 'true'})
+        response.raise_for_status()
+
+        return self.public_url + file_path
+
+    async def load(self, location: str) -> bytes:
+        # Accepts the public URL saved on the receipt as well as a bare object key
+        key = location[len(self.public_url):] if location.startswith(self.public_url) else location
+        response = await self.client.get(self.object_url + key)
+        response.raise_for_status()
+
+        return response.content
+
+    async def close(self):
+        await self.client.aclose()
+
+class LocalFileStorage(FileStorage):
+    """Content-addressed storage on local disk: objects/<ab>/<cd>/<sha256>.
+
+    Identical files are stored once whatever key they are saved under. Writes go to a temporary file in
+    chunks and are renamed into place, so a crash never leaves a partial object behind.
+    """
+
+    SCHEME = 'local://'
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.objects = os.path.join(self.root, 'objects')
+        self.tmp = os.path.join(self.root, 'tmp')
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.tmp, exist_ok=True)
+
+    async def save(self, file_bytes: bytes, file_path: str) -> str:
+        # file_path is only a label here; the address is the content hash
+        return await asyncio.to_thread(self._save_sync, file_bytes)
+
+    async def load(self, location: str) -> bytes:
+        return await asyncio.to_thread(self._load_sync, location)
+
+    async def close(self):
+        pass
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], digest[2:4], digest)
+
+    def _save_sync(self, file_bytes: bytes) -> str:
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return self.SCHEME + digest
+
+        view = memoryview(file_bytes)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for start in range(0, len(view), CHUNK_SIZE):
+                    f.write(view[start:start + CHUNK_SIZE])
+                f.flush()
+                os.fsync(f.fileno())
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic; a concurrent writer of the same content just replaces an identical file
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return self.SCHEME + digest
 
-    def _save_sync(self, file_bytes: bytes, file_path: str) -> str:
-        self.client.storage.from_(self.bucket).upload(path=file_path, file=file_bytes, file_options={'content-type': 'image/jpeg'})
-        public_url = self.client.storage.from_(self.bucket).get_public_url(file_path)
+    def _load_sync(self, location: str) -> bytes:
+        digest = location[len(self.SCHEME):] if location.startswith(self.SCHEME) else location
+        if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+            raise FileNotFoundError(f'Not a local storage location: {location}')
 
-        return public_url
\ No newline at end of file
+        # One read into a single bytes object; callers hand it to OCR, which needs the bytes themselves
+        with open(self.path_for(digest), 'rb') as f:
+            return f.read()
@@ -0,0 +1,144 @@
+import asyncio
+import multiprocessing
+from typing import Iterable, Optional, Union
+from app.core.config import settings
+from app.modules.receipts.infrastructure.ocr_service import OCRService
+from app.modules.receipts.infrastructure.ocr_batcher import OCRBatcher
+from app.modules.receipts.infrastructure.ocr_pool import OCRProcessPool
+from app.modules.receipts.infrastructure.image_preprocessing import ImagePreprocessor
+from app.modules.receipts.infrastructure.ai_parser import OllamaParser
+from app.modules.receipts.infrastructure.parse_cache import ParseCache, CachedParser
+from app.modules.receipts.infrastructure.rule_parser import RuleBasedExtractor, FastPathParser
+from app.modules.receipts.infrastructure.status_events import ReceiptEventBus
+from app.modules.receipts.infrastructure.file_storage import FileStorage, LocalFileStorage, SupabaseStorage
+
+class ModelRegistry:
+    """Process-wide holder for the heavy receipt components.
+
+    Each component is built once (off the event loop), optionally warmed up with a dummy
+    inference, and then shared by every request or task in the process.
+    """
+
+    COMPONENTS = ('storage', 'events', 'ocr', 'parser')
+
+    def __init__(self):
+        self.ocr: Optional[Union[OCRService, OCRBatcher, OCRProcessPool]] = None
+        self.parser: Optional[Union[OllamaParser, CachedParser, FastPathParser]] = None
+        self.storage: Optional[FileStorage] = None
+        self.events: Optional[ReceiptEventBus] = None
+        self.ready = False
+        self.error: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def startup(self, components: Iterable[str] = COMPONENTS):
+        self.ready = False
+        self.error = None
+
+        try:
+            for name in components:
+                await self.get(name)
+        except Exception as e:
+            self.error = f'{type(e).__name__}: {e}'
+            print(f'Model registry failed to start: {self.error}')
+            return
+
+        self.ready = True
+        print('Model registry is ready!')
+
+    async def get(self, name: str):
+        if getattr(self, name, None) is not None:
+            return getattr(self, name)
+
+        async with self._lock:
+            if getattr(self, name, None) is None:
+                setattr(self, name, await getattr(self, f'_build_{name}')())
+
+        return getattr(self, name)
+
+    def stats(self) -> dict:
+        # Live counters of every built layer, for /metrics
+        layers = {}
+        ocr = self.ocr
+        if isinstance(ocr, OCRBatcher):
+            layers['ocr_batch'] = ocr.stats()
+            ocr = ocr.ocr
+        if isinstance(ocr, OCRProcessPool):
+            layers['ocr_pool'] = ocr.stats()
+        if getattr(ocr, 'preprocessor', None) is not None:
+            layers['ocr_preprocess'] = ocr.preprocessor.stats()
+
+        parser = self.parser
+        if isinstance(parser, FastPathParser):
+            layers['fast_path'] = parser.stats()
+            parser = parser.parser
+        if isinstance(parser, CachedParser):
+            layers['parse_cache'] = parser.cache.stats()
+            parser = parser.parser
+        if isinstance(parser, OllamaParser):
+            layers['llm'] = parser.stats()
+
+        if self.events is not None:
+            layers['events'] = self.events.stats()
+        return layers
+
+    async def shutdown(self):
+        self.ready = False
+        for component in (self.ocr, self.parser, self.storage, self.events):
+            close = getattr(component, 'close', None)
+            if close is not None:
+                await close()
+        self.ocr = None
+        self.parser = None
+        self.storage = None
+        self.events = None
+
+    async def _build_storage(self) -> FileStorage:
+        if settings.STORAGE_BACKEND == 'local':
+            return await asyncio.to_thread(LocalFileStorage, settings.LOCAL_STORAGE_ROOT)
+        return SupabaseStorage(max_connections=settings.STORAGE_MAX_CONNECTIONS)
+
+    async def _build_events(self) -> ReceiptEventBus:
+        return ReceiptEventBus(settings.REDIS_URL)
+
+    async def _build_ocr(self) -> Union[OCRService, OCRBatcher, OCRProcessPool]:
+        preprocessor = None
+        if settings.OCR_PREPROCESS:
+            preprocessor = ImagePreprocessor(max_side=settings.OCR_MAX_SIDE, grayscale=settings.OCR_GRAYSCALE,
+                                             crop=settings.OCR_CROP_RECEIPT, autocontrast=settings.OCR_AUTOCONTRAST)
+
+        # Daemonic processes (Celery prefork workers) may not have children, so they run OCR in-process
+        if settings.OCR_PROCESS_POOL and multiprocessing.current_process().daemon:
+            print('OCR process pool is not available in a daemonic process; using in-process OCR')
+        elif settings.OCR_PROCESS_POOL:
+            pool = OCRProcessPool(size=settings.OCR_POOL_SIZE, threads_per_process=settings.OCR_THREADS_PER_PROCESS, preprocessor=preprocessor)
+            if settings.MODEL_WARMUP:
+                await asyncio.to_thread(pool.warmup)
+            return pool
+
+        ocr = await asyncio.to_thread(OCRService, preprocessor)
+        if settings.MODEL_WARMUP:
+            await asyncio.to_thread(ocr.warmup)
+        if settings.OCR_BATCH_SIZE > 1:
+            return OCRBatcher(ocr, max_batch_size=settings.OCR_BATCH_SIZE, max_wait_ms=settings.OCR_BATCH_WAIT_MS)
+        return ocr
+
+    async def _build_parser(self) -> Union[OllamaParser, CachedParser, FastPathParser]:
+        parser = OllamaParser(model=settings.OLLAMA_MODEL, host=settings.OLLAMA_HOST, max_parallel=settings.OLLAMA_MAX_PARALLEL,
+                              timeout=settings.OLLAMA_TIMEOUT)
+        await parser.ensure_model_ready()
+        if settings.MODEL_WARMUP:
+            await parser.warmup()
+        return self.wrap_parser(parser)
+
+    def wrap_parser(self, parser):
+        # The parse cache and rule-based fast path as configured, around any parser with parse() and model
+        if settings.PARSE_CACHE_ENABLED:
+            cache = ParseCache(parser.model, max_entries=settings.PARSE_CACHE_SIZE, ttl=settings.PARSE_CACHE_TTL,
+                               redis_url=settings.REDIS_URL if settings.PARSE_CACHE_REDIS else None)
+            parser = CachedParser(parser, cache)
+        if settings.FAST_PATH_ENABLED:
+            extractor = RuleBasedExtractor(day_first=settings.FAST_PATH_DAY_FIRST)
+            parser = FastPathParser(parser, extractor, min_confidence=settings.FAST_PATH_MIN_CONFIDENCE)
+        return parser
+
+model_registry = ModelRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.core.database import Base
 import uuid
@@ -11,6 +11,7 @@ class ReceiptModel(Base):
     file_path = Column(Text)
     file_hash = Column(String(64))
     user_id = Column(String(100))
+    batch_id = Column(UUID(as_uuid=True), nullable=True)
     status = Column(String(50), nullable=False)
     ocr_text = Column(Text)
     parsed_data = Column(JSON)
@@ -18,6 +19,14 @@ class ReceiptModel(Base):
     error_message = Column(Text)
     created_at = Column(DateTime)
 
+    __table_args__ = (
+        Index('ix_receipts_file_hash_user_id', 'file_hash', 'user_id'),
+        Index('ix_receipts_batch_id', 'batch_id'),
+        # Keyset pagination of a user's receipts, optionally by status
+        Index('ix_receipts_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_receipts_user_id_status_created_at_id', 'user_id', 'status', 'created_at', 'id'),
+    )
+
     def to_domain(self):
         from app.modules.receipts.domain.models import Receipt, ProcessingStatus
         return Receipt(
@@ -26,6 +35,7 @@ class ReceiptModel(Base):
             file_path=self.file_path,
             file_hash=self.file_hash,
             user_id=self.user_id,
+            batch_id=self.batch_id,
             status=ProcessingStatus(self.status),
             ocr_text=self.ocr_text,
             parsed_data=self.parsed_data,
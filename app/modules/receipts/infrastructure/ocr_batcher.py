@@ -0,0 +1,90 @@
+import asyncio
+from collections import Counter
+from typing import Optional
+from app.modules.receipts.infrastructure.ocr_service import OCRService
+
+class OCRBatcher:
+    """Micro-batching front end for OCRService.
+
+    Concurrent callers are queued; a single consumer collects up to max_batch_size images (or whatever
+    arrived within max_wait_ms of the first one) and runs them through one batched predict call, then
+    resolves each caller's future with its own text. Same extract_text interface as OCRService.
+    """
+
+    def __init__(self, ocr: OCRService, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.ocr = ocr
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.images = 0
+        self.occupancy = Counter()
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+
+    async def extract_text(self, image_bytes: bytes) -> str:
+        self._ensure_started()
+        # Decoding is per image and releases the GIL in PIL, so it stays outside the batch
+        image = await asyncio.to_thread(self.ocr.decode_image, image_bytes)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'images': self.images,
+            'mean_occupancy': self.images / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'occupancy': dict(sorted(self.occupancy.items())),
+            'queued': self._queue.qsize() if self._queue else 0,
+        }
+
+    async def close(self):
+        if self._consumer is not None:
+            self._consumer.cancel()
+            self._consumer = None
+
+    def _ensure_started(self):
+        if self._consumer is None or self._consumer.done():
+            self._queue = asyncio.Queue()
+            self._consumer = asyncio.get_running_loop().create_task(self._consume())
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Callers that gave up while queued do not need OCR
+            batch = [(image, future) for image, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.images += len(batch)
+            self.occupancy[len(batch)] += 1
+
+            try:
+                texts = await asyncio.to_thread(self.ocr.recognize_batch, [image for image, _ in batch])
+                if len(texts) != len(batch):
+                    raise RuntimeError(f'OCR returned {len(texts)} results for a batch of {len(batch)} images')
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), text in zip(batch, texts):
+                if not future.done():
+                    future.set_result(text)
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Tuple
+import numpy as np
+from app.modules.receipts.infrastructure.ocr_service import OCRService, decode_image
+from app.modules.receipts.infrastructure.image_preprocessing import ImagePreprocessor
+
+# Set in each pool process by _init_worker; every process owns exactly one PaddleOCR instance
+_worker_ocr: Optional[OCRService] = None
+
+def _init_worker(threads_per_process: int):
+    global _worker_ocr
+    # Keep each process's predictor to its share of the cores, otherwise N processes oversubscribe the box.
+    # Paddle is already imported by the time this runs, so thread environment variables would be read too late
+    _worker_ocr = OCRService(cpu_threads=threads_per_process)
+
+def _recognize_shared(shm_name: str, shape: Tuple[int, ...], dtype: str) -> str:
+    shm = SharedMemory(name=shm_name)
+    try:
+        image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        text = _worker_ocr.recognize_batch([image])[0]
+        # The view must be released before the segment can be closed
+        del image
+        return text
+    finally:
+        shm.close()
+
+def _warmup_worker() -> bool:
+    _worker_ocr.warmup()
+    return True
+
+class OCRProcessPool:
+    """Runs OCR in a pool of processes, each with its own PaddleOCR instance.
+
+    Images are decoded in the API process and handed to the pool through shared memory, so only the
+    segment name, shape and dtype are pickled. Same extract_text interface as OCRService.
+    """
+
+    def __init__(self, size: int = 0, threads_per_process: int = 1, preprocessor: Optional[ImagePreprocessor] = None):
+        self.preprocessor = preprocessor
+        self.threads_per_process = max(1, threads_per_process)
+        self.size = size or max(1, (os.cpu_count() or 1) // self.threads_per_process)
+        # spawn, not fork: Paddle and the event loop's threads do not survive a fork
+        self.executor = ProcessPoolExecutor(max_workers=self.size, mp_context=get_context('spawn'),
+                                            initializer=_init_worker, initargs=(self.threads_per_process,))
+        self.in_flight = 0
+
+    async def extract_text(self, image_bytes: bytes) -> str:
+        image = await asyncio.to_thread(decode_image, image_bytes, self.preprocessor)
+        shm = SharedMemory(create=True, size=max(1, image.nbytes))
+        self.in_flight += 1
+
+        try:
+            np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, _recognize_shared, shm.name, image.shape, image.dtype.str)
+        finally:
+            self.in_flight -= 1
+            shm.close()
+            shm.unlink()
+
+    def warmup(self):
+        # Best effort: one task per slot starts the processes, and each loads its PaddleOCR instance on start
+        futures = [self.executor.submit(_warmup_worker) for _ in range(self.size)]
+        for future in futures:
+            future.result()
+
+    def stats(self) -> dict:
+        return {'processes': self.size, 'threads_per_process': self.threads_per_process, 'in_flight': self.in_flight}
+
+    async def close(self):
+        await asyncio.to_thread(self.executor.shutdown, True, cancel_futures=True)
@@ -1,23 +1,57 @@
 import io
+import threading
+from typing import List, Optional
 import numpy as np
 from PIL import Image
 from paddleocr import PaddleOCR
 import asyncio
+from app.modules.receipts.infrastructure.image_preprocessing import ImagePreprocessor
+
+def decode_image(image_bytes: bytes, preprocessor: Optional[ImagePreprocessor] = None) -> np.ndarray:
+    if preprocessor is not None:
+        return preprocessor.process(image_bytes)
+
+    image = Image.open(io.BytesIO(image_bytes))
+    return np.array(image)
 
 class OCRService:
-    def __init__(self):
-        self.ocr = PaddleOCR(use_angle_cls=True, lang='en', show_log=False)
+    def __init__(self, preprocessor: Optional[ImagePreprocessor] = None, cpu_threads: Optional[int] = None):
+        self.preprocessor = preprocessor
+        # cpu_threads caps the predictor's own thread pool; None keeps Paddle's default
+        options = {'cpu_threads': cpu_threads} if cpu_threads else {}
+        self.ocr = PaddleOCR(use_angle_cls=True, lang='en', show_log=False, **options)
+        # A single PaddleOCR predictor is shared by every request, and it is not safe to call concurrently
+        self._lock = threading.Lock()
 
     async def extract_text(self, image_bytes: bytes) -> str:
         return await asyncio.to_thread(self._extract_sync, image_bytes)
 
+    def warmup(self):
+        blank = np.full((64, 256, 3), 255, dtype=np.uint8)
+        with self._lock:
+            self.ocr.predict(blank, cls=True)
+
+    def decode_image(self, image_bytes: bytes) -> np.ndarray:
+        return decode_image(image_bytes, self.preprocessor)
+
+    def recognize_batch(self, images: List[np.ndarray]) -> List[str]:
+        with self._lock:
+            result = self.ocr.predict(images, cls=True)
+
+        return [self._to_text(page) for page in (result or [])]
+
     def _extract_sync(self, image_bytes: bytes) -> str:
-        image = Image.open(io.BytesIO(image_bytes))
-        image_np = np.array(image)
-        result = self.ocr.predict(image_np, cls=True)
+        image_np = self.decode_image(image_bytes)
+        with self._lock:
+            result = self.ocr.predict(image_np, cls=True)
+
+        if not result:
+            return ''
+        return self._to_text(result[0])
 
-        if not result or not result[0]:
+    def _to_text(self, page) -> str:
+        if not page:
             return ''
 
-        lines = [line[1][0] for line in result[0]]
-        return '/n'.join(lines)
\ No newline at end of file
+        lines = [line[1][0] for line in page]
+        return '\n'.join(lines)
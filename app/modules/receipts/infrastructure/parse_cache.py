@@ -0,0 +1,119 @@
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+import redis.asyncio as redis
+from app.modules.receipts.infrastructure.ai_parser import OllamaParser, ReceiptData, PROMPT_VERSION, FALLBACK_MERCHANTS
+
+def normalize_ocr_text(ocr_text: str) -> str:
+    # Only case and whitespace are normalised; digits must survive, otherwise two visits to the same shop with
+    # different totals would share an entry
+    return re.sub(r'\s+', ' ', ocr_text).strip().lower()
+
+class ParseCache:
+    """Two-tier cache of parsed receipts: an in-process LRU in front of Redis.
+
+    Keys hash the normalised OCR text together with the model name and PROMPT_VERSION, so changing either
+    one starts from an empty cache. Redis failures degrade to the local tier.
+    """
+
+    def __init__(self, model: str, max_entries: int = 1024, ttl: int = 604800, redis_url: Optional[str] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = redis.from_url(redis_url) if redis_url else None
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+        self._local: OrderedDict = OrderedDict()
+
+    def key(self, ocr_text: str) -> str:
+        digest = hashlib.sha256(f'{self.model}\0{PROMPT_VERSION}\0{normalize_ocr_text(ocr_text)}'.encode()).hexdigest()
+        return f'receipt-parse:{digest}'
+
+    async def get(self, ocr_text: str) -> Optional[ReceiptData]:
+        key = self.key(ocr_text)
+
+        entry = self._local.get(key)
+        if entry is not None:
+            expires_at, data = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return ReceiptData(**data)
+            del self._local[key]
+
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f'Parse cache Redis error: {e}')
+                raw = None
+            if raw is not None:
+                data = json.loads(raw)
+                self._remember(key, data)
+                self.redis_hits += 1
+                return ReceiptData(**data)
+
+        self.misses += 1
+        return None
+
+    async def set(self, ocr_text: str, parsed: ReceiptData):
+        key = self.key(ocr_text)
+        data = parsed.model_dump()
+        self._remember(key, data)
+
+        if self.redis is not None:
+            try:
+                await self.redis.set(key, json.dumps(data), ex=self.ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                print(f'Parse cache Redis error: {e}')
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            'local_hits': self.local_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'redis_errors': self.redis_errors,
+            'hit_ratio': (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+            'local_entries': len(self._local),
+        }
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    def _remember(self, key: str, data: dict):
+        self._local[key] = (time.monotonic() + self.ttl, data)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+class CachedParser:
+    """OllamaParser front end that answers repeat receipts from ParseCache instead of calling the LLM."""
+
+    def __init__(self, parser: OllamaParser, cache: ParseCache):
+        self.parser = parser
+        self.cache = cache
+        self.model = parser.model
+
+    async def parse(self, ocr_text: str) -> ReceiptData:
+        cached = await self.cache.get(ocr_text)
+        if cached is not None:
+            return cached
+
+        parsed = await self.parser.parse(ocr_text)
+        # Timeouts and unparseable answers are not worth remembering
+        if parsed.merchant_name not in FALLBACK_MERCHANTS:
+            await self.cache.set(ocr_text, parsed)
+
+        return parsed
+
+    async def close(self):
+        await self.cache.close()
@@ -1,10 +1,24 @@
-from sqlalchemy import select
+from datetime import datetime, timezone
+from sqlalchemy import and_, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import Optional
-from app.modules.receipts.domain.models import Receipt
+from typing import Iterable, List, Optional, Sequence, Tuple
+from app.modules.receipts.domain.models import Receipt, FAILED_STATUSES, FINAL_STATUSES
 from app.modules.receipts.infrastructure.models import ReceiptModel
 
+# Set on insert only
+IMMUTABLE_COLUMNS = ('user_id', 'batch_id', 'created_at')
+# Everything but the file, OCR text and parsed data, for status reads
+SUMMARY_COLUMNS = (ReceiptModel.id, ReceiptModel.filename, ReceiptModel.user_id, ReceiptModel.batch_id, ReceiptModel.status,
+                   ReceiptModel.journal_entry_id, ReceiptModel.error_message, ReceiptModel.created_at)
+
+def _utc_naive(value: datetime) -> datetime:
+    # receipts.created_at is a naive UTC timestamp column
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class ReceiptRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -14,35 +28,96 @@ class ReceiptRepository:
         model = result.scalar_one_or_none()
         return model.to_domain() if model else None
 
-    async def save(self, receipt: Receipt) -> Receipt:
-        stmt = select(ReceiptModel).where(ReceiptModel.id == receipt.id)
+    async def get_summary(self, receipt_id: UUID) -> Optional[Receipt]:
+        result = await self.session.execute(select(*SUMMARY_COLUMNS).where(ReceiptModel.id == receipt_id))
+        row = result.first()
+        return Receipt(**row._asdict()) if row else None
+
+    async def find_by_hash(self, file_hash: str, user_id: str, stale_before: datetime) -> Optional[Receipt]:
+        # A receipt that finished without failing, or one still in progress that is younger than stale_before;
+        # an older in-progress receipt belongs to a process that died and must not swallow the re-upload
+        finished = [s.value for s in FINAL_STATUSES if s not in FAILED_STATUSES]
+        stmt = (select(ReceiptModel)
+                .where(ReceiptModel.file_hash == file_hash, ReceiptModel.user_id == user_id)
+                .where(or_(ReceiptModel.status.in_(finished),
+                           and_(ReceiptModel.status.not_in([s.value for s in FINAL_STATUSES]), ReceiptModel.created_at >= _utc_naive(stale_before))))
+                .order_by(ReceiptModel.created_at.desc())
+                .limit(1))
         result = await self.session.execute(stmt)
         model = result.scalar_one_or_none()
+        return model.to_domain() if model else None
+
+    async def find_ocr_by_hash(self, file_hash: str, user_id: Optional[str] = None, exclude_id: Optional[UUID] = None) -> Optional[Receipt]:
+        stmt = select(ReceiptModel).where(ReceiptModel.file_hash == file_hash, ReceiptModel.ocr_text.is_not(None))
+        if user_id is not None:
+            stmt = stmt.where(ReceiptModel.user_id == user_id)
+        if exclude_id is not None:
+            stmt = stmt.where(ReceiptModel.id != exclude_id)
+        result = await self.session.execute(stmt.order_by(ReceiptModel.created_at.desc()).limit(1))
+        model = result.scalar_one_or_none()
+        return model.to_domain() if model else None
+
+    async def list_by_batch(self, batch_id: UUID, user_id: str) -> List[Receipt]:
+        # Batch listings only need the summary columns, not ocr_text/parsed_data
+        stmt = (select(*SUMMARY_COLUMNS)
+                .where(ReceiptModel.batch_id == batch_id, ReceiptModel.user_id == user_id)
+                .order_by(ReceiptModel.created_at, ReceiptModel.id))
+        result = await self.session.execute(stmt)
+        return [Receipt(**row._asdict()) for row in result]
+
+    async def list_page(self, user_id: Optional[str], statuses: Optional[Sequence[str]] = None, created_from: Optional[datetime] = None,
+                        created_to: Optional[datetime] = None, after: Optional[Tuple[datetime, UUID]] = None, limit: int = 50,
+                        include: Sequence[str] = ()) -> List[Receipt]:
+        # Newest first, continuing strictly after the (created_at, id) of the previous page's last row;
+        # ocr_text and parsed_data are only read when asked for. No user_id lists every user's receipts
+        columns = SUMMARY_COLUMNS + (ReceiptModel.file_path,) + tuple(getattr(ReceiptModel, name) for name in include)
+        stmt = select(*columns)
+        if user_id is not None:
+            stmt = stmt.where(ReceiptModel.user_id == user_id)
+        if statuses:
+            stmt = stmt.where(ReceiptModel.status.in_(statuses))
+        if created_from is not None:
+            stmt = stmt.where(ReceiptModel.created_at >= _utc_naive(created_from))
+        if created_to is not None:
+            stmt = stmt.where(ReceiptModel.created_at < _utc_naive(created_to))
+        if after is not None:
+            stmt = stmt.where(tuple_(ReceiptModel.created_at, ReceiptModel.id) < (_utc_naive(after[0]), after[1]))
+        stmt = stmt.order_by(ReceiptModel.created_at.desc(), ReceiptModel.id.desc()).limit(limit)
+
+        result = await self.session.execute(stmt)
+        return [Receipt(**row._asdict()) for row in result]
+
+    async def transition(self, receipt_id: UUID, expected: str, status: str) -> bool:
+        # Compare-and-set on the status, clearing the last error; False when another writer moved it first
+        stmt = (update(ReceiptModel)
+                .where(ReceiptModel.id == receipt_id, ReceiptModel.status == expected)
+                .values(status=status, error_message=None))
+        result = await self.session.execute(stmt)
+        return result.rowcount == 1
+
+    async def save(self, receipt: Receipt, fields: Optional[Iterable[str]] = None) -> Receipt:
+        # One INSERT ... ON CONFLICT DO UPDATE instead of SELECT + UPDATE/INSERT; on conflict only `fields`
+        # (default: every mutable column) are written
+        values = {
+            'filename': receipt.filename,
+            'file_path': receipt.file_path,
+            'file_hash': receipt.file_hash,
+            'user_id': receipt.user_id,
+            'batch_id': receipt.batch_id,
+            'status': receipt.status.value,
+            'ocr_text': receipt.ocr_text,
+            'parsed_data': receipt.parsed_data,
+            'journal_entry_id': receipt.journal_entry_id,
+            'error_message': receipt.error_message,
+            'created_at': _utc_naive(receipt.created_at),
+        }
+        changed = [f for f in (fields if fields is not None else values) if f not in IMMUTABLE_COLUMNS]
 
-        if model:
-            model.filename = receipt.filename
-            model.file_path = receipt.file_path
-            model.file_hash = receipt.file_hash
-            model.status = receipt.status.value
-            model.ocr_text = receipt.ocr_text
-            model.parsed_data = receipt.parsed_data
-            model.journal_entry_id = receipt.journal_entry_id
-            model.error_message = receipt.error_message
+        stmt = insert(ReceiptModel).values(id=receipt.id, **values)
+        if changed:
+            stmt = stmt.on_conflict_do_update(index_elements=[ReceiptModel.id], set_={f: stmt.excluded[f] for f in changed})
         else:
-            model = ReceiptModel(
-                id=receipt.id,
-                filename = receipt.filename,
-                file_path = receipt.file_path,
-                file_hash = receipt.file_hash,
-                user_id = receipt.user_id,
-                status = receipt.status.value,
-                ocr_text = receipt.ocr_text,
-                parsed_data = receipt.parsed_data,
-                journal_entry_id = receipt.journal_entry_id,
-                error_message = receipt.error_message,
-                created_at = receipt.created_at
-            )
-            self.session.add(model)
-        await self.session.flush()
+            stmt = stmt.on_conflict_do_nothing(index_elements=[ReceiptModel.id])
+        await self.session.execute(stmt)
 
         return receipt
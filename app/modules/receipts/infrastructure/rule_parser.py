@@ -0,0 +1,154 @@
+import re
+from datetime import date
+from typing import List, Optional, Tuple
+from app.modules.receipts.infrastructure.ai_parser import OllamaParser, ReceiptData
+
+AMOUNT = re.compile(r'(?<![\d.,])(\d{1,3}(?:[.,]\d{3})+|\d+)[.,](\d{2})(?![\d])')
+TOTAL_LINE = re.compile(r'\b(grand\s*total|total\s*due|amount\s*due|balance\s*due|total)\b', re.IGNORECASE)
+SUBTOTAL_LINE = re.compile(r'\b(sub\s*-?\s*total|total\s*(tax|vat|items?|qty|discount|savings?))\b', re.IGNORECASE)
+ISO_DATE = re.compile(r'\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b')
+NUMERIC_DATE = re.compile(r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{2}|\d{4})\b')
+NAMED_DATE = re.compile(r'\b(?:(\d{1,2})\s+([a-z]{3})[a-z]*\.?,?\s+(\d{4})|([a-z]{3})[a-z]*\.?\s+(\d{1,2}),?\s+(\d{4}))\b', re.IGNORECASE)
+MONTHS = {name: i + 1 for i, name in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+NOT_MERCHANT = re.compile(r'\b(receipt|invoice|tel|phone|fax|www\.|https?:|vat|tax\s*id|cui|cif|welcome|street|str\.|road|ave)\b', re.IGNORECASE)
+
+class RuleBasedExtractor:
+    """Deterministic extraction of total, date and merchant from OCR text, with a confidence score.
+
+    Confidence adds up per field found: total 0.5, date 0.3 (0.2 when day/month order is ambiguous),
+    merchant 0.2. Without a total the score can never reach a sensible threshold.
+    """
+
+    def __init__(self, day_first: bool = True):
+        self.day_first = day_first
+
+    def extract(self, ocr_text: str) -> Tuple[ReceiptData, float]:
+        lines = [line.strip() for line in ocr_text.splitlines() if line.strip()]
+        confidence = 0.0
+
+        total = self._find_total(lines)
+        if total is not None:
+            confidence += 0.5
+
+        transaction_date, ambiguous = self._find_date(lines)
+        if transaction_date is not None:
+            confidence += 0.2 if ambiguous else 0.3
+
+        merchant = self._find_merchant(lines)
+        if merchant is not None:
+            confidence += 0.2
+
+        confidence = round(confidence, 2)
+        data = ReceiptData(merchant_name=merchant, transaction_date=transaction_date.isoformat() if transaction_date else None,
+                           total_amount=total, confidence=confidence)
+        return data, confidence
+
+    def _find_total(self, lines: List[str]) -> Optional[float]:
+        candidates = []
+        for i, line in enumerate(lines):
+            if not TOTAL_LINE.search(line) or SUBTOTAL_LINE.search(line):
+                continue
+            # The amount is usually on the same line, sometimes OCR splits it onto the next one
+            amounts = self._amounts(line) or (self._amounts(lines[i + 1]) if i + 1 < len(lines) else [])
+            if amounts:
+                candidates.append(amounts[-1])
+
+        if not candidates:
+            return None
+        # Later total lines (grand total after card/tip lines) win; a disagreeing earlier total is a warning sign
+        total = candidates[-1]
+        if any(abs(c - total) > 0.005 for c in candidates) and total < max(candidates):
+            return None
+
+        return total
+
+    def _amounts(self, line: str) -> List[float]:
+        amounts = []
+        for whole, cents in AMOUNT.findall(line):
+            amounts.append(float(re.sub(r'[.,]', '', whole) + '.' + cents))
+        return amounts
+
+    def _find_date(self, lines: List[str]) -> Tuple[Optional[date], bool]:
+        for line in lines:
+            match = ISO_DATE.search(line)
+            if match:
+                parsed = self._date(int(match[1]), int(match[2]), int(match[3]))
+                if parsed:
+                    return parsed, False
+
+            match = NAMED_DATE.search(line)
+            if match:
+                day, month, year = (match[1], match[2], match[3]) if match[1] else (match[5], match[4], match[6])
+                parsed = self._date(int(year), MONTHS.get(month.lower()[:3], 0), int(day))
+                if parsed:
+                    return parsed, False
+
+            match = NUMERIC_DATE.search(line)
+            if match:
+                first, second, year = int(match[1]), int(match[2]), int(match[3])
+                year += 2000 if year < 100 else 0
+                if first > 12:
+                    day, month, ambiguous = first, second, False
+                elif second > 12:
+                    day, month, ambiguous = second, first, False
+                else:
+                    day, month = (first, second) if self.day_first else (second, first)
+                    ambiguous = first != second
+                parsed = self._date(year, month, day)
+                if parsed:
+                    return parsed, ambiguous
+
+        return None, False
+
+    def _date(self, year: int, month: int, day: int) -> Optional[date]:
+        try:
+            parsed = date(year, month, day)
+        except ValueError:
+            return None
+        return parsed if 2000 <= parsed.year <= date.today().year + 1 else None
+
+    def _find_merchant(self, lines: List[str]) -> Optional[str]:
+        # The merchant is normally the first wordy line of the header
+        for line in lines[:4]:
+            letters = sum(c.isalpha() for c in line)
+            if letters < 3 or letters < len(line) / 2 or NOT_MERCHANT.search(line):
+                continue
+            if AMOUNT.search(line) or ISO_DATE.search(line) or NUMERIC_DATE.search(line):
+                continue
+            return line
+
+        return None
+
+class FastPathParser:
+    """Answers from RuleBasedExtractor when it is confident enough and falls back to the LLM parser otherwise."""
+
+    def __init__(self, parser: OllamaParser, extractor: RuleBasedExtractor, min_confidence: float = 0.8):
+        self.parser = parser
+        self.extractor = extractor
+        self.min_confidence = min_confidence
+        self.model = parser.model
+        self.fast_path = 0
+        self.llm_path = 0
+
+    async def parse(self, ocr_text: str) -> ReceiptData:
+        data, confidence = self.extractor.extract(ocr_text)
+        if confidence >= self.min_confidence:
+            self.fast_path += 1
+            return data
+
+        self.llm_path += 1
+        return await self.parser.parse(ocr_text)
+
+    def stats(self) -> dict:
+        total = self.fast_path + self.llm_path
+        return {
+            'fast_path': self.fast_path,
+            'llm_path': self.llm_path,
+            'fast_path_ratio': self.fast_path / total if total else 0.0,
+            'min_confidence': self.min_confidence,
+        }
+
+    async def close(self):
+        close = getattr(self.parser, 'close', None)
+        if close is not None:
+            await close()
@@ -0,0 +1,64 @@
+import json
+from typing import AsyncIterator, Optional
+from uuid import UUID
+import redis.asyncio as redis
+from app.modules.receipts.domain.models import Receipt
+
+class ReceiptEventBus:
+    """Receipt status transitions over Redis pub/sub, one channel per receipt.
+
+    Publishing is fire-and-forget from the pipeline's point of view: a Redis failure is logged and the
+    receipt carries on. Subscribers only see events published after they subscribed.
+    """
+
+    def __init__(self, redis_url: str):
+        self.redis = redis.from_url(redis_url)
+        self.published = 0
+        self.errors = 0
+
+    def channel(self, receipt_id: UUID) -> str:
+        return f'receipt-status:{receipt_id}'
+
+    def event(self, receipt: Receipt) -> dict:
+        return {
+            'receipt_id': str(receipt.id),
+            'status': receipt.status.value,
+            'error_message': receipt.error_message,
+            'journal_entry_id': str(receipt.journal_entry_id) if receipt.journal_entry_id else None,
+        }
+
+    async def publish(self, receipt: Receipt):
+        try:
+            await self.redis.publish(self.channel(receipt.id), json.dumps(self.event(receipt)))
+            self.published += 1
+        except Exception as e:
+            self.errors += 1
+            print(f'Receipt event publish failed: {e}')
+
+    async def subscribe(self, receipt_id: UUID) -> 'ReceiptSubscription':
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel(receipt_id))
+        return ReceiptSubscription(pubsub)
+
+    def stats(self) -> dict:
+        return {'published': self.published, 'errors': self.errors}
+
+    async def close(self):
+        await self.redis.aclose()
+
+class ReceiptSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def events(self, timeout: float) -> AsyncIterator[Optional[dict]]:
+        # Yields None after `timeout` seconds without an event so the caller can send a keep-alive
+        while True:
+            message = await self.pubsub.get_message(timeout=timeout)
+            if message is None:
+                yield None
+                continue
+            if message['type'] == 'message':
+                yield json.loads(message['data'])
+
+    async def close(self):
+        await self.pubsub.aclose()
@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import List, Optional
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+MAX_RECEIPT_BYTES = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+ZIP_TYPES = (b'application/zip', b'application/x-zip-compressed')
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'mif1', b'msf1'):
+        return 'image/heic'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'image/tiff'
+    if head.startswith(b'GIF8'):
+        return 'image/gif'
+    if head.startswith(b'BM'):
+        return 'image/bmp'
+    if head.startswith(b'PK\x03\x04'):
+        return 'application/zip'
+    return None
+
+class SpooledFile:
+    """One uploaded file written to disk as it arrives, hashed and type-checked on the fly."""
+
+    def __init__(self, filename: str, path: str, max_bytes: int = MAX_RECEIPT_BYTES):
+        self.filename = filename
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.content_type: Optional[str] = None
+        self.error: Optional[str] = None
+        self._head = b''
+        self._hash = hashlib.sha256()
+        self._file = open(path, 'wb')
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes):
+        if self.error:
+            return
+
+        if self.content_type is None and len(self._head) < 16:
+            self._head += data[:16 - len(self._head)]
+            if len(self._head) == 16 and not self._check_type():
+                return
+
+        self.size += len(data)
+        # Archives are only bounded by the request size limit; their entries get checked one by one
+        if self.size > self.max_bytes and self.content_type != 'application/zip':
+            self.reject(f'File too large (max {self.max_bytes // (1024 * 1024)}MB)')
+            return
+
+        self._hash.update(data)
+        self._file.write(data)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.error and self.content_type is None:
+            self._check_type()
+
+    def read(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def _check_type(self) -> bool:
+        self.content_type = sniff_content_type(self._head)
+        if self.content_type is None:
+            self.reject('File must be an image')
+            return False
+        return True
+
+    def reject(self, error: str):
+        self.error = error
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class BulkUpload:
+    """Streams a multipart or ZIP request body to a temporary directory, one file at a time.
+
+    Memory use is bounded by the chunk size regardless of how many receipts the batch holds; the spooled
+    files are read back one by one when they are processed. Call cleanup() once they are.
+    """
+
+    def __init__(self, max_total_bytes: int, max_files: int):
+        self.max_total_bytes = max_total_bytes
+        self.max_files = max_files
+        self.directory = tempfile.mkdtemp(prefix='receipts-bulk-')
+        self.files: List[SpooledFile] = []
+        self.received = 0
+        self._spooled = 0
+
+    async def receive(self, request: Request):
+        content_type, params = parse_options_header(request.headers.get('content-type', ''))
+
+        if content_type == b'multipart/form-data' and b'boundary' in params:
+            await self._receive_multipart(request, params[b'boundary'])
+        elif content_type in ZIP_TYPES:
+            archive = self._new_file('upload.zip')
+            async for chunk in request.stream():
+                self._count(len(chunk))
+                await asyncio.to_thread(archive.write, chunk)
+            archive.close()
+            if archive.content_type != 'application/zip':
+                raise HTTPException(status_code=400, detail='Request body is not a ZIP archive')
+        else:
+            raise HTTPException(status_code=415, detail='Send multipart/form-data with image files or an application/zip body')
+
+        # ZIP archives, whether sent as the body or as multipart parts, are expanded entry by entry
+        for archive in [f for f in self.files if f.content_type == 'application/zip']:
+            self.files.remove(archive)
+            await asyncio.to_thread(self._expand_zip, archive)
+
+        if not self.files:
+            raise HTTPException(status_code=400, detail='No files in upload')
+
+    def cleanup(self):
+        # receive() may have stopped mid-part, with that file still open
+        for spooled in self.files:
+            spooled.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    async def _receive_multipart(self, request: Request, boundary: bytes):
+        headers = {}
+        header = {'field': b'', 'value': b''}
+        current: List[Optional[SpooledFile]] = [None]
+
+        def on_part_begin():
+            headers.clear()
+
+        def on_header_field(data, start, end):
+            header['field'] += data[start:end]
+
+        def on_header_value(data, start, end):
+            header['value'] += data[start:end]
+
+        def on_header_end():
+            headers[header['field'].lower()] = header['value']
+            header['field'], header['value'] = b'', b''
+
+        def on_headers_finished():
+            _, options = parse_options_header(headers.get(b'content-disposition', b''))
+            filename = options.get(b'filename')
+            # Plain form fields are ignored; only file parts become receipts
+            current[0] = self._new_file(os.path.basename(filename.decode('utf-8', 'replace')) or 'receipt') if filename is not None else None
+
+        def on_part_data(data, start, end):
+            if current[0] is not None:
+                current[0].write(data[start:end])
+
+        def on_part_end():
+            if current[0] is not None:
+                current[0].close()
+
+        parser = MultipartParser(boundary, {
+            'on_part_begin': on_part_begin,
+            'on_header_field': on_header_field,
+            'on_header_value': on_header_value,
+            'on_header_end': on_header_end,
+            'on_headers_finished': on_headers_finished,
+            'on_part_data': on_part_data,
+            'on_part_end': on_part_end,
+        })
+
+        # The parser's callbacks hash and write each part to disk, so it runs off the event loop
+        async for chunk in request.stream():
+            self._count(len(chunk))
+            await asyncio.to_thread(parser.write, chunk)
+        await asyncio.to_thread(parser.finalize)
+
+    def _expand_zip(self, archive: SpooledFile):
+        try:
+            with zipfile.ZipFile(archive.path) as zf:
+                for info in zf.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or not name or info.filename.startswith('__MACOSX/'):
+                        continue
+
+                    spooled = self._new_file(name)
+                    # file_size comes from the archive and can lie, so the streamed size is checked as well
+                    if info.file_size > spooled.max_bytes:
+                        spooled.reject(f'File too large (max {spooled.max_bytes // (1024 * 1024)}MB)')
+                        continue
+                    with zf.open(info) as src:
+                        while not spooled.error and (chunk := src.read(CHUNK_SIZE)):
+                            spooled.write(chunk)
+                    spooled.close()
+                    if spooled.content_type == 'application/zip':
+                        spooled.reject('Nested archives are not supported')
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail=f'{archive.filename} is not a valid ZIP archive')
+        finally:
+            os.remove(archive.path)
+
+    def _new_file(self, filename: str, max_bytes: int = MAX_RECEIPT_BYTES) -> SpooledFile:
+        if len(self.files) >= self.max_files:
+            raise HTTPException(status_code=413, detail=f'Too many files (max {self.max_files})')
+
+        spooled = SpooledFile(filename, os.path.join(self.directory, f'{self._spooled:06d}'), max_bytes)
+        self._spooled += 1
+        self.files.append(spooled)
+        return spooled
+
+    def _count(self, size: int):
+        self.received += size
+        if self.received > self.max_total_bytes:
+            raise HTTPException(status_code=413, detail=f'Upload too large (max {self.max_total_bytes // (1024 * 1024)}MB)')
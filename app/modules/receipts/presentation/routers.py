@@ -1,62 +1,335 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
+import asyncio
+import base64
+import json
+import time
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Request, Query
+from fastapi.responses import StreamingResponse
 from uuid import UUID, uuid4
-from datetime import datetime
-from app.modules.receipts.presentation.schemas import ReceiptResponse
+from datetime import datetime, timedelta, timezone
+from app.modules.receipts.presentation.schemas import ReceiptResponse, BulkUploadResponse, BulkUploadItem, BatchStatusResponse, ReceiptListItem, ReceiptPage, ReprocessRequest, ReprocessResponse
+from app.modules.receipts.presentation.bulk_upload import BulkUpload, SpooledFile
+from app.modules.receipts.domain.models import Receipt, ProcessingStatus, FAILED_STATUSES, FINAL_STATUSES
 from app.modules.receipts.application.receipt_service import ReceiptProcessingService
 from app.modules.receipts.infrastructure.ocr_service import OCRService
 from app.modules.receipts.infrastructure.ai_parser import OllamaParser
-from app.modules.receipts.infrastructure.file_storage import SupabaseStorage
-from app.modules.receipts.infrastructure.repositories import ReceiptRepository
-from app.modules.ledger.application.interfaces import SQLALchemyUnitOfWork, SQLAlchemyUnitOfWork
+from app.modules.receipts.infrastructure.file_storage import FileStorage
+from app.modules.receipts.infrastructure.model_registry import model_registry
+from app.modules.receipts.infrastructure.status_events import ReceiptSubscription
+from app.modules.ledger.application.interfaces import SQLALchemyUnitOfWork
+from app.core.config import settings
+from app.core.admission import receipt_admission, Ticket
 from app.core.dependencies import get_current_user
+from app.worker import enqueue_receipt
 
 router = APIRouter(prefix='/receipts', tags=['receipts'])
 
-def get_receipt_service():
-    uow_factory = SQLAlchemyUnitOfWork
-    receipt_repo = ReceiptRepository
-    ocr = OCRService()
-    parser = OllamaParser()
-    storage = SupabaseStorage()
+# ?status=review is shorthand for everything a person has to look at, 'failed' for every failed status
+STATUS_ALIASES = {'review': (ProcessingStatus.PENDING_REVIEW,) + FAILED_STATUSES, 'failed': FAILED_STATUSES}
+OPTIONAL_FIELDS = ('ocr_text', 'parsed_data')
 
-    return ReceiptProcessingService(uow_factory=SQLALchemyUnitOfWork, receipt_repo=ReceiptRepository, ocr_service=ocr, ai_parser=parser, storage=storage)
+def _require_ready():
+    if not model_registry.ready:
+        raise HTTPException(status_code=503, detail='Receipt models are still loading', headers={'Retry-After': '5'})
+
+def get_ocr_service() -> OCRService:
+    _require_ready()
+    return model_registry.ocr
+
+def get_ai_parser() -> OllamaParser:
+    _require_ready()
+    return model_registry.parser
+
+def get_storage() -> FileStorage:
+    _require_ready()
+    return model_registry.storage
+
+def get_receipt_service(ocr: OCRService=Depends(get_ocr_service), parser: OllamaParser=Depends(get_ai_parser), storage: FileStorage=Depends(get_storage)):
+    return ReceiptProcessingService(uow_factory=SQLALchemyUnitOfWork, ocr_service=ocr, ai_parser=parser, storage=storage, events=model_registry.events)
+
+def _to_response(receipt) -> ReceiptResponse:
+    return ReceiptResponse(id=receipt.id, filename=receipt.filename, file_path=receipt.file_path, status=receipt.status.value, ocr_text=receipt.ocr_text,
+parsed_data=receipt.parsed_data, journal_entry_id=receipt.journal_entry_id, error_message=receipt.error_message, created_at=receipt.created_at,
+stage_timings=receipt.stage_timings or None)
 
 @router.post('/upload', response_model=ReceiptResponse)
 async def upload_receipt(background_tasks: BackgroundTasks, file: UploadFile=File(...), service: ReceiptProcessingService=Depends(get_receipt_service), user=Depends(get_current_user)):
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail='File must be an image')
-    
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail='File too large (max 10MB)')
+    ticket = receipt_admission.admit(user['id'])
+    try:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail='File must be an image')
+
+        content = await file.read()
+        if len(content) > 10 * 1024 * 1024:
+            raise HTTPException(status_code=400, detail='File too large (max 10MB)')
+
+        receipt, created = await service.accept_receipt(content, file.filename, user['id'])
+    except BaseException:
+        ticket.cancel()
+        raise
+    if not created:
+        ticket.cancel()
+        return _to_response(receipt)
+
+    if settings.RECEIPT_QUEUE_ENABLED:
+        async with ticket:
+            await _enqueue(service, receipt, content)
+    else:
+        background_tasks.add_task(_admitted, ticket, service.process, receipt, content)
+
+    return _to_response(receipt)
+
+async def _admitted(ticket: Ticket, work, *args):
+    # Waits in the admission queue for a slot, then runs the work in it
+    async with ticket:
+        await work(*args)
+
+async def _enqueue(service: ReceiptProcessingService, receipt: Receipt, content: bytes):
+    # The worker reads the image back from storage, so it must be stored before the task is queued
+    if await service.reuse_duplicate(receipt) or await service.store_file(receipt, content):
+        enqueue_receipt(receipt)
+
+@router.post('/bulk', response_model=BulkUploadResponse, status_code=202)
+async def bulk_upload(request: Request, background_tasks: BackgroundTasks, service: ReceiptProcessingService=Depends(get_receipt_service), user=Depends(get_current_user)):
+    # A batch is processed one receipt at a time, so it takes a single admission for all of its files
+    ticket = receipt_admission.admit(user['id'])
+    upload = BulkUpload(max_total_bytes=settings.BULK_UPLOAD_MAX_BYTES, max_files=settings.BULK_UPLOAD_MAX_FILES)
+    accepted: List[Tuple[Receipt, SpooledFile]] = []
+    try:
+        await upload.receive(request)
+
+        batch_id = uuid4()
+        items = []
+        for spooled in upload.files:
+            if spooled.error:
+                items.append(BulkUploadItem(filename=spooled.filename, error=spooled.error))
+                continue
+
+            receipt, created = await service.accept_hashed(spooled.sha256, spooled.filename, user['id'], batch_id)
+            items.append(BulkUploadItem(filename=spooled.filename, receipt_id=receipt.id, status=receipt.status.value, duplicate=not created))
+            if created:
+                accepted.append((receipt, spooled))
+
+        # From here the background task owns the ticket and the spool directory
+        background_tasks.add_task(_admitted, ticket, _process_bulk, service, upload, accepted)
+    except BaseException as e:
+        ticket.cancel()
+        upload.cleanup()
+        # Receipts created before the failure would otherwise stay pending with nothing behind them
+        if isinstance(e, Exception) and accepted:
+            await service.abandon([receipt for receipt, _ in accepted], e)
+        raise
+
+    return BulkUploadResponse(batch_id=batch_id, accepted=len(accepted), rejected=sum(1 for item in items if item.error), items=items)
+
+async def _process_bulk(service: ReceiptProcessingService, upload: BulkUpload, accepted: List[Tuple[Receipt, SpooledFile]]):
+    # One image in memory at a time, read back from the spool directory
+    try:
+        for receipt, spooled in accepted:
+            content = await asyncio.to_thread(spooled.read)
+            if settings.RECEIPT_QUEUE_ENABLED:
+                await _enqueue(service, receipt, content)
+            else:
+                await service.process(receipt, content)
+    finally:
+        upload.cleanup()
+
+@router.get('', response_model=ReceiptPage, response_model_exclude_unset=True)
+async def list_receipts(status: Optional[List[str]] = Query(None), created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                        cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200), include: Optional[List[str]] = Query(None),
+                        user = Depends(get_current_user)):
+    statuses = _parse_statuses(status or [])
+    include = list(dict.fromkeys(include or []))
+    if any(field not in OPTIONAL_FIELDS for field in include):
+        raise HTTPException(status_code=400, detail=f'include must be one of {", ".join(OPTIONAL_FIELDS)}')
+
+    async with SQLALchemyUnitOfWork() as uow:
+        # One extra row tells whether there is a next page
+        receipts = await uow.receipts.list_page(user['id'], statuses, created_from, created_to,
+                                                _decode_cursor(cursor) if cursor else None, limit + 1, include)
+
+    page = receipts[:limit]
+    items = []
+    for r in page:
+        fields = dict(id=r.id, filename=r.filename, file_path=r.file_path, status=r.status.value, batch_id=r.batch_id,
+                      journal_entry_id=r.journal_entry_id, error_message=r.error_message, created_at=r.created_at)
+        fields.update({name: getattr(r, name) for name in include})
+        items.append(ReceiptListItem(**fields))
+
+    return ReceiptPage(items=items, next_cursor=_encode_cursor(page[-1]) if len(receipts) > limit else None)
+
+def _parse_statuses(values: List[str]) -> List[str]:
+    statuses = set()
+    for value in values:
+        if value in STATUS_ALIASES:
+            statuses.update(s.value for s in STATUS_ALIASES[value])
+        elif value in ProcessingStatus._value2member_map_:
+            statuses.add(value)
+        else:
+            raise HTTPException(status_code=400, detail=f'Unknown status: {value}')
+    return sorted(statuses)
+
+def _encode_cursor(receipt: Receipt) -> str:
+    raw = json.dumps([receipt.created_at.isoformat(), str(receipt.id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
 
-    background_tasks.add_task(service.process_receipt, content, file.filename, user['id'])
-    return {'message': 'Receipt upload accepted, processing in background', 'filename': file.filename}
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, receipt_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), UUID(receipt_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+
+@router.post('/reprocess', response_model=ReprocessResponse, status_code=202)
+async def reprocess_receipts(body: ReprocessRequest, background_tasks: BackgroundTasks, service: ReceiptProcessingService=Depends(get_receipt_service),
+                             user=Depends(get_current_user)):
+    # Bulk retry, e.g. everything that failed parsing while Ollama was down; each receipt resumes from its first missing stage
+    if not 1 <= body.limit <= settings.RECEIPT_REPROCESS_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f'limit must be between 1 and {settings.RECEIPT_REPROCESS_MAX_BATCH}')
+    statuses = _parse_statuses(body.status)
+    candidates = await service.reprocess_candidates(statuses, _stale_before(), user['id'], body.created_from, body.created_to, body.limit)
+
+    # Like /bulk: one admission for the whole batch, processed one receipt at a time
+    ticket = None if settings.RECEIPT_QUEUE_ENABLED or not candidates else receipt_admission.admit(user['id'])
+    try:
+        claimed = [r for r in candidates if await service.claim_reprocess(r)]
+    except BaseException:
+        if ticket:
+            ticket.cancel()
+        raise
+
+    if settings.RECEIPT_QUEUE_ENABLED:
+        for receipt in claimed:
+            enqueue_receipt(receipt)
+    elif claimed:
+        background_tasks.add_task(_admitted, ticket, _resume_all, service, claimed)
+    elif ticket:
+        ticket.cancel()
+
+    return ReprocessResponse(matched=len(candidates), claimed=len(claimed), receipt_ids=[r.id for r in claimed])
+
+async def _resume_all(service: ReceiptProcessingService, receipts: List[Receipt]):
+    for receipt in receipts:
+        await service.resume(receipt)
+
+def _stale_before() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(minutes=settings.RECEIPT_STALE_MINUTES)
+
+@router.get('/batches/{batch_id}', response_model=BatchStatusResponse)
+async def get_batch(batch_id: UUID, user = Depends(get_current_user)):
+    async with SQLALchemyUnitOfWork() as uow:
+        receipts = await uow.receipts.list_by_batch(batch_id, user['id'])
+
+    if not receipts:
+        raise HTTPException(status_code=404, detail='Batch not found')
+
+    items = [BulkUploadItem(filename=r.filename, receipt_id=r.id, status=r.status.value, error=r.error_message) for r in receipts]
+    return BatchStatusResponse(batch_id=batch_id, items=items)
 
 @router.post('/upload-and-process', response_model=ReceiptResponse)
 async def upload_and_process(file: UploadFile = File(...), service: ReceiptProcessingService=Depends(get_receipt_service), user=Depends(get_current_user)):
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail='File must be an image')
-    
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail='File too large (10MB)')
+    # Processes in the request, which needs the OCR and parser models; with the queue on they live in the workers
+    if settings.RECEIPT_QUEUE_ENABLED:
+        raise HTTPException(status_code=409, detail='Receipts are processed by the queue workers; use POST /receipts/upload')
+    ticket = receipt_admission.admit(user['id'])
+    try:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail='File must be an image')
 
-    receipt = await service.process_receipt(content, file.filename, user['id'])
-    return ReceiptResponse(id=receipt.id, filename=receipt.filename, file_path=receipt.file_path, status=receipt.status.value, ocr_text=receipt.ocr_text,
-parsed_data=receipt.parsed_data, journal_entry_id=receipt.journal_entry_id, error_message=receipt.error_message, created_at=receipt.created_at)
+        content = await file.read()
+        if len(content) > 10 * 1024 * 1024:
+            raise HTTPException(status_code=400, detail='File too large (10MB)')
+    except BaseException:
+        ticket.cancel()
+        raise
+
+    async with ticket:
+        receipt = await service.process_receipt(content, file.filename, user['id'])
+    return _to_response(receipt)
 
 @router.get('/{receipt_id}', response_model=ReceiptResponse)
-async def get_receipt(receipt_id: UUID, service: ReceiptProcessingService = Depends(get_receipt_service), user = Depends(get_current_user)):
+async def get_receipt(receipt_id: UUID, user = Depends(get_current_user)):
     async with SQLALchemyUnitOfWork() as uow:
-        repo = ReceiptRepository(uow.session)
-        receipt = await repo.get(receipt_id)
+        receipt = await uow.receipts.get(receipt_id)
 
     if not receipt:
         raise HTTPException(status_code=404, detail='Receipt not found')
     if receipt.user_id != user['id']:
         raise HTTPException(status_code=403, detail='Not authorized')
     
-    return ReceiptResponse(id=receipt.id, filename=receipt.filename, file_path=receipt.file_path, status=receipt.status.value,
-ocr_text=receipt.ocr_text, parsed_data=receipt.parsed_data, journal_entry_id=receipt.journal_entry_id, error_message=receipt.error_message,
-created_at=receipt.created_at)
\ No newline at end of file
+    return _to_response(receipt)
+
+@router.post('/{receipt_id}/reprocess', response_model=ReceiptResponse, status_code=202)
+async def reprocess_receipt(receipt_id: UUID, background_tasks: BackgroundTasks, service: ReceiptProcessingService=Depends(get_receipt_service),
+                            user=Depends(get_current_user)):
+    # Restarts from the first stage without a persisted result: the stored file is not uploaded again,
+    # and OCR text is not recomputed when only parsing or the journal entry failed
+    receipt = await service.get_receipt(receipt_id)
+    if not receipt:
+        raise HTTPException(status_code=404, detail='Receipt not found')
+    if receipt.user_id != user['id']:
+        raise HTTPException(status_code=403, detail='Not authorized')
+    if not service.can_reprocess(receipt, _stale_before()):
+        raise HTTPException(status_code=409, detail=f'Receipt is {receipt.status.value} and cannot be reprocessed')
+
+    ticket = None if settings.RECEIPT_QUEUE_ENABLED else receipt_admission.admit(user['id'])
+    try:
+        claimed = await service.claim_reprocess(receipt)
+    except BaseException:
+        if ticket:
+            ticket.cancel()
+        raise
+    if not claimed:
+        if ticket:
+            ticket.cancel()
+        raise HTTPException(status_code=409, detail='Receipt status changed, try again')
+
+    if settings.RECEIPT_QUEUE_ENABLED:
+        enqueue_receipt(receipt)
+    else:
+        background_tasks.add_task(_admitted, ticket, service.resume, receipt)
+
+    return _to_response(receipt)
+
+@router.get('/{receipt_id}/events')
+async def receipt_events(receipt_id: UUID, request: Request, user = Depends(get_current_user)):
+    # Server-sent events: the current status first, then every transition until the receipt reaches a final status
+    events = await model_registry.get('events')
+    # Subscribe before reading the row so a transition in between is delivered rather than lost
+    subscription = await events.subscribe(receipt_id)
+    try:
+        async with SQLALchemyUnitOfWork() as uow:
+            receipt = await uow.receipts.get_summary(receipt_id)
+        if not receipt:
+            raise HTTPException(status_code=404, detail='Receipt not found')
+        if receipt.user_id != user['id']:
+            raise HTTPException(status_code=403, detail='Not authorized')
+    except Exception:
+        await subscription.close()
+        raise
+
+    return StreamingResponse(_stream_events(request, subscription, events.event(receipt)), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _sse(event: dict) -> str:
+    return f'event: status\ndata: {json.dumps(event)}\n\n'
+
+async def _stream_events(request: Request, subscription: ReceiptSubscription, current: dict):
+    final = {s.value for s in FINAL_STATUSES}
+    deadline = time.monotonic() + settings.RECEIPT_EVENTS_MAX_SECONDS
+    try:
+        yield _sse(current)
+        if current['status'] in final:
+            return
+
+        async for event in subscription.events(timeout=settings.RECEIPT_EVENTS_KEEPALIVE):
+            if await request.is_disconnected() or time.monotonic() > deadline:
+                return
+            if event is None:
+                yield ': keep-alive\n\n'
+                continue
+            yield _sse(event)
+            if event['status'] in final:
+                return
+    finally:
+        await subscription.close()
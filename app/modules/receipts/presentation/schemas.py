@@ -1,5 +1,5 @@
 from pydantic import BaseModel, UUID4
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class ReceiptResponse(BaseModel):
@@ -11,4 +11,51 @@ class ReceiptResponse(BaseModel):
     parsed_data: Optional[Dict[str, Any]]
     journal_entry_id: Optional[UUID4]
     error_message: Optional[str]
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+    stage_timings: Optional[Dict[str, float]] = None
+
+class BulkUploadItem(BaseModel):
+    filename: str
+    receipt_id: Optional[UUID4] = None
+    status: Optional[str] = None
+    duplicate: bool = False
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    batch_id: UUID4
+    accepted: int
+    rejected: int
+    items: List[BulkUploadItem]
+
+class BatchStatusResponse(BaseModel):
+    batch_id: UUID4
+    items: List[BulkUploadItem]
+
+class ReceiptListItem(BaseModel):
+    id: UUID4
+    filename: str
+    file_path: Optional[str] = None
+    status: str
+    batch_id: Optional[UUID4] = None
+    journal_entry_id: Optional[UUID4] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    # Only present when requested with ?include=
+    ocr_text: Optional[str] = None
+    parsed_data: Optional[Dict[str, Any]] = None
+
+class ReceiptPage(BaseModel):
+    items: List[ReceiptListItem]
+    next_cursor: Optional[str] = None
+
+class ReprocessRequest(BaseModel):
+    # Receipt statuses to retry; 'failed' stands for every failed status
+    status: List[str] = ['failed']
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    limit: int = 100
+
+class ReprocessResponse(BaseModel):
+    matched: int
+    claimed: int
+    receipt_ids: List[UUID4]
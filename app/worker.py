@@ -0,0 +1,113 @@
+"""Celery worker for the receipt pipeline.
+
+OCR and LLM work run on separate queues so each can be scaled on its own:
+
+    python -m app.worker ocr    # consumes CELERY_OCR_QUEUE with CELERY_OCR_CONCURRENCY processes
+    python -m app.worker llm    # consumes CELERY_LLM_QUEUE with CELERY_LLM_CONCURRENCY processes
+
+Tasks are acknowledged only after they return, i.e. after the stage has been committed,
+so a worker that dies mid-stage has its message redelivered. Each task checks the persisted
+receipt status first, which makes a redelivery skip stages that already committed.
+"""
+import asyncio
+import sys
+from uuid import UUID
+from celery import Celery
+from kombu import Queue
+from app.core.config import settings
+from app.modules.receipts.domain.models import ProcessingStatus
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.infrastructure.model_registry import model_registry
+from app.modules.ledger.application.interfaces import SQLALchemyUnitOfWork
+
+celery_app = Celery('ai_accounting', broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+celery_app.conf.update(
+    task_queues=(Queue(settings.CELERY_OCR_QUEUE), Queue(settings.CELERY_LLM_QUEUE)),
+    task_routes={
+        'receipts.ocr': {'queue': settings.CELERY_OCR_QUEUE},
+        'receipts.parse': {'queue': settings.CELERY_LLM_QUEUE},
+    },
+    task_serializer='json',
+    accept_content=['json'],
+    task_ignore_result=True,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=settings.CELERY_PREFETCH_MULTIPLIER,
+    broker_transport_options={'visibility_timeout': settings.CELERY_VISIBILITY_TIMEOUT},
+)
+
+# One event loop per worker process, so the async engine pool and the registry survive across tasks
+_loop = None
+
+def _run(coro):
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+async def _service(*components) -> ReceiptProcessingService:
+    built = {name: await model_registry.get(name) for name in components + ('events',)}
+    return ReceiptProcessingService(uow_factory=SQLALchemyUnitOfWork, ocr_service=built.get('ocr'), ai_parser=built.get('parser'),
+                                    storage=built.get('storage'), events=built['events'])
+
+@celery_app.task(name='receipts.ocr')
+def ocr_receipt(receipt_id: str):
+    if _run(_ocr_receipt(UUID(receipt_id))):
+        parse_receipt.delay(receipt_id)
+
+@celery_app.task(name='receipts.parse')
+def parse_receipt(receipt_id: str):
+    _run(_parse_receipt(UUID(receipt_id)))
+
+async def _ocr_receipt(receipt_id: UUID) -> bool:
+    service = await _service('storage', 'ocr')
+    receipt = await service.get_receipt(receipt_id)
+    if receipt is None:
+        return False
+    if receipt.status == ProcessingStatus.OCR_COMPLETED:
+        return True
+    if receipt.status != ProcessingStatus.OCR_PROCESSING:
+        return False
+
+    return await service.load_and_ocr(receipt)
+
+async def _parse_receipt(receipt_id: UUID):
+    service = await _service('parser')
+    receipt = await service.get_receipt(receipt_id)
+    if receipt is None:
+        return
+
+    if receipt.status in (ProcessingStatus.OCR_COMPLETED, ProcessingStatus.AI_PARSING):
+        if not await service.run_parsing(receipt):
+            return
+    if receipt.status == ProcessingStatus.PARSING_COMPLETED:
+        await service.run_journal(receipt)
+
+def enqueue_receipt(receipt):
+    # Receipts that already have OCR text (reused from a duplicate upload, or reprocessed) go straight to the LLM queue
+    if receipt.status in (ProcessingStatus.OCR_COMPLETED, ProcessingStatus.PARSING_COMPLETED):
+        parse_receipt.delay(str(receipt.id))
+    else:
+        ocr_receipt.delay(str(receipt.id))
+
+WORKER_ROLES = {
+    'ocr': (settings.CELERY_OCR_QUEUE, settings.CELERY_OCR_CONCURRENCY),
+    'llm': (settings.CELERY_LLM_QUEUE, settings.CELERY_LLM_CONCURRENCY),
+}
+
+if __name__ == '__main__':
+    role = sys.argv[1] if len(sys.argv) > 1 else 'ocr'
+    if role not in WORKER_ROLES:
+        sys.exit(f'Unknown worker role {role!r}, expected one of: {", ".join(WORKER_ROLES)}')
+
+    queue, concurrency = WORKER_ROLES[role]
+    celery_app.worker_main([
+        'worker',
+        '--queues', queue,
+        '--concurrency', str(concurrency),
+        '--prefetch-multiplier', str(settings.CELERY_PREFETCH_MULTIPLIER),
+        '--hostname', f'{role}@%h',
+        '--loglevel', 'info',
+        *sys.argv[2:],
+    ])
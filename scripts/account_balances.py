@@ -0,0 +1,35 @@
+"""Check or rebuild the maintained account balances against the raw journal lines.
+
+    python -m scripts.account_balances verify     # exits 1 when a stored total differs
+    python -m scripts.account_balances rebuild    # recomputes both tables in one transaction
+"""
+import argparse
+import asyncio
+import sys
+from app.modules.ledger.application.interfaces import SQLALchemyUnitOfWork
+
+async def verify() -> int:
+    async with SQLALchemyUnitOfWork() as uow:
+        mismatches = await uow.balances.verify()
+
+    for m in mismatches:
+        where = f'{m["account_id"]} {m["period"]:%Y-%m}' if m['period'] else str(m['account_id'])
+        print(f'{where}: expected debit={m["expected"][0]} credit={m["expected"][1]}, stored debit={m["stored"][0]} credit={m["stored"][1]}')
+    print(f'{len(mismatches)} mismatched balances' if mismatches else 'Balances match the journal lines')
+    return 1 if mismatches else 0
+
+async def rebuild() -> int:
+    async with SQLALchemyUnitOfWork() as uow:
+        await uow.balances.rebuild()
+        await uow.commit()
+    print('Rebuilt account balances')
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify or rebuild account_balances and account_period_balances')
+    parser.add_argument('command', choices=('verify', 'rebuild'))
+    args = parser.parse_args()
+    sys.exit(asyncio.run(verify() if args.command == 'verify' else rebuild()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""End-to-end benchmark of ReceiptProcessingService.
+
+    python -m scripts.benchmark_receipts --receipts 200 --concurrency 8
+    python -m scripts.benchmark_receipts --ocr paddle --llm ollama --record bench/recorded
+    python -m scripts.benchmark_receipts --ocr replay --llm replay --replay bench/recorded --json bench/new.json --baseline bench/base.json
+
+Receipts are synthetic (scripts/synthetic_receipts.py) with known totals and dates. OCR and LLM are fakes
+with configurable latency by default, the real PaddleOCR/Ollama stack on request, or replays of a recorded
+real run. Files go to a temporary LocalFileStorage; rows go to the database in DATABASE_URL (a local
+Postgres with migrations applied and scripts/seed_accounts.py run). Benchmark rows are deleted afterwards
+unless --keep is given.
+
+Reports receipts/sec, p50/p95/p99 per stage and end to end, extraction accuracy and peak RSS.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from uuid import uuid4
+from sqlalchemy import delete, select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.modules.ledger.application.interfaces import SQLALchemyUnitOfWork
+from app.modules.ledger.infrastructure.models import JournalEntryModel, JournalLineModel
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.infrastructure.ai_parser import ReceiptData
+from app.modules.receipts.infrastructure.file_storage import LocalFileStorage
+from app.modules.receipts.infrastructure.image_preprocessing import ImagePreprocessor
+from app.modules.receipts.infrastructure.model_registry import model_registry
+from app.modules.receipts.infrastructure.models import ReceiptModel
+from app.modules.receipts.infrastructure.parse_cache import normalize_ocr_text
+from scripts.synthetic_receipts import ReceiptGenerator, SyntheticReceipt
+
+STAGES = ('upload', 'ocr', 'parse', 'journal', 'total', 'end_to_end')
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(normalize_ocr_text(text).encode()).hexdigest()
+
+class FakeOCR:
+    """Returns the rendered text of known images after `latency` seconds of blocking work in a worker thread,
+    which is how the real OCR occupies the process. With a preprocessor the real decode/resize runs too."""
+
+    def __init__(self, texts: Dict[str, str], latency: float, preprocessor: Optional[ImagePreprocessor] = None):
+        self.texts = texts
+        self.latency = latency
+        self.preprocessor = preprocessor
+
+    async def extract_text(self, image_bytes: bytes) -> str:
+        return await asyncio.to_thread(self._extract_sync, image_bytes)
+
+    def _extract_sync(self, image_bytes: bytes) -> str:
+        if self.preprocessor is not None:
+            self.preprocessor.process(image_bytes)
+        time.sleep(self.latency)
+        text = self.texts.get(hashlib.sha256(image_bytes).hexdigest())
+        if text is None:
+            raise ValueError('Image not in the benchmark set')
+        return text
+
+class FakeParser:
+    """Answers with the ground truth after `latency` seconds, at most max_parallel at a time like an Ollama server."""
+
+    def __init__(self, truths: Dict[str, dict], latency: float, max_parallel: int):
+        self.truths = truths
+        self.latency = latency
+        self.model = 'benchmark-fake'
+        self._slots = asyncio.Semaphore(max_parallel)
+
+    async def parse(self, ocr_text: str) -> ReceiptData:
+        async with self._slots:
+            await asyncio.sleep(self.latency)
+        truth = self.truths.get(_text_key(ocr_text))
+        return ReceiptData(**truth) if truth else ReceiptData(merchant_name='Unknown', total_amount=0.0)
+
+class RecordingOCR:
+    def __init__(self, ocr, path: str):
+        self.ocr = ocr
+        self.file = open(path, 'a')
+
+    async def extract_text(self, image_bytes: bytes) -> str:
+        text = await self.ocr.extract_text(image_bytes)
+        self.file.write(json.dumps({'sha256': hashlib.sha256(image_bytes).hexdigest(), 'text': text}) + '\n')
+        self.file.flush()
+        return text
+
+class RecordingParser:
+    def __init__(self, parser, path: str):
+        self.parser = parser
+        self.model = parser.model
+        self.file = open(path, 'a')
+
+    async def parse(self, ocr_text: str) -> ReceiptData:
+        parsed = await self.parser.parse(ocr_text)
+        self.file.write(json.dumps({'text_key': _text_key(ocr_text), 'parsed': parsed.model_dump()}) + '\n')
+        self.file.flush()
+        return parsed
+
+def _read_jsonl(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+async def build_ocr(args, receipts: List[SyntheticReceipt]):
+    if args.ocr == 'paddle':
+        ocr = await model_registry.get('ocr')
+    else:
+        if args.ocr == 'replay':
+            texts = {row['sha256']: row['text'] for row in _read_jsonl(os.path.join(args.replay, 'ocr.jsonl'))}
+        else:
+            texts = {r.sha256: r.text for r in receipts}
+        preprocessor = ImagePreprocessor(max_side=settings.OCR_MAX_SIDE, grayscale=settings.OCR_GRAYSCALE, crop=settings.OCR_CROP_RECEIPT,
+                                         autocontrast=settings.OCR_AUTOCONTRAST) if args.preprocess else None
+        ocr = FakeOCR(texts, args.ocr_latency / 1000, preprocessor)
+    return RecordingOCR(ocr, os.path.join(args.record, 'ocr.jsonl')) if args.record else ocr
+
+async def build_parser(args, receipts: List[SyntheticReceipt]):
+    if args.llm == 'ollama':
+        parser = await model_registry.get('parser')
+    else:
+        if args.llm == 'replay':
+            truths = {row['text_key']: row['parsed'] for row in _read_jsonl(os.path.join(args.replay, 'llm.jsonl'))}
+        else:
+            truths = {_text_key(r.text): r.truth() for r in receipts}
+        # Same cache and fast-path layers as the API builds around the real parser
+        parser = model_registry.wrap_parser(FakeParser(truths, args.llm_latency / 1000, settings.OLLAMA_MAX_PARALLEL))
+    return RecordingParser(parser, os.path.join(args.record, 'llm.jsonl')) if args.record else parser
+
+def percentile(values: List[float], q: float) -> float:
+    # Nearest rank
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+def peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale}
+
+async def check_accounts():
+    async with SQLALchemyUnitOfWork() as uow:
+        if not await uow.accounts.get_by_code('1000') or not await uow.accounts.get_by_code('5000'):
+            raise SystemExit('Accounts 1000 and 5000 are missing; run python -m scripts.seed_accounts first')
+
+async def cleanup(user_id: str):
+    async with AsyncSessionLocal() as session:
+        entries = select(JournalEntryModel.id).where(JournalEntryModel.created_by == user_id)
+        await session.execute(delete(ReceiptModel).where(ReceiptModel.user_id == user_id))
+        await session.execute(delete(JournalLineModel).where(JournalLineModel.entry_id.in_(entries)))
+        await session.execute(delete(JournalEntryModel).where(JournalEntryModel.created_by == user_id))
+        await session.commit()
+
+async def run(args) -> dict:
+    generator = ReceiptGenerator(seed=args.seed, photo=not args.clean)
+    receipts = generator.batch(args.warmup + args.receipts)
+    # Re-submitted photos exercise the dedup paths
+    duplicates = int(args.receipts * args.duplicate_ratio)
+    for i in range(duplicates):
+        receipts[-(i + 1)] = receipts[args.warmup + i % max(1, args.receipts - duplicates)]
+
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    storage_root = tempfile.mkdtemp(prefix='receipts-bench-')
+    storage = LocalFileStorage(storage_root)
+    ocr = await build_ocr(args, receipts)
+    parser = await build_parser(args, receipts)
+    service = ReceiptProcessingService(uow_factory=SQLALchemyUnitOfWork, ocr_service=ocr, ai_parser=parser, storage=storage)
+    await check_accounts()
+
+    user_id = f'bench-{uuid4().hex[:8]}'
+    slots = asyncio.Semaphore(args.concurrency)
+    results = []
+
+    async def one(synthetic: SyntheticReceipt, measured: bool):
+        async with slots:
+            start = time.perf_counter()
+            receipt = await service.process_receipt(synthetic.image, 'benchmark.jpg', user_id)
+            if measured:
+                results.append((synthetic, receipt, time.perf_counter() - start))
+
+    try:
+        await asyncio.gather(*(one(r, False) for r in receipts[:args.warmup]))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(r, True) for r in receipts[args.warmup:]))
+        elapsed = time.perf_counter() - started
+    finally:
+        if not args.keep:
+            await cleanup(user_id)
+        shutil.rmtree(storage_root, ignore_errors=True)
+
+    stages = {stage: [] for stage in STAGES}
+    correct_total = correct_date = 0
+    for synthetic, receipt, latency in results:
+        for stage, ms in receipt.stage_timings.items():
+            stages.setdefault(stage, []).append(ms)
+        stages['end_to_end'].append(latency * 1000)
+        parsed = receipt.parsed_data or {}
+        correct_total += parsed.get('total_amount') is not None and abs(parsed['total_amount'] - synthetic.total_amount) < 0.005
+        correct_date += parsed.get('transaction_date') == synthetic.transaction_date
+
+    count = len(results)
+    return {
+        'config': {'receipts': args.receipts, 'concurrency': args.concurrency, 'ocr': args.ocr, 'llm': args.llm,
+                   'ocr_latency_ms': args.ocr_latency, 'llm_latency_ms': args.llm_latency, 'preprocess': args.preprocess,
+                   'duplicate_ratio': args.duplicate_ratio, 'status_writes': settings.RECEIPT_STATUS_WRITES,
+                   'fast_path': settings.FAST_PATH_ENABLED, 'parse_cache': settings.PARSE_CACHE_ENABLED},
+        'seconds': round(elapsed, 3),
+        'receipts_per_second': round(count / elapsed, 2) if elapsed else 0.0,
+        'statuses': dict(Counter(receipt.status.value for _, receipt, _ in results)),
+        'accuracy': {'total': round(correct_total / count, 4) if count else 0.0, 'date': round(correct_date / count, 4) if count else 0.0},
+        'stages_ms': {stage: {'count': len(values), 'p50': round(percentile(values, 50), 1), 'p95': round(percentile(values, 95), 1),
+                              'p99': round(percentile(values, 99), 1), 'max': round(max(values), 1)}
+                      for stage, values in stages.items() if values},
+        'peak_rss_mb': {k: round(v, 1) for k, v in peak_rss_mb().items()},
+    }
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def _change(new: float, old: float) -> str:
+    return f'{(new - old) / old * 100:+.1f}%' if old else 'n/a'
+
+def print_report(report: dict, baseline: Optional[dict]):
+    config = report['config']
+    print(f"\n{report['config']['receipts']} receipts, concurrency {config['concurrency']}, ocr={config['ocr']} llm={config['llm']} "
+          f"(commit {config['commit'] or 'unknown'})")
+    line = f"Throughput: {report['receipts_per_second']} receipts/s in {report['seconds']}s"
+    if baseline:
+        line += f" ({_change(report['receipts_per_second'], baseline['receipts_per_second'])} vs baseline)"
+    print(line)
+    print('Statuses: ' + ', '.join(f'{k}={v}' for k, v in sorted(report['statuses'].items())))
+    print(f"Accuracy: total {report['accuracy']['total']:.1%}, date {report['accuracy']['date']:.1%}")
+    print(f"Peak RSS: {report['peak_rss_mb']['self']} MB (children {report['peak_rss_mb']['children']} MB)")
+
+    print(f"\n{'stage':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  ms" + ('   p95 vs baseline' if baseline else ''))
+    for stage, values in report['stages_ms'].items():
+        line = f"{stage:<12}{values['p50']:>10}{values['p95']:>10}{values['p99']:>10}{values['max']:>10}"
+        old = (baseline or {}).get('stages_ms', {}).get(stage)
+        if old:
+            line += f"    {_change(values['p95'], old['p95'])}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the receipt pipeline end to end')
+    parser.add_argument('--receipts', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=5, help='Receipts processed before measuring')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clean', action='store_true', help='Flat rendered paper instead of photo-like images')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0, help='Fraction of measured receipts that repeat an earlier image')
+    parser.add_argument('--ocr', choices=('fake', 'paddle', 'replay'), default='fake')
+    parser.add_argument('--llm', choices=('fake', 'ollama', 'replay'), default='fake')
+    parser.add_argument('--ocr-latency', type=float, default=300.0, help='Fake OCR time per image, ms')
+    parser.add_argument('--llm-latency', type=float, default=800.0, help='Fake LLM time per request, ms')
+    parser.add_argument('--preprocess', action='store_true', help='Run the real image preprocessing inside the fake OCR')
+    parser.add_argument('--record', help='Directory to record OCR and LLM outputs to, for later --replay')
+    parser.add_argument('--replay', help='Directory with recorded ocr.jsonl and llm.jsonl')
+    parser.add_argument('--json', help='Write the report to this file')
+    parser.add_argument('--baseline', help='Earlier --json report to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows in the database')
+    args = parser.parse_args()
+
+    if 'replay' in (args.ocr, args.llm) and not args.replay:
+        parser.error('--replay DIR is required with --ocr replay or --llm replay')
+
+    async def _main():
+        try:
+            return await run(args)
+        finally:
+            await model_registry.shutdown()
+
+    report = asyncio.run(_main())
+    # Only after RSS was sampled: a forked child starts out with the parent's resident set
+    report['config']['commit'] = _commit()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
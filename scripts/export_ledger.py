@@ -0,0 +1,59 @@
+"""Export the general ledger, one row per journal line, without loading it into memory.
+
+    python -m scripts.export_ledger --format csv --out ledger.csv
+    python -m scripts.export_ledger --format parquet --from 2024-01-01 --to 2024-12-31 --status posted --out ledger-2024.parquet
+    python -m scripts.export_ledger --format ndjson --account 5000 | gzip > expenses.ndjson.gz
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date
+from uuid import UUID
+from app.core.config import settings
+from app.modules.ledger.application.interfaces import SQLALchemyUnitOfWork
+from app.modules.ledger.application.use_cases import ExportGeneralLedgerUseCase
+from app.modules.ledger.infrastructure.gl_export import ENCODERS, parquet_available
+
+async def export(args) -> int:
+    account_id = None
+    if args.account:
+        async with SQLALchemyUnitOfWork() as uow:
+            try:
+                account = await uow.accounts.get(UUID(args.account))
+            except ValueError:
+                account = await uow.accounts.get_by_code(args.account)
+        if account is None:
+            sys.exit(f'Unknown account {args.account}')
+        account_id = account.id
+
+    out = sys.stdout.buffer if args.out == '-' else open(args.out, 'wb')
+    written = 0
+    try:
+        use_case = ExportGeneralLedgerUseCase(SQLALchemyUnitOfWork(), batch_size=args.batch_size)
+        async for chunk in use_case.execute(ENCODERS[args.format], args.date_from, args.date_to, account_id, args.status or []):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+    print(f'Wrote {written} bytes of {args.format}', file=sys.stderr)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream the general ledger to CSV, NDJSON or Parquet')
+    parser.add_argument('--format', choices=tuple(ENCODERS), default='csv')
+    parser.add_argument('--out', default='-', help='Output file, - for stdout')
+    parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help='First entry date, inclusive')
+    parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help='Last entry date, inclusive')
+    parser.add_argument('--account', help='Account id or code')
+    parser.add_argument('--status', action='append', choices=('draft', 'posted', 'void'), help='Entry status; repeatable')
+    parser.add_argument('--batch-size', type=int, default=settings.LEDGER_EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    if args.format == 'parquet' and not parquet_available():
+        sys.exit('Parquet export needs pyarrow installed')
+
+    asyncio.run(export(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Resume failed or stalled receipts from their first incomplete stage.
+
+    python -m scripts.reprocess_receipts --status parsing_failed --status journal_failed
+    python -m scripts.reprocess_receipts --status failed --user <user_id> --since 2025-06-01 --dry-run
+    python -m scripts.reprocess_receipts --status ocr_processing --queue
+
+Receipts with parsed data only get their journal entry, receipts with OCR text are parsed again and the
+rest are OCR'd from their stored file; nothing is uploaded twice. Without --queue the receipts are processed
+here, --concurrency at a time; with --queue they are handed to the Celery workers.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
+from app.modules.receipts.domain.models import ProcessingStatus, FAILED_STATUSES
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.infrastructure.model_registry import model_registry
+from app.modules.ledger.application.interfaces import SQLALchemyUnitOfWork
+
+# The models each resume point needs
+NEEDS = {
+    ProcessingStatus.OCR_PROCESSING: ('storage', 'ocr', 'parser'),
+    ProcessingStatus.OCR_COMPLETED: ('parser',),
+    ProcessingStatus.PARSING_COMPLETED: (),
+}
+
+def _statuses(values):
+    statuses = set()
+    for value in values:
+        if value == 'failed':
+            statuses.update(s.value for s in FAILED_STATUSES)
+        else:
+            statuses.add(ProcessingStatus(value).value)
+    return sorted(statuses)
+
+async def reprocess(args) -> dict:
+    service = ReceiptProcessingService(uow_factory=SQLALchemyUnitOfWork, ocr_service=None, ai_parser=None, storage=None,
+                                       events=await model_registry.get('events'))
+    stale_before = datetime.now(timezone.utc) - timedelta(minutes=args.stale_minutes)
+    candidates = await service.reprocess_candidates(_statuses(args.status), stale_before, args.user, args.since, args.until, args.limit)
+
+    by_stage = {}
+    for receipt in candidates:
+        stage = service.resume_point(receipt)
+        by_stage[stage.value] = by_stage.get(stage.value, 0) + 1
+    print(f'{len(candidates)} receipts to reprocess, resuming at: ' + (', '.join(f'{k}={v}' for k, v in by_stage.items()) or 'nothing'))
+    if args.dry_run or not candidates:
+        return {'matched': len(candidates), 'claimed': 0}
+
+    if not args.queue:
+        # Only load what the resume points need: a batch of journal failures needs no models at all
+        needed = {name for receipt in candidates for name in NEEDS[service.resume_point(receipt)]}
+        service.storage = await model_registry.get('storage') if 'storage' in needed else None
+        service.ocr = await model_registry.get('ocr') if 'ocr' in needed else None
+        service.parser = await model_registry.get('parser') if 'parser' in needed else None
+
+    claimed = [r for r in candidates if await service.claim_reprocess(r)]
+    if args.queue:
+        from app.worker import enqueue_receipt
+        for receipt in claimed:
+            enqueue_receipt(receipt)
+        print(f'Queued {len(claimed)} receipts')
+        return {'matched': len(candidates), 'claimed': len(claimed)}
+
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def run(receipt):
+        async with slots:
+            return await service.resume(receipt)
+
+    done = await asyncio.gather(*(run(r) for r in claimed))
+    outcome = {}
+    for receipt in done:
+        outcome[receipt.status.value] = outcome.get(receipt.status.value, 0) + 1
+    print(f'Reprocessed {len(done)} receipts: ' + ', '.join(f'{k}={v}' for k, v in sorted(outcome.items())))
+    return {'matched': len(candidates), 'claimed': len(claimed), **outcome}
+
+def main():
+    parser = argparse.ArgumentParser(description='Resume failed or stalled receipts from their first incomplete stage')
+    parser.add_argument('--status', action='append', required=True,
+                        help="A receipt status to retry, or 'failed' for every failed status; repeatable")
+    parser.add_argument('--user', help='Only this user\'s receipts (default: every user)')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Only receipts uploaded at or after this time')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Only receipts uploaded before this time')
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--stale-minutes', type=int, default=settings.RECEIPT_STALE_MINUTES,
+                        help='How old a receipt that is not failed must be to count as stalled')
+    parser.add_argument('--concurrency', type=int, default=max(1, settings.OLLAMA_MAX_PARALLEL))
+    parser.add_argument('--queue', action='store_true', help='Hand the receipts to the Celery workers')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be reprocessed')
+    args = parser.parse_args()
+
+    async def _main():
+        try:
+            return await reprocess(args)
+        finally:
+            await model_registry.shutdown()
+
+    asyncio.run(_main())
+
+if __name__ == '__main__':
+    main()
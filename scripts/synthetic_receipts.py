@@ -0,0 +1,130 @@
+"""Synthetic receipt images with known contents, for benchmarks.
+
+    python -m scripts.synthetic_receipts --count 20 --out /tmp/receipts
+
+Each image is a rendered receipt (merchant, date, line items, total) on a darker background, optionally
+rotated and noisy like a phone photo. The ground truth travels with it so OCR and parsing can be checked.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import List
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+MERCHANTS = ['Green Grocer', 'Corner Cafe', 'City Pharmacy', 'Hardware Depot', 'Book Nook', 'Fresh Market',
+             'Fuel Stop', 'Pasta House', 'Office Supplies Co', 'Pet Planet']
+ITEMS = ['Milk', 'Bread', 'Coffee', 'Apples', 'Batteries', 'Notebook', 'Shampoo', 'Pasta', 'Tomatoes', 'Cheese',
+         'Light bulb', 'Dog food', 'Espresso', 'Croissant', 'Pens', 'Tape', 'Water 6-pack', 'Soap']
+
+@dataclass
+class SyntheticReceipt:
+    image: bytes
+    merchant_name: str
+    transaction_date: str
+    total_amount: float
+    line_items: List[dict]
+    text: str
+    sha256: str = field(default='')
+
+    def truth(self) -> dict:
+        return {'merchant_name': self.merchant_name, 'transaction_date': self.transaction_date, 'total_amount': self.total_amount,
+                'line_items': self.line_items, 'category': None}
+
+class ReceiptGenerator:
+    def __init__(self, seed: int = 0, width: int = 1200, photo: bool = True, quality: int = 85):
+        self.random = random.Random(seed)
+        self.width = width
+        self.photo = photo
+        self.quality = quality
+        self.font = self._font(30)
+        self.big_font = self._font(44)
+
+    def generate(self) -> SyntheticReceipt:
+        rnd = self.random
+        merchant = rnd.choice(MERCHANTS)
+        day = date(2024, 1, 1) + timedelta(days=rnd.randrange(600))
+        items = []
+        for name in rnd.sample(ITEMS, rnd.randint(2, 8)):
+            quantity = rnd.randint(1, 3)
+            price = round(rnd.uniform(0.5, 40), 2)
+            items.append({'name': name, 'quantity': quantity, 'price': price})
+        total = round(sum(i['quantity'] * i['price'] for i in items), 2)
+
+        lines = [merchant.upper(), f'{rnd.randint(1, 200)} Main Street', f'Date: {day.strftime("%d/%m/%Y")}', '']
+        for item in items:
+            lines.append(f'{item["quantity"]} x {item["name"]:<16} {item["quantity"] * item["price"]:>8.2f}')
+        lines += ['', f'TOTAL {total:>22.2f}', 'CARD', 'THANK YOU']
+        text = '\n'.join(lines)
+
+        image = self._render(lines)
+        return SyntheticReceipt(image=image, merchant_name=merchant, transaction_date=day.isoformat(), total_amount=total,
+                                line_items=items, text=text, sha256=hashlib.sha256(image).hexdigest())
+
+    def batch(self, count: int) -> List[SyntheticReceipt]:
+        return [self.generate() for _ in range(count)]
+
+    def _render(self, lines: List[str]) -> bytes:
+        line_height = 42
+        paper_w = int(self.width * 0.6)
+        paper_h = line_height * (len(lines) + 4)
+        paper = Image.new('L', (paper_w, paper_h), 250)
+        draw = ImageDraw.Draw(paper)
+        for i, line in enumerate(lines):
+            font = self.big_font if i == 0 else self.font
+            draw.text((30, 40 + i * line_height + (12 if i else 0)), line, fill=20, font=font)
+
+        if not self.photo:
+            return self._encode(paper)
+
+        # A phone photo: paper on a darker table, slightly rotated, blurred and noisy
+        canvas_h = int(paper_h * 1.3)
+        canvas = Image.new('L', (self.width, canvas_h), self.random.randint(60, 110))
+        paper = paper.rotate(self.random.uniform(-3, 3), expand=True, fillcolor=90)
+        canvas.paste(paper, ((self.width - paper.width) // 2, (canvas_h - paper.height) // 2))
+        canvas = canvas.filter(ImageFilter.GaussianBlur(0.6))
+        # Seeded noise, so a seed always reproduces the same bytes (recorded runs are keyed by image hash)
+        rng = np.random.default_rng(self.random.getrandbits(32))
+        noise = Image.fromarray(rng.normal(128, 12, (canvas.height, canvas.width)).clip(0, 255).astype(np.uint8))
+        canvas = Image.blend(canvas, noise, 0.08)
+        return self._encode(canvas.convert('RGB'))
+
+    def _encode(self, image: Image.Image) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=self.quality)
+        return buffer.getvalue()
+
+    def _font(self, size: int):
+        for name in ('DejaVuSansMono.ttf', 'LiberationMono-Regular.ttf', 'Courier New.ttf'):
+            try:
+                return ImageFont.truetype(name, size)
+            except OSError:
+                continue
+        return ImageFont.load_default(size=size)
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic receipt images and their ground truth')
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--clean', action='store_true', help='Render flat paper instead of a photo')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    generator = ReceiptGenerator(seed=args.seed, photo=not args.clean)
+    with open(os.path.join(args.out, 'truth.jsonl'), 'w') as truth:
+        for i, receipt in enumerate(generator.batch(args.count)):
+            name = f'receipt_{i:05d}.jpg'
+            with open(os.path.join(args.out, name), 'wb') as f:
+                f.write(receipt.image)
+            truth.write(json.dumps({'file': name, 'sha256': receipt.sha256, 'text': receipt.text, **receipt.truth()}) + '\n')
+
+    print(f'Wrote {args.count} receipts to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional
+from uuid import UUID
+from app.modules.receipts.domain.models import Receipt
+from app.modules.receipts.infrastructure.ai_parser import ReceiptData
+from app.modules.ledger.domain.entities import Account, AccountType
+
+class FakeReceiptRepository:
+    def __init__(self):
+        self.rows: Dict[UUID, Receipt] = {}
+        self.writes: List[tuple] = []
+        self.duplicate: Optional[Receipt] = None
+        self.lookups: List[tuple] = []
+        self.transitions: List[tuple] = []
+        self.transition_result = True
+
+    async def save(self, receipt: Receipt, fields=None) -> Receipt:
+        self.writes.append((receipt.status.value, frozenset(fields) if fields is not None else None))
+        self.rows[receipt.id] = receipt.model_copy(deep=True)
+        return receipt
+
+    async def get(self, receipt_id: UUID) -> Optional[Receipt]:
+        return self.rows.get(receipt_id)
+
+    async def find_by_hash(self, file_hash, user_id, stale_before):
+        self.lookups.append(('find_by_hash', file_hash, user_id, stale_before))
+        return self.duplicate
+
+    async def find_ocr_by_hash(self, file_hash, user_id=None, exclude_id=None):
+        self.lookups.append(('find_ocr_by_hash', file_hash, user_id, exclude_id))
+        return self.duplicate
+
+    async def transition(self, receipt_id, expected, status) -> bool:
+        self.transitions.append((receipt_id, expected, status))
+        return self.transition_result
+
+class FakeAccounts:
+    async def get_by_code(self, code):
+        return Account(code=code, name=code, type=AccountType.EXPENSE if code.startswith('5') else AccountType.ASSET)
+
+class FakeJournalEntries:
+    def __init__(self):
+        self.saved = []
+
+    async def save(self, entry):
+        self.saved.append(entry)
+        return entry
+
+class FakeUnitOfWork:
+    def __init__(self, receipts: FakeReceiptRepository, journal_entries: FakeJournalEntries):
+        self.receipts = receipts
+        self.accounts = FakeAccounts()
+        self.journal_entries = journal_entries
+        self.entered = 0
+        # (receipt writes, journal entries) saved inside this unit of work at each commit
+        self.commits: List[tuple] = []
+
+    async def __aenter__(self):
+        self.entered += 1
+        self._start = (len(self.receipts.writes), len(self.journal_entries.saved))
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def commit(self):
+        self.commits.append((len(self.receipts.writes) - self._start[0], len(self.journal_entries.saved) - self._start[1]))
+
+class FakeOCR:
+    def __init__(self, text: str = 'CORNER CAFE\nTOTAL 12.50'):
+        self.text = text
+        self.calls = 0
+
+    async def extract_text(self, image_bytes: bytes) -> str:
+        self.calls += 1
+        return self.text
+
+class FakeParser:
+    def __init__(self, result: Optional[ReceiptData] = None):
+        self.result = result or ReceiptData(merchant_name='Corner Cafe', transaction_date='2025-03-02', total_amount=12.5)
+        self.model = 'fake-model'
+        self.calls = 0
+
+    async def parse(self, ocr_text: str) -> ReceiptData:
+        self.calls += 1
+        return self.result
+
+class FakeStorage:
+    async def save(self, file_bytes: bytes, file_path: str) -> str:
+        return f'local://{file_path}'
+
+    async def load(self, location: str) -> bytes:
+        return b'image'
+
+class FakeLedgerEntries:
+    def __init__(self, *entries):
+        self.entries = {e.id: e for e in entries}
+        self.transitions: List[tuple] = []
+
+    async def get(self, entry_id):
+        entry = self.entries.get(entry_id)
+        return entry.model_copy(deep=True) if entry else None
+
+    async def transition(self, entry_id, expected, status, posted_at=None) -> bool:
+        entry = self.entries[entry_id]
+        if entry.status != expected:
+            return False
+        self.transitions.append((entry_id, expected, status))
+        entry.status = status
+        return True
+
+class FakeBalances:
+    def __init__(self):
+        self.applied: List[tuple] = []
+
+    async def apply(self, entries, sign: int = 1):
+        self.applied.append(([e.id for e in entries], sign))
+
+class FakePeriods:
+    def __init__(self, closed=()):
+        self.closed = sorted(closed)
+        self.snapshots: List[tuple] = []
+
+    async def closed_through(self, for_posting: bool = False):
+        return self.closed[-1] if self.closed else None
+
+    async def lock(self):
+        return await self.closed_through()
+
+    async def close(self, period, closed_by, previous=None):
+        self.snapshots.append((period, previous))
+        self.closed.append(period)
+        return period
+
+    async def reopen(self, period):
+        self.closed.remove(period)
+
+class FakeLedgerUnitOfWork:
+    def __init__(self, journal_entries=None, periods=None):
+        self.journal_entries = journal_entries or FakeLedgerEntries()
+        self.balances = FakeBalances()
+        self.periods = periods or FakePeriods()
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def commit(self):
+        self.commits += 1
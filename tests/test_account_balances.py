@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+import pytest
+from app.modules.ledger.application.use_cases import PostJournalEntryUseCase, VoidJournalEntryUseCase
+from app.modules.ledger.domain.entities import AccountBalance, AccountType, JournalEntry, JournalEntryStatus, JournalLine
+from app.modules.ledger.infrastructure.repositories import AccountBalanceRepository
+from tests.fakes import FakeLedgerEntries, FakeLedgerUnitOfWork
+
+CASH, RENT = uuid4(), uuid4()
+
+def _entry(amount='100.00', entry_date=datetime(2025, 3, 14, tzinfo=timezone.utc), status=JournalEntryStatus.DRAFT) -> JournalEntry:
+    return JournalEntry(entry_number=f'JE-{uuid4().hex[:6]}', entry_date=entry_date, description='Rent', status=status, lines=[
+        JournalLine(account_id=RENT, direction='debit', amount=Decimal(amount)),
+        JournalLine(account_id=CASH, direction='credit', amount=Decimal(amount)),
+    ])
+
+@pytest.fixture
+def upserts(monkeypatch):
+    # The rows AccountBalanceRepository.apply upserts, per table
+    captured = {}
+
+    async def upsert(self, model, keys, rows):
+        captured[model.__tablename__] = rows
+    monkeypatch.setattr(AccountBalanceRepository, '_upsert', upsert)
+    return captured
+
+async def test_apply_sums_lines_per_account_and_month(upserts):
+    await AccountBalanceRepository(session=None).apply([_entry('100.00'), _entry('25.50'), _entry('10.00', datetime(2025, 4, 1, tzinfo=timezone.utc))])
+
+    totals = {row['account_id']: (row['debit_total'], row['credit_total']) for row in upserts['account_balances']}
+    assert totals == {RENT: (Decimal('135.50'), 0), CASH: (0, Decimal('135.50'))}
+    periods = {(row['account_id'], row['period'].month): row['debit_total'] for row in upserts['account_period_balances']}
+    assert periods[(RENT, 3)] == Decimal('125.50') and periods[(RENT, 4)] == Decimal('10.00')
+
+async def test_apply_with_negative_sign_takes_lines_back_out(upserts):
+    await AccountBalanceRepository(session=None).apply([_entry('40.00')], sign=-1)
+
+    assert {row['account_id']: row['debit_total'] - row['credit_total'] for row in upserts['account_balances']} == {
+        RENT: Decimal('-40.00'), CASH: Decimal('40.00')}
+
+def test_balance_is_positive_on_the_normal_side():
+    balance = AccountBalance(account_id=CASH, debit_total=Decimal('10.00'), credit_total=Decimal('25.00'))
+    assert balance.balance(AccountType.ASSET) == Decimal('-15.00')
+    assert balance.balance(AccountType.LIABILITY) == Decimal('15.00')
+
+async def test_posting_applies_the_entry_once():
+    entry = _entry()
+    uow = FakeLedgerUnitOfWork(FakeLedgerEntries(entry))
+
+    posted = await PostJournalEntryUseCase(uow).execute(entry.id)
+
+    assert posted.status == JournalEntryStatus.POSTED and uow.balances.applied == [([entry.id], 1)] and uow.commits == 1
+    with pytest.raises(ValueError):
+        await PostJournalEntryUseCase(uow).execute(entry.id)
+    assert len(uow.balances.applied) == 1
+
+async def test_voiding_a_posted_entry_reverses_its_balances():
+    entry = _entry(status=JournalEntryStatus.POSTED)
+    uow = FakeLedgerUnitOfWork(FakeLedgerEntries(entry))
+
+    voided = await VoidJournalEntryUseCase(uow).execute(entry.id)
+
+    assert voided.status == JournalEntryStatus.VOID and uow.balances.applied == [([entry.id], -1)]
+    with pytest.raises(ValueError):
+        await VoidJournalEntryUseCase(uow).execute(entry.id)
+
+async def test_voiding_a_draft_leaves_balances_alone():
+    entry = _entry()
+    uow = FakeLedgerUnitOfWork(FakeLedgerEntries(entry))
+
+    await VoidJournalEntryUseCase(uow).execute(entry.id)
+
+    assert uow.balances.applied == []
@@ -0,0 +1,92 @@
+import asyncio
+import tempfile
+import pytest
+from fastapi.testclient import TestClient
+from app.core.admission import AdmissionController, receipt_admission
+from app.core.dependencies import get_current_user
+from app.core.exceptions import AdmissionRejected
+from app.main import app
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.presentation import routers
+from tests.fakes import FakeOCR, FakeParser, FakeStorage
+
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 60
+
+def test_per_user_quota():
+    controller = AdmissionController(max_in_flight=4, max_queued=4, per_user=2)
+    controller.admit('someone')
+    controller.admit('someone')
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit('someone')
+    assert rejected.value.retry_after >= 1 and controller.rejected_user == 1
+    # Other users still get in
+    controller.admit('someone else')
+    assert controller.admitted == 3
+
+def test_queue_overflow_is_answered_with_429_and_retry_after(uow_factory, monkeypatch):
+    controller = AdmissionController(max_in_flight=1, max_queued=1, per_user=5)
+    monkeypatch.setattr(routers, 'receipt_admission', controller)
+    service = ReceiptProcessingService(uow_factory=uow_factory, ocr_service=FakeOCR(), ai_parser=FakeParser(), storage=FakeStorage())
+    app.dependency_overrides[get_current_user] = lambda: {'id': 'someone'}
+    app.dependency_overrides[routers.get_receipt_service] = lambda: service
+    try:
+        controller.admit('a')
+        controller.admit('b')
+        response = TestClient(app).post('/api/v1/receipts/upload', files={'file': ('a.jpg', JPEG, 'image/jpeg')})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert controller.rejected_full == 1 and controller.admitted == 2
+
+def test_cancel_is_idempotent():
+    controller = AdmissionController(max_in_flight=1, max_queued=1, per_user=1)
+    ticket = controller.admit('someone')
+
+    ticket.cancel()
+    ticket.cancel()
+
+    assert controller.admitted == 0 and controller.stats()['users'] == 0
+    controller.admit('someone')
+
+async def test_slot_is_released_when_the_work_raises():
+    controller = AdmissionController(max_in_flight=1, max_queued=0, per_user=1)
+
+    with pytest.raises(RuntimeError):
+        async with controller.admit('someone'):
+            assert controller.in_flight == 1
+            raise RuntimeError('OCR crashed')
+
+    assert (controller.admitted, controller.in_flight, controller.queued) == (0, 0, 0)
+    # The slot is free again: the next ticket does not wait
+    async with controller.admit('someone'):
+        pass
+    await asyncio.sleep(0)
+    assert controller.completed == 2
+
+def test_bulk_upload_gives_everything_back_when_accepting_fails(uow_factory, receipts, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+
+    class FailingService(ReceiptProcessingService):
+        async def accept_hashed(self, *args, **kwargs):
+            if receipts.rows:
+                raise RuntimeError('database went away')
+            return await super().accept_hashed(*args, **kwargs)
+
+    service = FailingService(uow_factory=uow_factory, ocr_service=FakeOCR(), ai_parser=FakeParser(), storage=FakeStorage())
+    app.dependency_overrides[get_current_user] = lambda: {'id': 'someone'}
+    app.dependency_overrides[routers.get_receipt_service] = lambda: service
+    try:
+        response = TestClient(app, raise_server_exceptions=False).post('/api/v1/receipts/bulk', files=[
+            ('files', ('a.jpg', JPEG + b'a', 'image/jpeg')), ('files', ('b.jpg', JPEG + b'b', 'image/jpeg'))])
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 500
+    assert (receipt_admission.admitted, receipt_admission.in_flight, receipt_admission.queued) == (0, 0, 0)
+    assert list(tmp_path.iterdir()) == []
+    # The receipt created before the failure is not left pending
+    [receipt] = receipts.rows.values()
+    assert receipt.status.value == 'upload_failed'
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+import pytest
+from app.modules.ledger.application.use_cases import ExportGeneralLedgerUseCase
+from app.modules.ledger.infrastructure.gl_export import EXPORT_COLUMNS, encode_csv, encode_ndjson, encode_parquet
+
+ENTRY_ID = UUID('00000000-0000-0000-0000-000000000001')
+ACCOUNT_ID = UUID('00000000-0000-0000-0000-000000000002')
+
+def _row(n: int, amount: str, direction: str = 'debit', description=None) -> tuple:
+    return (ENTRY_ID, f'JE-{n}', datetime(2025, 3, 2, 14, 5), 'posted', 'Rent, "March"', 'someone', datetime(2025, 3, 3, 9, 0, 0, 250000),
+            UUID(int=100 + n), ACCOUNT_ID, '5000', 'Rent', 'expense', direction, Decimal(amount), description)
+
+# Three fetches from the cursor, the last one empty
+BATCHES = [[_row(1, '1200.00'), _row(2, '0.10', 'credit', 'two\nlines')], [_row(3, '99999999.99')], []]
+
+class StreamingEntries:
+    def __init__(self, batches):
+        self.batches = batches
+        self.requested = None
+
+    async def stream_ledger(self, date_from=None, date_to=None, account_id=None, statuses=(), batch_size=5000):
+        self.requested = (date_from, date_to, account_id, tuple(statuses), batch_size)
+        for batch in self.batches:
+            yield batch
+
+class ExportUnitOfWork:
+    def __init__(self, batches):
+        self.journal_entries = StreamingEntries(batches)
+        self.open = False
+
+    async def __aenter__(self):
+        self.open = True
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.open = False
+
+async def _export(encoder, batches=BATCHES):
+    uow = ExportUnitOfWork(batches)
+    chunks = [chunk async for chunk in ExportGeneralLedgerUseCase(uow, batch_size=2).execute(encoder, statuses=['posted'])]
+    assert uow.journal_entries.requested == (None, None, None, ('posted',), 2) and not uow.open
+    return chunks
+
+async def test_csv_writes_the_header_once_across_chunks():
+    chunks = await _export(encode_csv)
+
+    # Empty chunks are not sent
+    assert len(chunks) == 2 and all(chunks)
+    body = b''.join(chunks).decode()
+    assert body.count('entry_id,entry_number') == 1
+    rows = list(csv.reader(io.StringIO(body)))
+    assert tuple(rows[0]) == EXPORT_COLUMNS
+    assert len(rows) == 4
+
+async def test_csv_serializes_dates_decimals_and_nulls():
+    rows = list(csv.DictReader(io.StringIO(b''.join(await _export(encode_csv)).decode())))
+
+    assert rows[0]['entry_date'] == '2025-03-02T14:05:00' and rows[0]['posted_at'] == '2025-03-03T09:00:00.250000'
+    assert [r['amount'] for r in rows] == ['1200.00', '0.10', '99999999.99']
+    assert rows[0]['entry_description'] == 'Rent, "March"' and rows[1]['line_description'] == 'two\nlines'
+    assert rows[0]['line_description'] == '' and rows[0]['entry_id'] == str(ENTRY_ID)
+
+async def test_csv_of_an_empty_ledger_is_just_the_header():
+    body = b''.join(await _export(encode_csv, [[]])).decode()
+
+    assert body == ','.join(EXPORT_COLUMNS) + '\r\n'
+
+async def test_ndjson_writes_one_object_per_line():
+    chunks = await _export(encode_ndjson)
+
+    assert len(chunks) == 2
+    rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    assert [r['entry_number'] for r in rows] == ['JE-1', 'JE-2', 'JE-3']
+    assert list(rows[0]) == list(EXPORT_COLUMNS)
+    # Amounts stay exact decimal strings instead of floats
+    assert rows[1]['amount'] == '0.10' and rows[2]['amount'] == '99999999.99'
+    assert rows[0]['entry_date'] == '2025-03-02T14:05:00' and rows[0]['account_id'] == str(ACCOUNT_ID)
+    assert rows[0]['line_description'] is None and rows[1]['line_description'] == 'two\nlines'
+
+async def test_parquet_round_trips_types():
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    table = pq.read_table(io.BytesIO(b''.join(await _export(encode_parquet))))
+
+    assert table.column_names == list(EXPORT_COLUMNS)
+    rows = table.to_pylist()
+    assert [r['amount'] for r in rows] == [Decimal('1200.00'), Decimal('0.10'), Decimal('99999999.99')]
+    assert rows[0]['entry_date'] == datetime(2025, 3, 2, 14, 5) and rows[0]['entry_id'] == str(ENTRY_ID)
@@ -0,0 +1,19 @@
+from datetime import datetime
+from uuid import uuid4
+import pytest
+from fastapi import HTTPException
+from app.modules.ledger.presentation.routers import _decode_cursor, _encode_cursor
+
+def test_cursor_round_trip():
+    entry_date, entry_id = datetime(2025, 3, 14, 9, 30, 15, 123456), uuid4()
+
+    cursor = _encode_cursor(entry_date, entry_id)
+
+    assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+    assert _decode_cursor(cursor) == (entry_date, entry_id)
+
+@pytest.mark.parametrize('cursor', ['zz', 'bm90IGpzb24', _encode_cursor(datetime(2025, 1, 1), uuid4())[:-3]])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,161 @@
+import json
+import pytest
+from app.modules.ledger.application.use_cases import ImportJournalEntriesUseCase
+from app.modules.ledger.domain.entities import Account, AccountType, JournalEntryStatus
+from app.modules.ledger.presentation.journal_import import read_csv, read_ndjson
+from tests.fakes import FakeBalances, FakePeriods
+
+ACCOUNTS = {code: Account(code=code, name=code, type=kind) for code, kind in (('1000', AccountType.ASSET), ('5000', AccountType.EXPENSE))}
+
+class ImportAccounts:
+    async def get_by_code(self, code):
+        return ACCOUNTS.get(code)
+
+class ImportEntries:
+    def __init__(self, existing=(), fail_on=None):
+        self.batches = []
+        self.existing = set(existing)
+        self.fail_on = fail_on
+
+    async def insert_many(self, entries):
+        if self.fail_on in {e.entry_number for e in entries}:
+            raise RuntimeError('connection reset')
+        self.batches.append([e.entry_number for e in entries])
+        return {e.id for e in entries if e.entry_number not in self.existing}
+
+class ImportUnitOfWork:
+    def __init__(self, journal_entries=None):
+        self.accounts = ImportAccounts()
+        self.journal_entries = journal_entries or ImportEntries()
+        self.balances = FakeBalances()
+        self.periods = FakePeriods()
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+async def _chunks(body: str, size: int = 7):
+    # Small chunks, so lines and multi-byte characters are split across them
+    data = body.encode()
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+async def _read(reader, body: str):
+    return [record async for record in reader(_chunks(body))]
+
+def _entry(number: str, debit: str = '12.50', credit: str = '12.50', account: str = '1000', status: str = 'draft') -> str:
+    return json.dumps({'entry_number': number, 'entry_date': '2025-03-02', 'description': 'Café', 'status': status, 'lines': [
+        {'account_code': '5000', 'direction': 'debit', 'amount': debit},
+        {'account_code': account, 'direction': 'credit', 'amount': credit}]})
+
+async def test_ndjson_reader_reports_bad_lines_by_row():
+    records = await _read(read_ndjson, '\r\n'.join([_entry('JE-1'), '', '{not json', '[1, 2]', _entry('JE-2')]))
+
+    assert [(row, error is None) for row, _, error in records] == [(1, True), (3, False), (4, False), (5, True)]
+    assert records[0][1]['description'] == 'Café'
+    assert records[2][2] == 'Expected a JSON object'
+
+async def test_csv_reader_groups_rows_into_entries():
+    body = ('﻿entry_number,entry_date,description,status,account_code,direction,amount,line_description\n'
+            'JE-1,2025-03-02,"Rent, March",posted,5000,debit,1200.00,"two\nlines"\n'
+            'JE-1,2025-03-02,,posted,1000,credit,1200.00,\n'
+            ',2025-03-02,,,1000,credit,1.00,\n'
+            'JE-2,2025-03-03,Coffee,,5000,debit,4.50,\n'
+            'JE-2,2025-03-03,Coffee,,1000,credit,4.50,\n')
+
+    records = await _read(read_csv, body)
+
+    # An entry is complete once the next one starts, so the bad row is reported first
+    assert [(row, record and record['entry_number'], error) for row, record, error in records] == [
+        (5, None, 'entry_number is required to group CSV rows into entries'), (2, 'JE-1', None), (6, 'JE-2', None)]
+    first = records[1][1]
+    assert first['description'] == 'Rent, March' and first['status'] == 'posted'
+    assert [(l['account_code'], l['direction'], l['amount']) for l in first['lines']] == [('5000', 'debit', '1200.00'), ('1000', 'credit', '1200.00')]
+    assert first['lines'][0]['description'] == 'two\nlines'
+
+async def test_csv_header_without_required_columns_is_rejected():
+    with pytest.raises(ValueError, match='account_code or account_id'):
+        await _read(read_csv, 'entry_number,entry_date,direction,amount\nJE-1,2025-03-02,debit,1.00\n')
+
+async def test_invalid_utf8_aborts_the_body():
+    async def body():
+        yield (_entry('JE-1') + '\n').encode()
+        yield b'\xff\xfe'
+
+    uow = ImportUnitOfWork()
+    result = await ImportJournalEntriesUseCase(uow).execute(read_ndjson(body()), created_by='someone')
+
+    assert result['aborted'].startswith('Body is not valid UTF-8')
+    # What was read before the bad bytes is still imported
+    assert result['imported'] == 1
+
+async def test_invalid_entries_are_reported_per_row():
+    body = '\n'.join([_entry('JE-1'), _entry('JE-2', credit='10.00'), _entry('JE-3', account='9999'), _entry('JE-1'),
+                      _entry('JE-4', status='void'), _entry('JE-5', debit='abc'), _entry('JE-6')])
+    uow = ImportUnitOfWork()
+
+    result = await ImportJournalEntriesUseCase(uow).execute(read_ndjson(_chunks(body)), created_by='someone')
+
+    assert (result['received'], result['valid'], result['imported'], result['failed']) == (7, 2, 2, 5)
+    errors = {e['row']: e for e in result['errors']}
+    assert sorted(errors) == [2, 3, 4, 5, 6]
+    assert 'must equal Credits' in errors[2]['error'] and errors[2]['entry_number'] == 'JE-2'
+    assert errors[3]['error'] == "Unknown account '9999'"
+    assert errors[4]['error'] == 'Duplicate entry_number JE-1 in this import'
+    assert errors[5]['error'] == 'Entries can only be imported as draft or posted'
+    assert errors[6]['error'] == 'amount is not a number'
+    assert uow.journal_entries.batches == [['JE-1', 'JE-6']]
+
+async def test_entries_are_written_in_chunks():
+    body = '\n'.join(_entry(f'JE-{i}') for i in range(5))
+    uow = ImportUnitOfWork()
+
+    result = await ImportJournalEntriesUseCase(uow, chunk_size=2).execute(read_ndjson(_chunks(body)), created_by='someone')
+
+    assert result['imported'] == 5
+    assert uow.journal_entries.batches == [['JE-0', 'JE-1'], ['JE-2', 'JE-3'], ['JE-4']]
+    assert uow.commits == 3
+
+async def test_failed_chunk_is_reported_and_the_import_goes_on():
+    body = '\n'.join(_entry(f'JE-{i}') for i in range(5))
+    uow = ImportUnitOfWork(ImportEntries(existing={'JE-4'}, fail_on='JE-2'))
+
+    result = await ImportJournalEntriesUseCase(uow, chunk_size=2).execute(read_ndjson(_chunks(body)), created_by='someone')
+
+    assert result['imported'] == 2 and uow.rollbacks == 1
+    assert [(e['row'], e['error']) for e in result['errors']] == [
+        (3, 'Write failed: connection reset'), (4, 'Write failed: connection reset'), (5, 'entry_number JE-4 already exists')]
+
+async def test_dry_run_validates_without_writing():
+    uow = ImportUnitOfWork()
+
+    result = await ImportJournalEntriesUseCase(uow).execute(read_ndjson(_chunks(_entry('JE-1'))), created_by='someone', dry_run=True)
+
+    assert (result['valid'], result['imported'], uow.commits) == (1, 0, 0)
+    assert uow.journal_entries.batches == []
+
+async def test_error_list_is_capped_but_counted_in_full():
+    body = '\n'.join('{bad' for _ in range(5))
+
+    result = await ImportJournalEntriesUseCase(ImportUnitOfWork(), max_errors=2).execute(read_ndjson(_chunks(body)), created_by='someone')
+
+    assert result['failed'] == 5 and len(result['errors']) == 2
+
+async def test_posted_entries_update_balances():
+    body = '\n'.join([_entry('JE-1', status='posted'), _entry('JE-2')])
+    uow = ImportUnitOfWork()
+
+    await ImportJournalEntriesUseCase(uow).execute(read_ndjson(_chunks(body)), created_by='someone')
+
+    [(applied, sign)] = uow.balances.applied
+    assert len(applied) == 1 and sign == 1
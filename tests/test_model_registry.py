@@ -0,0 +1,22 @@
+import multiprocessing
+from types import SimpleNamespace
+from app.core.config import settings
+from app.modules.receipts.infrastructure import model_registry as registry_module
+from app.modules.receipts.infrastructure.model_registry import ModelRegistry
+
+class InProcessOCR:
+    def __init__(self, preprocessor=None):
+        self.preprocessor = preprocessor
+
+def _no_pool(*args, **kwargs):
+    raise AssertionError('a daemonic process cannot start the OCR pool')
+
+async def test_daemonic_worker_falls_back_to_in_process_ocr(monkeypatch):
+    monkeypatch.setattr(settings, 'OCR_PROCESS_POOL', True)
+    monkeypatch.setattr(settings, 'OCR_BATCH_SIZE', 1)
+    monkeypatch.setattr(settings, 'MODEL_WARMUP', False)
+    monkeypatch.setattr(multiprocessing, 'current_process', lambda: SimpleNamespace(daemon=True))
+    monkeypatch.setattr(registry_module, 'OCRService', InProcessOCR)
+    monkeypatch.setattr(registry_module, 'OCRProcessPool', _no_pool)
+
+    assert isinstance(await ModelRegistry()._build_ocr(), InProcessOCR)
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from app.modules.receipts.infrastructure.ocr_batcher import OCRBatcher
+
+class BatchOCR:
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    def decode_image(self, image_bytes: bytes):
+        if image_bytes == b'corrupt':
+            raise ValueError('cannot identify image file')
+        return image_bytes
+
+    def recognize_batch(self, images):
+        self.batches.append(list(images))
+        if self.fail:
+            raise RuntimeError('predictor crashed')
+        return [f'text of {image.decode()}' for image in images]
+
+async def test_full_batch_is_flushed_without_waiting():
+    ocr = BatchOCR()
+    batcher = OCRBatcher(ocr, max_batch_size=3, max_wait_ms=10_000)
+
+    texts = await asyncio.wait_for(asyncio.gather(*(batcher.extract_text(f'{i}'.encode()) for i in range(3))), 1)
+
+    assert texts == ['text of 0', 'text of 1', 'text of 2']
+    assert [len(batch) for batch in ocr.batches] == [3]
+    await batcher.close()
+
+async def test_partial_batch_is_flushed_after_the_wait():
+    ocr = BatchOCR()
+    batcher = OCRBatcher(ocr, max_batch_size=8, max_wait_ms=20)
+
+    texts = await asyncio.gather(batcher.extract_text(b'a'), batcher.extract_text(b'b'))
+
+    assert texts == ['text of a', 'text of b']
+    assert [len(batch) for batch in ocr.batches] == [2]
+    assert batcher.stats()['occupancy'] == {2: 1}
+    await batcher.close()
+
+async def test_batches_do_not_exceed_the_maximum_size():
+    ocr = BatchOCR()
+    batcher = OCRBatcher(ocr, max_batch_size=2, max_wait_ms=20)
+
+    await asyncio.gather(*(batcher.extract_text(f'{i}'.encode()) for i in range(5)))
+
+    assert sorted(len(batch) for batch in ocr.batches) == [1, 2, 2]
+    assert batcher.stats()['images'] == 5
+    await batcher.close()
+
+async def test_undecodable_image_only_fails_its_caller():
+    ocr = BatchOCR()
+    batcher = OCRBatcher(ocr, max_batch_size=8, max_wait_ms=20)
+
+    results = await asyncio.gather(batcher.extract_text(b'a'), batcher.extract_text(b'corrupt'), return_exceptions=True)
+
+    assert results[0] == 'text of a'
+    assert isinstance(results[1], ValueError)
+    await batcher.close()
+
+async def test_failed_batch_fails_every_caller_and_the_batcher_keeps_going():
+    ocr = BatchOCR(fail=True)
+    batcher = OCRBatcher(ocr, max_batch_size=8, max_wait_ms=20)
+
+    results = await asyncio.gather(batcher.extract_text(b'a'), batcher.extract_text(b'b'), return_exceptions=True)
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+
+    ocr.fail = False
+    assert await batcher.extract_text(b'c') == 'text of c'
+    await batcher.close()
+
+async def test_caller_that_gave_up_is_left_out_of_the_batch():
+    ocr = BatchOCR()
+    batcher = OCRBatcher(ocr, max_batch_size=8, max_wait_ms=50)
+
+    waiting = asyncio.create_task(batcher.extract_text(b'a'))
+    await asyncio.sleep(0.01)
+    waiting.cancel()
+    assert await batcher.extract_text(b'b') == 'text of b'
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert ocr.batches == [[b'b']]
+    await batcher.close()
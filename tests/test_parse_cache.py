@@ -0,0 +1,92 @@
+import time
+import pytest
+from app.modules.receipts.infrastructure import parse_cache
+from app.modules.receipts.infrastructure.ai_parser import ReceiptData
+from app.modules.receipts.infrastructure.parse_cache import ParseCache, CachedParser
+from tests.fakes import FakeParser
+
+PARSED = ReceiptData(merchant_name='Corner Cafe', transaction_date='2025-03-02', total_amount=12.5)
+
+class FakeRedis:
+    def __init__(self, fail: bool = False):
+        self.values = {}
+        self.fail = fail
+
+    async def get(self, key):
+        if self.fail:
+            raise ConnectionError('redis is down')
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        if self.fail:
+            raise ConnectionError('redis is down')
+        self.values[key] = value
+
+async def test_least_recently_used_entry_is_evicted():
+    cache = ParseCache('fake-model', max_entries=2)
+    await cache.set('receipt a', PARSED)
+    await cache.set('receipt b', PARSED)
+    assert await cache.get('receipt a') is not None
+
+    await cache.set('receipt c', PARSED)
+
+    assert await cache.get('receipt b') is None
+    assert await cache.get('receipt a') is not None and await cache.get('receipt c') is not None
+    assert cache.stats()['local_entries'] == 2
+
+async def test_entries_expire_after_the_ttl(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(parse_cache.time, 'monotonic', lambda: now)
+    cache = ParseCache('fake-model', ttl=60)
+    await cache.set('receipt a', PARSED)
+
+    now += 59
+    assert await cache.get('receipt a') == PARSED
+    now += 2
+    assert await cache.get('receipt a') is None
+    assert cache.stats()['local_entries'] == 0
+
+async def test_key_ignores_case_and_whitespace_but_not_digits():
+    cache = ParseCache('fake-model')
+
+    assert cache.key('CORNER  CAFE\nTOTAL 12.50') == cache.key('corner cafe total 12.50')
+    assert cache.key('CORNER CAFE TOTAL 12.50') != cache.key('CORNER CAFE TOTAL 13.50')
+    assert cache.key('CORNER CAFE') != ParseCache('other-model').key('CORNER CAFE')
+
+async def test_redis_hit_fills_the_local_tier():
+    cache = ParseCache('fake-model')
+    cache.redis = FakeRedis()
+    await cache.set('receipt a', PARSED)
+    cache._local.clear()
+
+    assert await cache.get('receipt a') == PARSED
+    assert await cache.get('receipt a') == PARSED
+    assert (cache.redis_hits, cache.local_hits) == (1, 1)
+
+async def test_redis_errors_fall_back_to_the_local_tier():
+    cache = ParseCache('fake-model')
+    cache.redis = FakeRedis(fail=True)
+
+    await cache.set('receipt a', PARSED)
+    assert await cache.get('receipt a') == PARSED
+    assert await cache.get('receipt b') is None
+    assert cache.redis_errors == 2 and cache.misses == 1
+
+async def test_cached_parser_calls_the_llm_once():
+    llm = FakeParser(PARSED)
+    parser = CachedParser(llm, ParseCache(llm.model))
+
+    assert await parser.parse('CORNER CAFE TOTAL 12.50') == PARSED
+    assert await parser.parse('corner cafe   total 12.50') == PARSED
+    assert llm.calls == 1
+
+@pytest.mark.parametrize('merchant', ['Timeout', 'Unknown', 'Error'])
+async def test_fallback_results_are_not_cached(merchant):
+    llm = FakeParser(ReceiptData(merchant_name=merchant, total_amount=0.0))
+    parser = CachedParser(llm, ParseCache(llm.model))
+
+    await parser.parse('CORNER CAFE TOTAL 12.50')
+    await parser.parse('CORNER CAFE TOTAL 12.50')
+
+    assert llm.calls == 2
+    assert parser.cache.stats()['local_entries'] == 0
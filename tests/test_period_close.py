@@ -0,0 +1,57 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+import pytest
+from app.modules.ledger.application.use_cases import ClosePeriodUseCase, PostJournalEntryUseCase, ReopenPeriodUseCase
+from app.modules.ledger.domain.entities import JournalEntry, JournalLine, month_of, next_month
+from tests.fakes import FakeLedgerEntries, FakeLedgerUnitOfWork, FakePeriods
+
+JAN, FEB, MAR = date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)
+
+async def test_close_builds_on_the_previous_snapshot():
+    uow = FakeLedgerUnitOfWork(periods=FakePeriods([JAN]))
+
+    await ClosePeriodUseCase(uow).execute(FEB, 'someone')
+
+    assert uow.periods.snapshots == [(FEB, JAN)] and uow.commits == 1
+
+@pytest.mark.parametrize('closed, period, message', [
+    ([JAN, FEB], FEB, 'already closed'),
+    ([JAN, FEB], JAN, 'already closed'),
+    ([JAN], MAR, 'Close 2025-02 first'),
+    ([], month_of(datetime.now(timezone.utc)), 'have ended'),
+])
+async def test_close_rejects(closed, period, message):
+    uow = FakeLedgerUnitOfWork(periods=FakePeriods(closed))
+
+    with pytest.raises(ValueError, match=message):
+        await ClosePeriodUseCase(uow).execute(period, 'someone')
+    assert uow.periods.snapshots == [] and uow.commits == 0
+
+async def test_reopen_only_the_latest_closed_period():
+    uow = FakeLedgerUnitOfWork(periods=FakePeriods([JAN, FEB]))
+
+    with pytest.raises(ValueError, match='Only the latest'):
+        await ReopenPeriodUseCase(uow).execute(JAN)
+    with pytest.raises(ValueError, match='not closed'):
+        await ReopenPeriodUseCase(uow).execute(MAR)
+
+    await ReopenPeriodUseCase(uow).execute(FEB)
+    assert uow.periods.closed == [JAN]
+    # And it can be closed again
+    await ClosePeriodUseCase(uow).execute(FEB, 'someone')
+    assert uow.periods.closed == [JAN, FEB]
+
+async def test_posting_into_a_closed_month_is_rejected():
+    entry = JournalEntry(entry_number='JE-1', entry_date=datetime(2025, 2, 10, tzinfo=timezone.utc), description='Late', lines=[
+        JournalLine(account_id=uuid4(), direction='debit', amount=Decimal('5.00')),
+        JournalLine(account_id=uuid4(), direction='credit', amount=Decimal('5.00')),
+    ])
+    uow = FakeLedgerUnitOfWork(FakeLedgerEntries(entry), FakePeriods([JAN, FEB]))
+
+    with pytest.raises(ValueError, match='2025-02 is closed'):
+        await PostJournalEntryUseCase(uow).execute(entry.id)
+    assert uow.balances.applied == []
+
+def test_next_month_wraps_the_year():
+    assert next_month(date(2024, 12, 1)) == JAN
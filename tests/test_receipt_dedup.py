@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.core.config import settings
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.domain.models import Receipt, ProcessingStatus
+from app.modules.receipts.infrastructure.repositories import ReceiptRepository
+from tests.fakes import FakeOCR, FakeParser, FakeStorage
+
+def _service(uow_factory):
+    return ReceiptProcessingService(uow_factory=uow_factory, ocr_service=FakeOCR(), ai_parser=FakeParser(), storage=FakeStorage())
+
+def _source(**values) -> Receipt:
+    return Receipt(id=uuid4(), filename='a.jpg', user_id='someone', file_hash='f' * 64, status=ProcessingStatus.COMPLETED,
+                   file_path='local://a', ocr_text='CORNER CAFE\nTOTAL 12.50', **values)
+
+async def test_receipt_policy_returns_existing_receipt(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'receipt')
+    receipts.duplicate = _source()
+
+    receipt, created = await _service(uow_factory).accept_receipt(b'image', 'a.jpg', 'someone')
+
+    assert not created and receipt.id == receipts.duplicate.id
+    # Only receipts newer than the stale cutoff count while they are still in progress
+    stale_before = receipts.lookups[0][3]
+    expected = datetime.now(timezone.utc) - timedelta(minutes=settings.RECEIPT_STALE_MINUTES)
+    assert abs(stale_before - expected) < timedelta(seconds=5)
+
+@pytest.mark.parametrize('policy', ['results', 'off'])
+async def test_other_policies_always_create_a_receipt(uow_factory, receipts, monkeypatch, policy):
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', policy)
+    receipts.duplicate = _source()
+
+    receipt, created = await _service(uow_factory).accept_receipt(b'image', 'a.jpg', 'someone')
+
+    assert created and receipt.id != receipts.duplicate.id
+    assert receipts.lookups == []
+
+async def test_find_by_hash_skips_failed_and_stale_receipts():
+    captured = []
+
+    class Session:
+        async def execute(self, stmt):
+            captured.append(stmt)
+            raise LookupError
+
+    with pytest.raises(LookupError):
+        await ReceiptRepository(Session()).find_by_hash('f' * 64, 'someone', datetime(2025, 1, 1, tzinfo=timezone.utc))
+
+    sql = str(captured[0].compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    assert "receipts.status IN ('completed', 'pending_review')" in sql
+    assert "receipts.created_at >= '2025-01-01 00:00:00'" in sql
+
+async def test_results_policy_copies_ocr_and_parse(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'results')
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_SCOPE', 'user')
+    receipts.duplicate = _source(parsed_data={'merchant_name': 'Corner Cafe', 'total_amount': 12.5})
+    receipt = Receipt(id=uuid4(), filename='b.jpg', user_id='someone', file_hash='f' * 64, status=ProcessingStatus.PENDING)
+
+    assert await _service(uow_factory).reuse_duplicate(receipt)
+
+    assert receipt.status == ProcessingStatus.PARSING_COMPLETED
+    assert (receipt.file_path, receipt.ocr_text, receipt.parsed_data) == (receipts.duplicate.file_path, receipts.duplicate.ocr_text,
+                                                                          receipts.duplicate.parsed_data)
+    assert receipts.lookups[0] == ('find_ocr_by_hash', 'f' * 64, 'someone', receipt.id)
+
+async def test_results_policy_does_not_copy_a_fallback_parse(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'results')
+    receipts.duplicate = _source(parsed_data={'merchant_name': 'Timeout', 'total_amount': 0.0})
+    receipt = Receipt(id=uuid4(), filename='b.jpg', user_id='someone', file_hash='f' * 64, status=ProcessingStatus.PENDING)
+
+    assert await _service(uow_factory).reuse_duplicate(receipt)
+
+    assert receipt.status == ProcessingStatus.OCR_COMPLETED
+    assert receipt.ocr_text == receipts.duplicate.ocr_text and receipt.parsed_data is None
+
+async def test_global_scope_looks_across_users(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'results')
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_SCOPE', 'global')
+    receipt = Receipt(id=uuid4(), filename='b.jpg', user_id='someone', file_hash='f' * 64, status=ProcessingStatus.PENDING)
+
+    assert not await _service(uow_factory).reuse_duplicate(receipt)
+    assert receipts.lookups[0][2] is None
+
+async def test_off_policy_never_reuses(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'off')
+    receipts.duplicate = _source()
+    receipt = Receipt(id=uuid4(), filename='b.jpg', user_id='someone', file_hash='f' * 64, status=ProcessingStatus.PENDING)
+
+    assert not await _service(uow_factory).reuse_duplicate(receipt)
+    assert receipts.lookups == []
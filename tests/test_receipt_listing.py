@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from app.modules.receipts.domain.models import Receipt, ProcessingStatus
+from app.modules.receipts.infrastructure.repositories import ReceiptRepository
+from app.modules.receipts.presentation.routers import _decode_cursor, _encode_cursor, _parse_statuses
+
+class CapturingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return []
+
+    def sql(self) -> str:
+        return str(self.statements[0].compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+def test_cursor_round_trip():
+    receipt = Receipt(id=uuid4(), filename='a.jpg', user_id='someone', status=ProcessingStatus.COMPLETED,
+                      created_at=datetime(2025, 3, 14, 9, 30, 15, 123456))
+
+    cursor = _encode_cursor(receipt)
+
+    assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+    assert _decode_cursor(cursor) == (receipt.created_at, receipt.id)
+
+@pytest.mark.parametrize('cursor', ['zz', 'bm90IGpzb24', 'WyIyMDI1LTAxLTAxIiwgIm5vdCBhIHV1aWQiXQ'])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+def test_status_aliases_expand():
+    assert _parse_statuses(['failed']) == sorted(s.value for s in ProcessingStatus if s.value.endswith('_failed'))
+    assert 'pending_review' in _parse_statuses(['review'])
+    with pytest.raises(HTTPException):
+        _parse_statuses(['lost'])
+
+async def test_list_page_filters_and_continues_after_the_cursor():
+    session = CapturingSession()
+    after = (datetime(2025, 3, 14, 11, 30, tzinfo=timezone.utc), uuid4())
+
+    await ReceiptRepository(session).list_page('someone', ['completed', 'ocr_failed'], datetime(2025, 3, 1), datetime(2025, 4, 1), after, 51)
+
+    sql = session.sql()
+    assert "receipts.user_id = 'someone'" in sql
+    assert "receipts.status IN ('completed', 'ocr_failed')" in sql
+    assert "receipts.created_at >= '2025-03-01 00:00:00'" in sql and "receipts.created_at < '2025-04-01 00:00:00'" in sql
+    # The cursor is compared as one (created_at, id) tuple, in naive UTC like the column
+    assert f"(receipts.created_at, receipts.id) < ('2025-03-14 11:30:00', '{after[1]}')" in sql
+    assert sql.endswith('ORDER BY receipts.created_at DESC, receipts.id DESC \n LIMIT 51')
+
+async def test_list_page_reads_large_columns_only_when_included():
+    plain, included = CapturingSession(), CapturingSession()
+
+    await ReceiptRepository(plain).list_page('someone')
+    await ReceiptRepository(included).list_page('someone', include=('parsed_data',))
+
+    assert 'ocr_text' not in plain.sql() and 'parsed_data' not in plain.sql()
+    assert 'receipts.parsed_data' in included.sql() and 'ocr_text' not in included.sql()
@@ -0,0 +1,20 @@
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.domain.models import ProcessingStatus
+from tests.fakes import FakeOCR, FakeParser, FakeStorage
+
+async def test_journal_entry_and_receipt_commit_together(uow_factory, receipts, journal_entries):
+    opened = []
+
+    def factory():
+        opened.append(uow_factory())
+        return opened[-1]
+
+    service = ReceiptProcessingService(uow_factory=factory, ocr_service=FakeOCR(), ai_parser=FakeParser(), storage=FakeStorage())
+    receipt = await service.process(await service.create_receipt('a.jpg', 'someone'), b'image')
+
+    assert receipt.status == ProcessingStatus.COMPLETED
+    assert len(journal_entries.saved) == 1 and receipt.journal_entry_id == journal_entries.saved[0].id
+    # One unit of work, entered once, saved the entry and the receipt and committed them together
+    [journal_uow] = [uow for uow in opened if any(entries for _, entries in uow.commits)]
+    assert journal_uow.entered == 1 and journal_uow.commits == [(1, 1)]
+    assert receipts.rows[receipt.id].journal_entry_id == receipt.journal_entry_id
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+import pytest
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.domain.models import Receipt, ProcessingStatus
+from app.modules.receipts.infrastructure.ai_parser import ReceiptData
+from tests.fakes import FakeOCR, FakeParser, FakeStorage
+
+PARSED = {'merchant_name': 'Corner Cafe', 'transaction_date': '2025-03-02', 'total_amount': 12.5}
+
+def _service(uow_factory, parser=None):
+    return ReceiptProcessingService(uow_factory=uow_factory, ocr_service=FakeOCR(), ai_parser=parser or FakeParser(), storage=FakeStorage())
+
+def _receipt(status=ProcessingStatus.PARSING_FAILED, created_at=None, **values) -> Receipt:
+    return Receipt(id=uuid4(), filename='a.jpg', user_id='someone', status=status,
+                   created_at=created_at or datetime.now(timezone.utc), **values)
+
+@pytest.mark.parametrize('values, expected', [
+    ({}, None),
+    ({'file_path': 'local://a'}, ProcessingStatus.OCR_PROCESSING),
+    ({'file_path': 'local://a', 'ocr_text': 'TOTAL 12.50'}, ProcessingStatus.OCR_COMPLETED),
+    ({'file_path': 'local://a', 'ocr_text': 'TOTAL 12.50', 'parsed_data': PARSED}, ProcessingStatus.PARSING_COMPLETED),
+    # A fallback parse from an LLM timeout is parsed again
+    ({'ocr_text': 'TOTAL 12.50', 'parsed_data': {'merchant_name': 'Timeout', 'total_amount': 0.0}}, ProcessingStatus.OCR_COMPLETED),
+    ({'ocr_text': 'TOTAL 12.50', 'parsed_data': PARSED, 'journal_entry_id': uuid4()}, None),
+])
+def test_resume_point(uow_factory, values, expected):
+    assert _service(uow_factory).resume_point(_receipt(**values)) == expected
+
+def test_can_reprocess_failed_and_stalled_receipts(uow_factory):
+    service = _service(uow_factory)
+    stale_before = datetime.now(timezone.utc) - timedelta(minutes=30)
+    old = stale_before - timedelta(minutes=1)
+
+    assert service.can_reprocess(_receipt(ocr_text='TOTAL 12.50'), stale_before)
+    assert not service.can_reprocess(_receipt(), stale_before)
+    # In progress: only once it is older than the cutoff
+    assert not service.can_reprocess(_receipt(ProcessingStatus.AI_PARSING, ocr_text='TOTAL 12.50'), stale_before)
+    assert service.can_reprocess(_receipt(ProcessingStatus.AI_PARSING, old, ocr_text='TOTAL 12.50'), stale_before)
+    assert not service.can_reprocess(_receipt(ProcessingStatus.COMPLETED, old, ocr_text='TOTAL 12.50'), stale_before)
+
+async def test_claim_reprocess_moves_the_receipt_to_its_resume_point(uow_factory, receipts):
+    receipt = _receipt(ocr_text='TOTAL 12.50', error_message='Parser returned no usable data (Timeout)')
+
+    assert await _service(uow_factory).claim_reprocess(receipt)
+
+    assert receipts.transitions == [(receipt.id, 'parsing_failed', 'ocr_completed')]
+    assert receipt.status == ProcessingStatus.OCR_COMPLETED and receipt.error_message is None
+
+async def test_claim_reprocess_loses_to_a_concurrent_claim(uow_factory, receipts):
+    receipts.transition_result = False
+    receipt = _receipt(ocr_text='TOTAL 12.50')
+
+    assert not await _service(uow_factory).claim_reprocess(receipt)
+    assert receipt.status == ProcessingStatus.PARSING_FAILED
+
+async def test_claim_reprocess_needs_a_resume_point(uow_factory, receipts):
+    assert not await _service(uow_factory).claim_reprocess(_receipt())
+    assert receipts.transitions == []
+
+async def test_fallback_parse_fails_the_receipt(uow_factory):
+    parser = FakeParser(ReceiptData(merchant_name='Timeout', total_amount=0.0))
+    service = _service(uow_factory, parser)
+    receipt = _receipt(ProcessingStatus.OCR_COMPLETED, ocr_text='TOTAL 12.50')
+
+    assert not await service.run_parsing(receipt)
+
+    assert receipt.status == ProcessingStatus.PARSING_FAILED and receipt.parsed_data is None
+    assert service.resume_point(receipt) == ProcessingStatus.OCR_COMPLETED
+
+async def test_resume_parses_and_books_a_claimed_receipt(uow_factory, journal_entries):
+    service = _service(uow_factory)
+    receipt = _receipt(ocr_text='TOTAL 12.50')
+    assert await service.claim_reprocess(receipt)
+
+    await service.resume(receipt)
+
+    assert receipt.status == ProcessingStatus.COMPLETED
+    assert receipt.journal_entry_id == journal_entries.saved[0].id
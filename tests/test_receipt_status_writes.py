@@ -0,0 +1,55 @@
+import asyncio
+from app.core.config import settings
+from app.modules.receipts.application.receipt_service import ReceiptProcessingService
+from app.modules.receipts.domain.models import ProcessingStatus
+from tests.fakes import FakeOCR, FakeParser, FakeStorage
+
+class SlowOCR(FakeOCR):
+    # Records what a crash during OCR would leave in the table
+    def __init__(self, receipts):
+        super().__init__()
+        self.receipts = receipts
+        self.row_during_ocr = None
+
+    async def extract_text(self, image_bytes: bytes) -> str:
+        await asyncio.sleep(0.01)
+        self.row_during_ocr = next(iter(self.receipts.rows.values())).model_copy()
+        return await super().extract_text(image_bytes)
+
+async def _process(uow_factory, ocr=None):
+    service = ReceiptProcessingService(uow_factory=uow_factory, ocr_service=ocr or FakeOCR(), ai_parser=FakeParser(), storage=FakeStorage())
+    receipt = await service.create_receipt('a.jpg', 'someone', 'f' * 64)
+    return service, await service.process(receipt, b'image')
+
+async def test_coalesced_writes_skip_status_only_updates(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_STATUS_WRITES', 'coalesced')
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'off')
+
+    _, receipt = await _process(uow_factory)
+
+    assert receipt.status == ProcessingStatus.COMPLETED
+    # Insert, upload, OCR, parse, journal entry
+    assert [status for status, _ in receipts.writes] == ['pending', 'ocr_processing', 'ocr_completed', 'parsing_completed', 'completed']
+    assert all(fields != {'status'} for _, fields in receipts.writes[1:])
+
+async def test_every_mode_writes_each_status(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_STATUS_WRITES', 'every')
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'off')
+
+    await _process(uow_factory)
+
+    statuses = [status for status, _ in receipts.writes]
+    assert 'ai_parsing' in statuses and statuses[-1] == 'completed'
+    assert len(receipts.writes) > 5
+
+async def test_coalesced_writes_store_the_upload_before_ocr_finishes(uow_factory, receipts, monkeypatch):
+    monkeypatch.setattr(settings, 'RECEIPT_STATUS_WRITES', 'coalesced')
+    monkeypatch.setattr(settings, 'RECEIPT_DEDUP_POLICY', 'off')
+    ocr = SlowOCR(receipts)
+
+    service, _ = await _process(uow_factory, ocr)
+
+    # A crash during OCR would still find the uploaded file in the table, and reprocessing resumes from it
+    assert ocr.row_during_ocr.file_path == f'local://receipts/{ocr.row_during_ocr.id}.jpg'
+    assert ocr.row_during_ocr.status == ProcessingStatus.OCR_PROCESSING
+    assert service.resume_point(ocr.row_during_ocr) == ProcessingStatus.OCR_PROCESSING
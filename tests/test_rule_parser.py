@@ -0,0 +1,63 @@
+import pytest
+from app.modules.receipts.infrastructure.rule_parser import RuleBasedExtractor, FastPathParser
+from tests.fakes import FakeParser
+
+def _total(text: str):
+    data, _ = RuleBasedExtractor().extract(text)
+    return data.total_amount
+
+def test_full_receipt_is_extracted_with_full_confidence():
+    data, confidence = RuleBasedExtractor().extract('CORNER CAFE\n12 Main Street\n2025-03-02 14:05\nLatte 4.50\nTOTAL 12.50\nVISA 12.50')
+
+    assert (data.merchant_name, data.transaction_date, data.total_amount) == ('CORNER CAFE', '2025-03-02', 12.5)
+    assert confidence == 1.0
+
+def test_disagreeing_totals_are_rejected():
+    # A later, smaller total contradicts the earlier one
+    assert _total('TOTAL 15.00\nCASH 20.00\nTOTAL 12.50') is None
+    # A later, larger one is the grand total after a tip
+    assert _total('TOTAL 12.50\nTIP 2.50\nGRAND TOTAL 15.00') == 15.0
+    assert _total('TOTAL 12.50\nTOTAL 12.50') == 12.5
+
+def test_subtotal_lines_are_not_totals():
+    assert _total('Sub Total 10.00\nTotal Tax 2.50\nTotal Items 3') is None
+    assert _total('Sub-total 10.00\nTotal VAT 2.50\nTotal 12.50\nTotal savings 1.00') == 12.5
+
+def test_total_split_onto_the_next_line():
+    assert _total('CORNER CAFE\nTOTAL\n1.234,50\nTHANK YOU') == 1234.5
+
+@pytest.mark.parametrize('day_first, text, expected, confidence', [
+    (True, '03/04/2025', '2025-04-03', 0.2),
+    (False, '03/04/2025', '2025-03-04', 0.2),
+    # Only one reading is a valid date, or both readings agree: not ambiguous
+    (False, '25/03/2025', '2025-03-25', 0.3),
+    (True, '03/25/25', '2025-03-25', 0.3),
+    (True, '03/03/2025', '2025-03-03', 0.3),
+    (True, '2 Mar 2025', '2025-03-02', 0.3),
+])
+def test_day_and_month_order(day_first, text, expected, confidence):
+    data, score = RuleBasedExtractor(day_first=day_first).extract(text)
+
+    assert data.transaction_date == expected
+    assert score == confidence
+
+@pytest.mark.parametrize('text, fast', [
+    # Total and unambiguous date, no merchant: exactly the threshold
+    ('2025-03-02\nTOTAL 12.50', True),
+    # Total and ambiguous date: 0.7
+    ('03/04/2025\nTOTAL 12.50', False),
+    ('CORNER CAFE\n03/04/2025\nTOTAL 12.50', True),
+    ('CORNER CAFE\nTOTAL 12.50', False),
+])
+async def test_fast_path_threshold(text, fast):
+    llm = FakeParser()
+    parser = FastPathParser(llm, RuleBasedExtractor(), min_confidence=0.8)
+
+    data = await parser.parse(text)
+
+    assert (llm.calls == 0) == fast
+    assert (parser.fast_path, parser.llm_path) == ((1, 0) if fast else (0, 1))
+    if fast:
+        assert data.total_amount == 12.5
+    else:
+        assert data is llm.result